@@ -0,0 +1,148 @@
+import ast
+import importlib
+import inspect
+import os
+import sys
+import threading
+import time
+
+_lock = threading.Lock()
+_import_times = {}
+_ACTIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "actions")
+
+
+def load_actions(store, module_names: tuple, lazy: bool = False):
+    """
+    Registers the actions of the given action modules with the store.
+
+    In eager mode every module is imported right away. In lazy mode the
+    modules are only parsed: each action is registered under its real name,
+    docstring and request/response models, and the module (with boto3 and
+    the rest of its dependencies) is imported on the first invocation of one
+    of its actions.
+
+    Args:
+        store (ActionStore): The action store to register the actions with.
+        module_names (tuple): The names of the modules in the `actions` package.
+        lazy (bool): Whether to defer importing the modules until first use.
+    """
+    for module_name in module_names:
+        if lazy:
+            _register_lazy(store, module_name)
+        else:
+            import_action_module(module_name)
+
+
+def import_action_module(module_name: str):
+    """
+    Imports a module of the `actions` package and records how long it took.
+
+    Args:
+        module_name (str): The name of the module in the `actions` package.
+
+    Returns:
+        The imported module.
+    """
+    qualified_name = f"{__package__}.actions.{module_name}"
+    module = sys.modules.get(qualified_name)
+    if module is not None:
+        return module
+
+    with _lock:
+        module = sys.modules.get(qualified_name)
+        if module is not None:
+            return module
+        loaded_before = len(sys.modules)
+        start = time.perf_counter()
+        module = importlib.import_module(qualified_name)
+        _record(module_name, "import", time.perf_counter() - start, len(sys.modules) - loaded_before)
+        return module
+
+
+def import_time_report() -> list:
+    """
+    Returns the startup cost of every action module, slowest first.
+
+    Returns:
+        list: One entry per module with the registration and import times in
+            seconds and the number of modules its import pulled in.
+    """
+    with _lock:
+        report = [dict(module=name, **entry) for name, entry in _import_times.items()]
+    return sorted(report, key=lambda entry: entry["register_seconds"] + entry["import_seconds"], reverse=True)
+
+
+def _record(module_name: str, phase: str, seconds: float, modules_loaded: int = 0):
+    entry = _import_times.setdefault(module_name, {
+        "lazy": False,
+        "loaded": False,
+        "register_seconds": 0.0,
+        "import_seconds": 0.0,
+        "modules_loaded": 0,
+    })
+    entry[f"{phase}_seconds"] = seconds
+    if phase == "register":
+        entry["lazy"] = True
+    else:
+        entry["loaded"] = True
+        entry["modules_loaded"] = modules_loaded
+
+
+def _register_lazy(store, module_name: str):
+    start = time.perf_counter()
+    path = os.path.join(_ACTIONS_DIR, f"{module_name}.py")
+    with open(path) as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    imported = {}
+    for node in tree.body:
+        if isinstance(node, ast.ImportFrom) and node.level > 0 and node.module:
+            for alias in node.names:
+                imported[alias.asname or alias.name] = (node.module, node.level, alias.name)
+
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and any(_is_kubiya_action(d) for d in node.decorator_list):
+            parameter = node.args.args[0]
+            request_model = _resolve(imported, parameter.annotation)
+            response_model = _resolve(imported, node.returns)
+            stub = _lazy_action(module_name, node.name, ast.get_docstring(node, clean=False),
+                                parameter.arg, request_model, response_model)
+            store.kubiya_action(category=module_name)(stub)
+
+    with _lock:
+        _record(module_name, "register", time.perf_counter() - start)
+
+
+def _is_kubiya_action(decorator: ast.expr) -> bool:
+    return (isinstance(decorator, ast.Call)
+            and isinstance(decorator.func, ast.Attribute)
+            and decorator.func.attr == "kubiya_action")
+
+
+def _resolve(imported: dict, annotation: ast.expr):
+    # Annotations must be names imported from a sibling package (e.g. models),
+    # so they can be resolved without executing the action module itself.
+    if annotation is None:
+        return inspect.Signature.empty
+    module, level, name = imported[annotation.id]
+    # The action modules live one level below this package.
+    package = __package__ if level == 2 else f"{__package__}.actions"
+    return getattr(importlib.import_module(f".{module}", package), name)
+
+
+def _lazy_action(module_name: str, action_name: str, doc: str, parameter_name: str,
+                 request_model, response_model):
+    def action(request):
+        # Importing the module re-registers the real action under the same
+        # name, so only the first call goes through this stub.
+        module = import_action_module(module_name)
+        return getattr(module, action_name)(request)
+
+    action.__name__ = action_name
+    action.__qualname__ = action_name
+    action.__doc__ = doc
+    action.__signature__ = inspect.Signature(
+        [inspect.Parameter(parameter_name, inspect.Parameter.POSITIONAL_OR_KEYWORD, annotation=request_model)],
+        return_annotation=response_model,
+    )
+    return action
@@ -7,14 +7,23 @@ from ..models.cloudwatch_models import (
     DescribeAlarmsResponse,
     PutMetricDataRequest,
     PutMetricDataResponse,
+    FlushMetricDataRequest,
+    FlushMetricDataResponse,
     GetMetricDataRequest,
     GetMetricDataResponse,
     ListMetricsRequest,
     ListMetricsResponse,
+    InvalidateMetricCatalogRequest,
+    InvalidateMetricCatalogResponse,
 )
 
 from ..main_store import store
-from ..aws_wrapper import get_client
+from ..aws_wrapper import get_client, get_region, get_account
+from ..pagination import paginate
+from ..metric_batcher import get_batcher, send_metric_data
+from ..metric_data import fetch_metric_data, parse_time
+from ..metric_cache import get_cache
+from ..metric_catalog import get_catalog
 
 
 @store.kubiya_action()
@@ -55,6 +64,9 @@ def describe_alarms(request: DescribeAlarmsRequest) -> DescribeAlarmsResponse:
     """
     Describes CloudWatch alarms based on the specified filters.
 
+    With `Fields`, each alarm is reduced to the JMESPath projection as its
+    page is read, so only the projected data is kept and returned.
+
     Args:
         request (DescribeAlarmsRequest): The request containing the filters.
 
@@ -62,9 +74,10 @@ def describe_alarms(request: DescribeAlarmsRequest) -> DescribeAlarmsResponse:
         DescribeAlarmsResponse: The response containing the list of alarms.
     """
     cloudwatch = get_client("cloudwatch")
-    response = cloudwatch.describe_alarms(**request.dict(exclude_none=True))
-    alarms = response["MetricAlarms"]
-    return DescribeAlarmsResponse(alarms=alarms)
+    alarms, next_token = paginate(cloudwatch, "describe_alarms", "MetricAlarms",
+                                  limit=request.MaxItems, cursor=request.NextToken, projection=request.Fields,
+                                  **request.dict(exclude_none=True, exclude={"MaxItems", "NextToken", "Fields"}))
+    return DescribeAlarmsResponse(alarms=alarms, next_token=next_token)
 
 
 @store.kubiya_action()
@@ -72,15 +85,42 @@ def put_metric_data(request: PutMetricDataRequest) -> PutMetricDataResponse:
     """
     Publishes metric data to CloudWatch.
 
+    The data is split into as few requests as the PutMetricData limits allow.
+    With `Buffered`, the datapoints are aggregated with the other buffered
+    datapoints of the namespace and sent in the background instead.
+
     Args:
         request (PutMetricDataRequest): The request containing the metric data to publish.
 
     Returns:
         PutMetricDataResponse: The response indicating the result of publishing the metric data.
     """
+    if request.Buffered:
+        get_batcher().add(request.Namespace, request.MetricData)
+        return PutMetricDataResponse(buffered=True)
+
     cloudwatch = get_client("cloudwatch")
-    response = cloudwatch.put_metric_data(**request.dict(exclude_none=True))
-    return PutMetricDataResponse()
+    sent, failed = send_metric_data(cloudwatch, request.Namespace, request.MetricData)
+    if failed:
+        raise failed[0][1]
+    return PutMetricDataResponse(requests=sent)
+
+
+@store.kubiya_action()
+def flush_metric_data(request: FlushMetricDataRequest) -> FlushMetricDataResponse:
+    """
+    Sends every datapoint buffered by put_metric_data right away.
+
+    Args:
+        request (FlushMetricDataRequest): Empty request.
+
+    Returns:
+        FlushMetricDataResponse: The number of requests and metrics sent, of failed requests, of metrics
+            put back for a retry, and the batcher counters.
+    """
+    batcher = get_batcher()
+    result = batcher.flush()
+    return FlushMetricDataResponse(**result, stats=batcher.stats())
 
 
 @store.kubiya_action()
@@ -88,15 +128,29 @@ def get_metric_data(request: GetMetricDataRequest) -> GetMetricDataResponse:
     """
     Retrieves metric data from CloudWatch.
 
+    Queries are split at the per-call limit and long time ranges into windows
+    fetched in parallel; every page is followed. Each query's datapoints come
+    back as timestamp and value columns, in timestamp order. With `UseCache`,
+    datapoints that can no longer change are served from the metric cache.
+
     Args:
         request (GetMetricDataRequest): The request containing the details of the metric data to retrieve.
 
     Returns:
         GetMetricDataResponse: The response containing the retrieved metric data.
     """
+    if not request.MetricDataQueries:
+        raise ValueError("`MetricDataQueries` must hold at least one query")
     cloudwatch = get_client("cloudwatch")
-    response = cloudwatch.get_metric_data(**request.dict(exclude_none=True))
-    metric_data = response["MetricDataResults"]
+    start_time, end_time = parse_time(request.StartTime), parse_time(request.EndTime)
+    if request.UseCache:
+        results = get_cache().get_metric_data(cloudwatch, (get_region(), get_account()), request.MetricDataQueries,
+                                              start_time, end_time, window_seconds=request.WindowSeconds,
+                                              max_concurrency=request.MaxConcurrency)
+    else:
+        results = fetch_metric_data(cloudwatch, request.MetricDataQueries, start_time, end_time,
+                                    window_seconds=request.WindowSeconds, max_concurrency=request.MaxConcurrency)
+    metric_data = [dict(Id=query_id, **result) for query_id, result in results.items()]
     return GetMetricDataResponse(metric_data=metric_data)
 
 
@@ -105,6 +159,11 @@ def list_metrics(request: ListMetricsRequest) -> ListMetricsResponse:
     """
     Lists the CloudWatch metrics based on the specified filters.
 
+    With `UseCatalog`, the metrics are looked up in the in-memory catalog of
+    the namespace, which lists the namespace in full on first use and then
+    refreshes it in the background. The NextToken is then an offset into the
+    matching metrics.
+
     Args:
         request (ListMetricsRequest): The request containing the filters.
 
@@ -112,6 +171,32 @@ def list_metrics(request: ListMetricsRequest) -> ListMetricsResponse:
         ListMetricsResponse: The response containing the list of metrics.
     """
     cloudwatch = get_client("cloudwatch")
-    response = cloudwatch.list_metrics(**request.dict(exclude_none=True))
-    metrics = response["Metrics"]
-    return ListMetricsResponse(metrics=metrics)
+    if request.UseCatalog:
+        matches, age = get_catalog().find(cloudwatch, (get_region(), get_account()), request.Namespace,
+                                          request.MetricName, request.Dimensions)
+        if request.NextToken and not request.NextToken.isdigit():
+            raise ValueError(f"NextToken {request.NextToken!r} is not a catalog token; "
+                             "pass the next_token of a previous catalog lookup")
+        offset = int(request.NextToken or 0)
+        end = offset + request.MaxItems if request.MaxItems else len(matches)
+        next_token = str(end) if end < len(matches) else None
+        return ListMetricsResponse(metrics=matches[offset:end], next_token=next_token, catalog_age_seconds=age)
+
+    metrics, next_token = paginate(cloudwatch, "list_metrics", "Metrics",
+                                   limit=request.MaxItems, cursor=request.NextToken,
+                                   **request.dict(exclude_none=True, exclude={"MaxItems", "NextToken", "UseCatalog"}))
+    return ListMetricsResponse(metrics=metrics, next_token=next_token)
+
+
+@store.kubiya_action()
+def invalidate_metric_catalog(request: InvalidateMetricCatalogRequest) -> InvalidateMetricCatalogResponse:
+    """
+    Drops the catalog listing of a namespace, or of every namespace, so the next lookup lists it again.
+
+    Args:
+        request (InvalidateMetricCatalogRequest): The request containing the namespace to drop, if any.
+
+    Returns:
+        InvalidateMetricCatalogResponse: The number of listings dropped.
+    """
+    return InvalidateMetricCatalogResponse(invalidated=get_catalog().invalidate(request.Namespace))
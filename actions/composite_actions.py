@@ -0,0 +1,55 @@
+from ..models.composite_models import (
+    RunActionsRequest,
+    RunActionsResponse,
+    ActionCallResult,
+)
+
+from ..main_store import store
+from ..concurrency import imap_unordered
+from ..fanout import run_action
+
+import time
+from pydantic import BaseModel
+
+
+@store.kubiya_action()
+def run_actions(request: RunActionsRequest) -> RunActionsResponse:
+    """
+    Runs several actions concurrently (e.g. list_ec2_instances, list_clusters and list_functions).
+
+    The actions run side by side on worker threads, so the whole call takes
+    about as long as the slowest action. No event loop is involved, so the
+    action may itself run inside one. An action that fails or
+    exceeds `timeout_seconds` is reported with its error without failing the
+    others.
+
+    Args:
+        request (RunActionsRequest): The request containing the actions and their inputs.
+
+    Returns:
+        RunActionsResponse: The output or error and the duration of each action, in the order of the calls.
+    """
+    if any(call.action_name == "run_actions" for call in request.calls):
+        raise ValueError("`run_actions` cannot run itself")
+
+    start = time.monotonic()
+    started = {}
+
+    def run(index: int):
+        call = request.calls[index]
+        started[index] = time.monotonic()
+        return run_action(call.action_name, call.input)
+
+    outcomes = {}
+    for index, output, error in imap_unordered(run, range(len(request.calls)), max(len(request.calls), 1),
+                                               timeout=request.timeout_seconds):
+        outcomes[index] = (output, error, time.monotonic() - started.get(index, start))
+
+    results = []
+    for index, call in enumerate(request.calls):
+        output, error, seconds = outcomes[index]
+        if isinstance(output, BaseModel):
+            output = output.dict()
+        results.append(ActionCallResult(action_name=call.action_name, output=output,
+                                        error=str(error) if error else None, seconds=seconds))
+    return RunActionsResponse(results=results, seconds=time.monotonic() - start)
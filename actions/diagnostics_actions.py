@@ -0,0 +1,104 @@
+from ..models.diagnostics_models import (
+    ClientPoolStatsRequest,
+    ClientPoolStatsResponse,
+    MetricCacheStatsRequest,
+    MetricCacheStatsResponse,
+    RateLimiterStatsRequest,
+    RateLimiterStatsResponse,
+    OperationRateLimit,
+    PrometheusMetricsRequest,
+    PrometheusMetricsResponse,
+    ImportTimeReportRequest,
+    ImportTimeReportResponse,
+    ModuleImportTime,
+)
+
+from ..main_store import store
+from ..action_loader import import_time_report as get_import_time_report
+from ..aws_wrapper import client_pool_stats as get_client_pool_stats, assumed_role_stats
+from ..metric_cache import get_cache as get_metric_cache
+from ..rate_limits import get_rate_limiter
+from ..instrumentation import prometheus_text
+
+
+@store.kubiya_action()
+def client_pool_stats(request: ClientPoolStatsRequest) -> ClientPoolStatsResponse:
+    """
+    Reports how often actions reused a pooled boto3 client or assumed-role session.
+
+    Args:
+        request (ClientPoolStatsRequest): Empty request.
+
+    Returns:
+        ClientPoolStatsResponse: The hit, miss and eviction counters, the current pool size and the
+            assumed-role session cache counters.
+    """
+    return ClientPoolStatsResponse(**get_client_pool_stats(), assumed_roles=assumed_role_stats())
+
+
+@store.kubiya_action()
+def metric_cache_stats(request: MetricCacheStatsRequest) -> MetricCacheStatsResponse:
+    """
+    Reports how much of the get_metric_data traffic the metric cache served.
+
+    Args:
+        request (MetricCacheStatsRequest): Empty request.
+
+    Returns:
+        MetricCacheStatsResponse: The full, partial and missed lookups, the share of datapoints served
+            from the cache, the evictions and the current size.
+    """
+    return MetricCacheStatsResponse(**get_metric_cache().stats())
+
+
+@store.kubiya_action()
+def rate_limiter_stats(request: RateLimiterStatsRequest) -> RateLimiterStatsResponse:
+    """
+    Reports the client-side rate limit, throttles and waits of every AWS operation called so far.
+
+    Args:
+        request (RateLimiterStatsRequest): Empty request.
+
+    Returns:
+        RateLimiterStatsResponse: The rate and counters per (region, service, operation), and the
+            total throttles and wait time.
+    """
+    operations = [OperationRateLimit(**entry) for entry in get_rate_limiter().stats()]
+    return RateLimiterStatsResponse(operations=operations,
+                                    throttles=sum(o.throttles for o in operations),
+                                    wait_seconds=sum(o.wait_seconds for o in operations))
+
+
+@store.kubiya_action()
+def prometheus_metrics(request: PrometheusMetricsRequest) -> PrometheusMetricsResponse:
+    """
+    Exports the action and AWS call metrics in the Prometheus text format.
+
+    Covers the duration of every action, the duration, retries, status,
+    errors and response bytes of every AWS call per service and operation,
+    client build and credential times, and the client pool, assumed-role and
+    rate limiter gauges.
+
+    Args:
+        request (PrometheusMetricsRequest): Empty request.
+
+    Returns:
+        PrometheusMetricsResponse: The metrics in the Prometheus text exposition format.
+    """
+    return PrometheusMetricsResponse(text=prometheus_text())
+
+
+@store.kubiya_action()
+def import_time_report(request: ImportTimeReportRequest) -> ImportTimeReportResponse:
+    """
+    Reports the startup cost of every action module.
+
+    Args:
+        request (ImportTimeReportRequest): Empty request.
+
+    Returns:
+        ImportTimeReportResponse: The registration and import time of each module, slowest first.
+    """
+    modules = [ModuleImportTime(**entry) for entry in get_import_time_report()]
+    total_seconds = sum(m.register_seconds + m.import_seconds for m in modules)
+    return ImportTimeReportResponse(modules=modules, total_seconds=total_seconds)
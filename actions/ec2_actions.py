@@ -8,11 +8,29 @@ from ..models.ec2_models import (
     ListInstancesResponse,
     SecurityGroup,
     ListUnusedSecurityGroupsRequest,
-    ListUnusedSecurityGroupsResponse
+    ListUnusedSecurityGroupsResponse,
+    TerminateInstancesRequest,
+    TerminateInstancesResponse,
+    InstanceStateChange,
+    CreateInstancesRequest,
+    CreateInstancesResponse,
+    InstancePlacement,
 )
 
 from ..main_store import store
 from ..aws_wrapper import get_client
+from ..pagination import paginate, iter_items, iter_pages, compile_projection
+from ..concurrency import batched, imap_unordered
+
+from botocore.exceptions import ClientError
+from botocore.paginate import TokenDecoder, TokenEncoder
+
+# TerminateInstances accepts up to 1000 IDs per call
+_MAX_TERMINATE_BATCH = 1000
+
+# Errors caused by a single instance of a batch, which fail the whole call
+_INSTANCE_ERRORS = ("InvalidInstanceID.NotFound", "InvalidInstanceID.Malformed", "OperationNotPermitted")
+_CAPACITY_ERRORS = ("InsufficientInstanceCapacity", "InstanceLimitExceeded")
 
 
 @store.kubiya_action()
@@ -50,8 +68,129 @@ def create_ec2_instance(request: CreateInstanceRequest) -> CreateInstanceRespons
         MinCount=request.min_count,
         MaxCount=request.max_count,
     )
-    instance_id = response["Instances"][0]["InstanceId"]
-    return CreateInstanceResponse(instance_id=instance_id)
+    instance_ids = [instance["InstanceId"] for instance in response["Instances"]]
+    return CreateInstanceResponse(instance_id=instance_ids[0], instance_ids=instance_ids)
+
+
+@store.kubiya_action()
+def terminate_ec2_instances(request: TerminateInstancesRequest) -> TerminateInstancesResponse:
+    """
+    Terminates many EC2 instances at once.
+
+    The IDs are split into batches of `batch_size` (at most 1000) that are
+    sent concurrently. A batch rejected because of one bad or protected
+    instance is split in half until that instance is isolated, so every other
+    instance of the batch is still terminated.
+
+    Args:
+        request (TerminateInstancesRequest): The request containing the IDs of the EC2 instances to terminate.
+
+    Returns:
+        TerminateInstancesResponse: The state transition or the error of every instance.
+    """
+    ec2 = get_client("ec2")
+    instance_ids = list(dict.fromkeys(request.instance_ids))
+    batches = batched(instance_ids, min(request.batch_size, _MAX_TERMINATE_BATCH))
+
+    instances = []
+    for batch, changes, error in imap_unordered(lambda batch: _terminate_batch(ec2, batch), batches,
+                                                request.max_concurrency):
+        if error:
+            changes = [InstanceStateChange(instance_id=instance_id, error=str(error)) for instance_id in batch]
+        instances.extend(changes)
+
+    failed = sum(1 for change in instances if change.error)
+    return TerminateInstancesResponse(instances=instances, failed=failed)
+
+
+def _terminate_batch(ec2, instance_ids: List[str]) -> List[InstanceStateChange]:
+    try:
+        response = ec2.terminate_instances(InstanceIds=instance_ids)
+    except ClientError as e:
+        if len(instance_ids) == 1 or e.response["Error"]["Code"] not in _INSTANCE_ERRORS:
+            return [InstanceStateChange(instance_id=instance_id, error=str(e)) for instance_id in instance_ids]
+        middle = len(instance_ids) // 2
+        return _terminate_batch(ec2, instance_ids[:middle]) + _terminate_batch(ec2, instance_ids[middle:])
+
+    return [InstanceStateChange(instance_id=change["InstanceId"],
+                                previous_state=change["PreviousState"]["Name"],
+                                current_state=change["CurrentState"]["Name"])
+            for change in response["TerminatingInstances"]]
+
+
+@store.kubiya_action()
+def create_ec2_instances(request: CreateInstancesRequest) -> CreateInstancesResponse:
+    """
+    Launches many EC2 instances, spread over subnets.
+
+    The count is split evenly over `subnet_ids` and every subnet is launched
+    in parallel. When a subnet runs out of capacity for the instance type, the
+    fallback instance types are tried in order. Whatever is still missing
+    afterwards is retried once in the subnets that have capacity left.
+
+    Args:
+        request (CreateInstancesRequest): The request containing the details of the instances to create.
+
+    Returns:
+        CreateInstancesResponse: The IDs of every launched instance, where they were placed and
+            how many instances could not be launched.
+    """
+    ec2 = get_client("ec2")
+    subnet_ids = request.subnet_ids or [None]
+    instance_types = [request.instance_type] + (request.fallback_instance_types or [])
+    exhausted = {subnet_id: set() for subnet_id in subnet_ids}
+    placements = []
+    errors = []
+
+    def launch(share: tuple) -> int:
+        subnet_id, count = share
+        for instance_type in instance_types:
+            if count == 0:
+                break
+            if instance_type in exhausted[subnet_id]:
+                continue
+            params = {"SubnetId": subnet_id} if subnet_id else {}
+            try:
+                response = ec2.run_instances(ImageId=request.image_id, InstanceType=instance_type,
+                                             MinCount=1, MaxCount=count, **params)
+            except ClientError as e:
+                if e.response["Error"]["Code"] not in _CAPACITY_ERRORS:
+                    raise
+                exhausted[subnet_id].add(instance_type)
+                continue
+            instance_ids = [instance["InstanceId"] for instance in response["Instances"]]
+            placements.append(InstancePlacement(subnet_id=subnet_id, instance_type=instance_type,
+                                                instance_ids=instance_ids))
+            count -= len(instance_ids)
+        return count
+
+    shares = [(subnet_id, request.count // len(subnet_ids) + (1 if i < request.count % len(subnet_ids) else 0))
+              for i, subnet_id in enumerate(subnet_ids)]
+    for (subnet_id, _), _, error in imap_unordered(launch, shares, request.max_concurrency):
+        if error:
+            launched = sum(len(placement.instance_ids) for placement in placements if placement.subnet_id == subnet_id)
+            errors.append(f"{subnet_id or 'default subnet'}: {error} ({launched} instances launched before it)")
+            exhausted[subnet_id].update(instance_types)
+
+    # The shortfall counts the instances actually launched: a launch that fails
+    # may follow successful ones in the same subnet.
+    def missing() -> int:
+        return request.count - sum(len(placement.instance_ids) for placement in placements)
+
+    # Second chance for what could not be placed, in subnets with capacity left
+    for subnet_id in subnet_ids:
+        if missing() <= 0:
+            break
+        if len(exhausted[subnet_id]) < len(instance_types):
+            try:
+                launch((subnet_id, missing()))
+            except ClientError as e:
+                errors.append(f"{subnet_id or 'default subnet'}: {e}")
+
+    instance_ids = [instance_id for placement in placements for instance_id in placement.instance_ids]
+    shortfall = max(request.count - len(instance_ids), 0)
+    return CreateInstancesResponse(instance_ids=instance_ids, placements=placements,
+                                   shortfall=shortfall, errors=errors)
 
 
 @store.kubiya_action()
@@ -59,6 +198,12 @@ def list_ec2_instances(request: ListInstancesRequest) -> ListInstancesResponse:
     """
     Lists EC2 instances based on the specified filters.
 
+    All pages are fetched unless `max_results` is set, in which case at most
+    that many instances are returned and `next_token` resumes the listing,
+    also from the middle of a reservation.
+    With `fields`, each instance is reduced to the JMESPath projection as its
+    page is read, so only the projected data is kept and returned.
+
     Args:
         request (ListInstancesRequest): The request containing the filters.
 
@@ -72,11 +217,34 @@ def list_ec2_instances(request: ListInstancesRequest) -> ListInstancesResponse:
     if request.instance_types:
         filters.append({'Name': 'instance-type', 'Values': request.instance_types})
     # Add more filters as needed...
-    response = ec2.describe_instances(Filters=filters)
+    instances, next_token = _list_instances(ec2, filters, request.max_results, request.next_token, request.fields)
+    return ListInstancesResponse(instances=instances, next_token=next_token)
+
+
+def _list_instances(ec2, filters: list, limit: int, cursor: str, fields: str) -> tuple:
+    # DescribeInstances pages hold reservations, which hold instances. The cursor
+    # is the NextToken of the page to resume from and the instances of it to skip.
+    projection = compile_projection(fields)
+    state = TokenDecoder().decode(cursor) if cursor else {}
+    token, skip = state.get("NextToken"), state.get("instance_offset", 0)
     instances = []
-    for reservation in response["Reservations"]:
-        instances.extend(reservation["Instances"])
-    return ListInstancesResponse(instances=instances)
+    # DescribeInstances takes page sizes of 5 to 1000
+    page_size = max(5, min(limit, 1000)) if limit else None
+    pages = iter_pages(ec2, "describe_instances", cursor=TokenEncoder().encode({"NextToken": token}) if token else None,
+                       page_size=page_size, Filters=filters)
+    for page in pages:
+        page_instances = [instance for reservation in page["Reservations"] for instance in reservation["Instances"]]
+        taken = page_instances[skip:] if limit is None else page_instances[skip:skip + limit - len(instances)]
+        offset = skip + len(taken)
+        if projection:
+            taken = [projection.search(instance) for instance in taken]
+        instances.extend(taken)
+        if offset < len(page_instances):
+            return instances, TokenEncoder().encode({"NextToken": token, "instance_offset": offset})
+        token, skip = page.get("NextToken"), 0
+        if limit is not None and len(instances) >= limit:
+            return instances, TokenEncoder().encode({"NextToken": token}) if token else None
+    return instances, None
 
 
 @store.kubiya_action()
@@ -84,30 +252,40 @@ def list_unused_security_groups(r: ListUnusedSecurityGroupsRequest) -> ListUnuse
     """
     Lists unused security groups in the specified region.
 
+    A group is in use when it is attached to any network interface (instances,
+    Lambda, RDS, load balancers, ...) or referenced by a rule of another group.
+    Default groups are never reported. Network interfaces are streamed page by
+    page, so memory only grows with the number of security groups.
+
     Args:
-        request (ListUnusedSecurityGroupsRequest): The request containing the region.
+        request (ListUnusedSecurityGroupsRequest): The request containing the optional VPC ID.
 
     Returns:
         ListUnusedSecurityGroupsResponse: The response containing the list of unused security groups.
     """
     ec2_client = get_client("ec2")
+    filters = [{'Name': 'vpc-id', 'Values': [r.vpc_id]}] if r.vpc_id else None
 
-    # Get all EC2 instances
-    instances = ec2_client.describe_instances()
+    # Group IDs are hex numbers, join them as ints rather than strings
+    groups = {}
+    used = set()
+    for sg in iter_items(ec2_client, "describe_security_groups", "SecurityGroups", page_size=1000, Filters=filters):
+        group = _sg_key(sg['GroupId'])
+        groups[group] = SecurityGroup(id=sg['GroupId'], name=sg['GroupName'])
+        if sg['GroupName'] == 'default':
+            used.add(group)
+        for permission in sg.get('IpPermissions', []) + sg.get('IpPermissionsEgress', []):
+            for pair in permission.get('UserIdGroupPairs', []):
+                if pair.get('GroupId') and pair['GroupId'] != sg['GroupId']:
+                    used.add(_sg_key(pair['GroupId']))
 
-    # # Get all security groups
-    all_sgs = ec2_client.describe_security_groups()['SecurityGroups']
+    for group_id in iter_items(ec2_client, "describe_network_interfaces", "NetworkInterfaces[].Groups[].GroupId",
+                               page_size=1000, Filters=filters):
+        used.add(_sg_key(group_id))
 
-    # # Get all security groups associated with instances
-    used_sg_ids = set()
-    for reservation in instances['Reservations']:
-        for instance in reservation['Instances']:
-            for sg in instance['SecurityGroups']:
-                used_sg_ids.add(sg['GroupId'])
+    unused = sorted(groups.keys() - used)
+    return ListUnusedSecurityGroupsResponse(unused=[groups[group] for group in unused])
 
-    # # Filter unused security groups
-    unused_sgs = [sg for sg in all_sgs if sg['GroupId'] not in used_sg_ids]
 
-    # Convert to list of SecurityGroup classes
-    return ListUnusedSecurityGroupsResponse(
-        unused=[SecurityGroup(id=sg['GroupId'], name=sg['GroupName']) for sg in unused_sgs])
+def _sg_key(group_id: str) -> int:
+    return int(group_id[3:], 16)
@@ -1,3 +1,5 @@
+import os
+
 from ..models.ecr_models import (
     CreateRepositoryRequest,
     CreateRepositoryResponse,
@@ -11,7 +13,11 @@ from ..models.ecr_models import (
     FindImagesResponse,
 )
 from ..main_store import store
-from ..aws_wrapper import get_client
+from ..aws_wrapper import get_client, get_region, get_account
+from ..pagination import paginate
+from ..ecr_index import compile_regex, get_index
+
+_INDEX_TTL_SECONDS = int(os.getenv("ECR_INDEX_TTL_SECONDS", "300"))
 
 @store.kubiya_action()
 def create_repository(request: CreateRepositoryRequest) -> CreateRepositoryResponse:
@@ -58,9 +64,10 @@ def describe_repositories(request: DescribeRepositoriesRequest) -> DescribeRepos
         DescribeRepositoriesResponse: The response containing the list of repositories.
     """
     ecr = get_client("ecr")
-    response = ecr.describe_repositories(repositoryNames=request.repository_names)
-    repositories = response["repositories"]
-    return DescribeRepositoriesResponse(repositories=repositories)
+    repositories, next_token = paginate(ecr, "describe_repositories", "repositories",
+                                        limit=request.max_results, cursor=request.next_token,
+                                        repositoryNames=request.repository_names)
+    return DescribeRepositoriesResponse(repositories=repositories, next_token=next_token)
 
 
 @store.kubiya_action()
@@ -75,14 +82,14 @@ def list_images(request: ListImagesRequest) -> ListImagesResponse:
         ListImagesResponse: The response containing the list of images.
     """
     ecr = get_client("ecr")
-    response = ecr.list_images(
-        repositoryName=request.repository_name,
-        filterTags=request.filter_tags,
-        maxResults=request.max_results,
-        nextToken=request.next_token,
-    )
-    images = response["imageIds"]
-    return ListImagesResponse(images=images)
+    # ListImages takes a single filter object, e.g. {"tagStatus": "TAGGED"}
+    image_filter = None
+    if request.filter_tags:
+        image_filter = {key: value for f in request.filter_tags for key, value in f.items()}
+    images, next_token = paginate(ecr, "list_images", "imageIds",
+                                  limit=request.max_results, cursor=request.next_token,
+                                  repositoryName=request.repository_name, filter=image_filter)
+    return ListImagesResponse(images=images, next_token=next_token)
 
 
 @store.kubiya_action()
@@ -90,29 +97,27 @@ def find_images(request: FindImagesRequest) -> FindImagesResponse:
     """
     Finds images in ECR repositories based on a search pattern.
 
+    Searches are answered from a local index of the registry, which is
+    refreshed incrementally once it is older than `ECR_INDEX_TTL_SECONDS`.
+    Setting `refresh` forces a full live re-scan of every repository first.
+    Each account and region has its own index.
+
+    Incremental refreshes need `cloudtrail:LookupEvents` (limited to 2 calls
+    per second per account and region) and `ecr:ListImages` besides the usual
+    ECR read permissions; without CloudTrail access every refresh is a full one.
+
     Args:
-        request (FindImagesRequest): The request containing the search pattern.
+        request (FindImagesRequest): The request containing the search pattern and how to match it.
 
     Returns:
         FindImagesResponse: The response containing the list of matched images.
     """
-    ecr = get_client("ecr")
-    response = ecr.describe_repositories()
-    repositories = response["repositories"]
-    matched_images = []
-
-    for repository in repositories:
-        repository_name = repository["repositoryName"]
-        images_response = ecr.list_images(repositoryName=repository_name)
-        images = images_response["imageIds"]
-
-        for image in images:
-            image_tag = image.get("imageTag")
-            if image_tag and request.search_pattern in image_tag:
-                matched_images.append({
-                    "repositoryName": repository_name,
-                    "imageDigest": image["imageDigest"],
-                    "imageTag": image_tag,
-                })
-
-    return FindImagesResponse(matched_images=matched_images)
\ No newline at end of file
+    if request.match == "regex":
+        compile_regex(request.search_pattern)
+    index = get_index()
+    scope = get_account()
+    account, region = scope[0] if scope else "", get_region()
+    index_refresh = index.ensure_fresh(get_client("ecr"), get_client("cloudtrail"), account, region,
+                                       _INDEX_TTL_SECONDS, request.max_concurrency, full=request.refresh)
+    matched_images = index.search(account, region, request.search_pattern, request.match, request.limit)
+    return FindImagesResponse(matched_images=matched_images, index_refresh=index_refresh)
@@ -10,6 +10,7 @@ from ..models.ecs_models import (
 )
 from ..main_store import store
 from ..aws_wrapper import get_client, get_client
+from ..pagination import paginate
 from botocore.exceptions import ClientError
 
 
@@ -80,12 +81,12 @@ def list_task_definitions(request: ListTaskDefinitionsRequest) -> ListTaskDefini
         ListTaskDefinitionsResponse: The response containing the list of task definitions.
     """
     ecs = get_client("ecs")
-    response = ecs.list_task_definitions(
+    task_definitions, next_token = paginate(
+        ecs, "list_task_definitions", "taskDefinitionArns",
+        limit=request.max_results,
+        cursor=request.next_token,
         familyPrefix=request.family_prefix,
         status=request.status,
         sort=request.sort,
-        maxResults=request.max_results,
-        nextToken=request.next_token,
     )
-    task_definitions = response["taskDefinitionArns"]
-    return ListTaskDefinitionsResponse(task_definitions=task_definitions)
\ No newline at end of file
+    return ListTaskDefinitionsResponse(task_definitions=task_definitions, next_token=next_token)
\ No newline at end of file
@@ -11,6 +11,7 @@ from ..models.eks_models import (
 
 from ..main_store import store
 from ..aws_wrapper import get_client
+from ..pagination import paginate, project
 
 
 @store.kubiya_action()
@@ -51,6 +52,8 @@ def describe_cluster(request: DescribeClusterRequest) -> DescribeClusterResponse
     """
     Describes an Amazon EKS cluster.
 
+    With `fields`, only the JMESPath projection of the cluster is returned.
+
     Args:
         request (DescribeClusterRequest): The request containing the name of the cluster.
 
@@ -59,7 +62,7 @@ def describe_cluster(request: DescribeClusterRequest) -> DescribeClusterResponse
     """
     eks = get_client("eks")
     response = eks.describe_cluster(name=request.cluster_name)
-    cluster = response["cluster"]
+    cluster = project(response["cluster"], request.fields)
     return DescribeClusterResponse(cluster=cluster)
 
 
@@ -75,7 +78,7 @@ def list_clusters(request: ListClustersRequest) -> ListClustersResponse:
         ListClustersResponse: The response containing the list of cluster names.
     """
     eks = get_client("eks")
-    response = eks.list_clusters()
-    clusters = response["clusters"]
-    return ListClustersResponse(clusters=clusters)
+    clusters, next_token = paginate(eks, "list_clusters", "clusters",
+                                    limit=request.max_results, cursor=request.next_token)
+    return ListClustersResponse(clusters=clusters, next_token=next_token)
 
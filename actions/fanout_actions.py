@@ -0,0 +1,82 @@
+from collections import Counter
+
+from ..models.fanout_models import (
+    FanOutRegionsRequest,
+    FanOutRegionsResponse,
+    FanOutAccountsRequest,
+    FanOutAccountsResponse,
+)
+
+from ..main_store import store
+from ..fanout import enabled_regions, run_in_accounts, run_in_regions, tag_output
+
+
+@store.kubiya_action()
+def fan_out_regions(request: FanOutRegionsRequest) -> FanOutRegionsResponse:
+    """
+    Runs a read-only action (e.g. list_ec2_instances) in several regions concurrently.
+
+    The results of every region are merged and each item is tagged with its
+    region. A region that fails or exceeds `timeout_seconds` is reported in
+    `errors` without failing the others.
+
+    Args:
+        request (FanOutRegionsRequest): The request containing the action, its input and the regions.
+
+    Returns:
+        FanOutRegionsResponse: The merged results, the regions that succeeded and the errors by region.
+    """
+    regions = request.regions or enabled_regions()
+    results = {}
+    succeeded = []
+    errors = {}
+    for region, output, error in run_in_regions(request.action_name, request.input, regions,
+                                               request.max_concurrency, request.timeout_seconds):
+        if error:
+            errors[region] = str(error)
+            continue
+        succeeded.append(region)
+        for name, items in tag_output(output, region=region).items():
+            results.setdefault(name, []).extend(items)
+
+    return FanOutRegionsResponse(results=results, regions=sorted(succeeded), errors=errors)
+
+
+@store.kubiya_action()
+def fan_out_accounts(request: FanOutAccountsRequest) -> FanOutAccountsResponse:
+    """
+    Runs an action (e.g. describe_workspaces) in several accounts concurrently.
+
+    The action runs with the assumed role of each account, at most
+    `max_concurrency` accounts at a time. Assumed sessions are cached, so
+    repeated fan-outs do not assume the roles again. The results of every
+    account are merged and each item is tagged with its account ID. An
+    account that fails or exceeds `timeout_seconds` is reported in `errors`.
+
+    Args:
+        request (FanOutAccountsRequest): The request containing the action, its input and the accounts.
+
+    Returns:
+        FanOutAccountsResponse: The merged results, the accounts that succeeded and the errors by account.
+
+    Raises:
+        ValueError: If an account is listed more than once, as results are keyed by account ID.
+    """
+    accounts = [(account.account_id, account.role_name) for account in request.accounts]
+    counts = Counter(account_id for account_id, _ in accounts)
+    duplicates = sorted(account_id for account_id, count in counts.items() if count > 1)
+    if duplicates:
+        raise ValueError(f"Accounts listed more than once: {', '.join(duplicates)}")
+    results = {}
+    succeeded = []
+    errors = {}
+    for (account_id, _), output, error in run_in_accounts(request.action_name, request.input, accounts,
+                                                          request.max_concurrency, request.timeout_seconds):
+        if error:
+            errors[account_id] = str(error)
+            continue
+        succeeded.append(account_id)
+        for name, items in tag_output(output, account_id=account_id).items():
+            results.setdefault(name, []).extend(items)
+
+    return FanOutAccountsResponse(results=results, accounts=sorted(succeeded), errors=errors)
@@ -1,25 +1,17 @@
 from typing import List
 
-import boto3
-from pydantic import BaseModel
-
+from ..models.health_models import (
+    HealthRequest,
+    HealthResponse,
+)
 from ..main_store import store as s
+from ..aws_wrapper import get_client
 # from ..aws.actions import action_store as s
 
 
-class HealthRequest(BaseModel):
-    pass
-
-
-class HealthResponse(BaseModel):
-    params: bool
-    connection: bool
-    errors: List[str]
-
-
 @s.kubiya_action()
 def health_check(_: HealthRequest) -> HealthResponse:
-    errors = List[str]
+    errors = []
     params = _validate_params(errors)
     connection = _validate_conn(errors)
     return HealthResponse(params=params, connection=connection, errors=errors)
@@ -27,16 +19,10 @@ def health_check(_: HealthRequest) -> HealthResponse:
 
 def _validate_conn(e: List[str]) -> bool:
     try:
-        c = boto3.client(
-            "ecs",
-            aws_access_key_id=s.secrets["AWS_ACCESS_KEY_ID"],
-            aws_secret_access_key=s.secrets["AWS_SECRET_ACCESS_KEY"],
-            aws_session_token=s.secrets["AWS_SESSION_TOKEN"],
-            region_name=s.secrets["AWS_DEFAULT_REGION"],
-        )
+        c = get_client("ecs", region=s.secrets["AWS_DEFAULT_REGION"])
         return c.list_clusters().get("clusterArns") is not None
-    except Exception as e:
-        e.append(f"faild to connect to aws: {str(e)}")
+    except Exception as err:
+        e.append(f"faild to connect to aws: {str(err)}")
         return False
 
 
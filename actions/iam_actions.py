@@ -14,8 +14,14 @@ from ..models.iam_models import (
 )
 from ..main_store import store
 from ..aws_wrapper import get_resource, get_client
+from ..pagination import paginate, iter_items
 import json
 
+# Up to this many users are looked up one by one; more are found in a listing of every user
+_MAX_USER_LOOKUPS = 10
+# The user attributes ListUsers returns; GetUser results are trimmed to them so both paths match
+_LISTED_USER_FIELDS = ("Path", "UserName", "UserId", "Arn", "CreateDate", "PasswordLastUsed")
+
 
 @store.kubiya_action()
 def create_user(request: CreateUserRequest) -> CreateUserResponse:
@@ -55,6 +61,13 @@ def list_users(request: ListUsersRequest) -> ListUsersResponse:
     """
     Lists IAM users based on the specified filters.
 
+    A few usernames are looked up one by one. For more of them, every user is
+    listed 1000 per page and the requested ones are picked out, so the number
+    of calls depends on the size of the account instead of the number of
+    usernames. Either way, an unknown username fails with NoSuchEntity, and
+    users hold the attributes ListUsers returns (no tags or permissions
+    boundary).
+
     Args:
         request (ListUsersRequest): The request containing the filters.
 
@@ -63,13 +76,20 @@ def list_users(request: ListUsersRequest) -> ListUsersResponse:
     """
     iam = get_client("iam")
     users = []
+    next_token = None
     if request.usernames:
-        for username in request.usernames:
-            user = iam.get_user(UserName=username)["User"]
-            users.append(user)
+        found = {}
+        if len(request.usernames) > _MAX_USER_LOOKUPS:
+            wanted = set(request.usernames)
+            found = {user["UserName"]: user for user in iter_items(iam, "list_users", "Users", page_size=1000)
+                     if user["UserName"] in wanted}
+        # Users missing from the listing may have been created since; GetUser settles it.
+        users = [found[username] if username in found else _listed_fields(iam.get_user(UserName=username)["User"])
+                 for username in request.usernames]
     else:
-        users = iam.list_users()["Users"]
-    return ListUsersResponse(users=users)
+        users, next_token = paginate(iam, "list_users", "Users",
+                                     limit=request.max_results, cursor=request.next_token)
+    return ListUsersResponse(users=users, next_token=next_token)
 
 
 @store.kubiya_action()
@@ -161,3 +181,7 @@ def grant_s3_access(request: S3AccessRequest) -> S3AccessResponse:
         message = f"Read and write permissions granted for {request.user_name} on {bucket_name}"
 
     return S3AccessResponse(message=message)
+
+
+def _listed_fields(user: dict) -> dict:
+    return {field: user[field] for field in _LISTED_USER_FIELDS if field in user}
@@ -10,6 +10,7 @@ from ..models.lambda_models import (
 )
 from ..main_store import store
 from ..aws_wrapper import get_client
+from ..pagination import paginate, project
 
 
 @store.kubiya_action()
@@ -50,6 +51,8 @@ def get_function(request: GetFunctionRequest) -> GetFunctionResponse:
     """
     Retrieves the configuration information of an AWS Lambda function.
 
+    With `fields`, only the JMESPath projection of the configuration is returned.
+
     Args:
         request (GetFunctionRequest): The request containing the name of the function.
 
@@ -58,7 +61,7 @@ def get_function(request: GetFunctionRequest) -> GetFunctionResponse:
     """
     lambda_client = get_client("lambda")
     response = lambda_client.get_function(FunctionName=request.function_name)
-    function = response["Configuration"]
+    function = project(response["Configuration"], request.fields)
     return GetFunctionResponse(function=function)
 
 
@@ -74,6 +77,6 @@ def list_functions(request: ListFunctionsRequest) -> ListFunctionsResponse:
         ListFunctionsResponse: The response containing the list of function names.
     """
     lambda_client = get_client("lambda")
-    response = lambda_client.list_functions()
-    functions = [function["FunctionName"] for function in response["Functions"]]
-    return ListFunctionsResponse(functions=functions)
+    functions, next_token = paginate(lambda_client, "list_functions", "Functions[].FunctionName",
+                                     limit=request.max_results, cursor=request.next_token)
+    return ListFunctionsResponse(functions=functions, next_token=next_token)
@@ -5,6 +5,7 @@ from ..models.route53_models import (
 
 from ..main_store import store
 from ..aws_wrapper import get_resource ,get_client
+from ..pagination import paginate
 
 
 @store.kubiya_action()
@@ -26,8 +27,13 @@ def list_hosted_zones(request: ListHostedZonesListRequest) -> ListHostedZonesLis
         SomeException: This function may raise an exception if something goes wrong.
     """
     route53 = get_client("route53")
-    response = route53.list_hosted_zones()
-    return ListHostedZonesListResponse(message=response)
+    hosted_zones, next_token = paginate(
+        route53, "list_hosted_zones", "HostedZones",
+        limit=int(request.max_items) if request.max_items else None,
+        cursor=request.marker,
+        DelegationSetId=request.delegation_set_id,
+    )
+    return ListHostedZonesListResponse(message={"HostedZones": hosted_zones}, next_token=next_token)
 
 @store.kubiya_action()
 def create_hosted_zone(request: CreateHostedZonesRequest) -> CreateHostedZonesResponse:
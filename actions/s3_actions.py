@@ -1,13 +1,57 @@
 from ..models.s3_models import (
     S3MoveObjectRequest,
     S3MoveObjectResponse,
+    S3SyncPrefixRequest,
+    S3SyncPrefixResponse,
+    S3SyncFailure,
+    S3ScanBucketRequest,
+    S3ScanBucketResponse,
+    S3PrefixSummary,
+    S3DeleteObjectsRequest,
+    S3DeleteObjectsResponse,
+    S3DeleteFailure,
     S3CreateBucketRequest,
     S3CreateBucketResponse
 )
 from ..main_store import store
 from ..aws_wrapper import get_client
+from ..s3_copy import MB, copy_object, diff_prefixes, is_unchanged
+from ..concurrency import batched, imap_unordered
+from ..pagination import iter_items, iter_pages
 
-from botocore.exceptions import NoCredentialsError
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import timezone
+
+from dateutil import parser as date_parser
+
+from botocore.exceptions import ClientError, NoCredentialsError
+
+logger = logging.getLogger(__name__)
+
+_PROGRESS_INTERVAL_SECONDS = 10
+_MAX_REPORTED_FAILURES = 100
+
+# DeleteObjects takes up to 1000 keys; per-key errors with these codes are retried.
+_DELETE_BATCH_SIZE = 1000
+_RETRYABLE_DELETE_ERRORS = ("InternalError", "SlowDown", "ServiceUnavailable", "RequestTimeout")
+_RETRY_BASE_DELAY = 1.0
+
+# Boundaries for splitting a flat key space into ranges listed in parallel
+_RANGE_BOUNDARIES = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+
+# NDJSON scan outputs are written to new files in this directory
+_SCAN_OUTPUT_DIR = os.getenv("S3_SCAN_OUTPUT_DIR", tempfile.gettempdir())
+
+# Keys under `prefix`, after `start_after` and up to `end` (inclusive); only
+# the keys directly under the prefix when `shallow` is set.
+_Partition = namedtuple("_Partition", ["prefix", "shallow", "start_after", "end"])
 
 
 @store.kubiya_action()
@@ -15,28 +59,374 @@ def copy_object_to_s3(request: S3MoveObjectRequest) -> S3MoveObjectResponse:
     """
     Copies an object from one S3 bucket to another.
 
+    Objects of `multipart_threshold_mb` and above (including those over the
+    5 GB CopyObject limit) are copied as a managed multipart copy, with
+    `max_concurrency` ranges copied in parallel; their metadata and tags
+    are preserved.
+
     Args:
         request (S3MoveObjectRequest): The request containing the details for the S3 object move.
 
     Returns:
-        S3MoveObjectResponse: The response indicating the result of the object move.
+        S3MoveObjectResponse: The response indicating the result of the object move, with its size,
+            part count and throughput.
     """
     s3 = get_client('s3')
 
     try:
-        s3.copy_object(
-            CopySource={'Bucket': request.source_bucket, 'Key': request.object_key},
-            Bucket=request.destination_bucket,
-            Key=request.object_key
-        )
+        start = time.monotonic()
+        result = copy_object(s3, request.source_bucket, request.object_key, request.destination_bucket,
+                             request.object_key, multipart_threshold=request.multipart_threshold_mb * MB,
+                             part_size=request.part_size_mb * MB, max_concurrency=request.max_concurrency)
+        seconds = time.monotonic() - start
 
         message = f"Object '{request.object_key}' copied from '{request.source_bucket}' to '{request.destination_bucket}'."
-        return S3MoveObjectResponse(message=message)
+        return S3MoveObjectResponse(message=message, bytes_copied=result["bytes"], parts=result["parts"],
+                                    seconds=seconds,
+                                    throughput_bytes_per_second=result["bytes"] / seconds if seconds else None)
     except NoCredentialsError:
         message = "Credentials not available. Unable to move the object."
         return S3MoveObjectResponse(message=message)
     
 
+@store.kubiya_action()
+def sync_s3_prefix(request: S3SyncPrefixRequest) -> S3SyncPrefixResponse:
+    """
+    Copies the objects of a prefix to another bucket or prefix, skipping the ones already there.
+
+    The source and destination listings are streamed and merge-joined by key,
+    and an object is copied when its size or ETag differs from the
+    destination. Copies run on a bounded worker pool fed from the listing, so
+    memory stays flat however many keys the prefix holds. Progress is logged
+    every few seconds.
+
+    Args:
+        request (S3SyncPrefixRequest): The request containing the source and destination prefixes.
+
+    Returns:
+        S3SyncPrefixResponse: The number of keys listed, copied, skipped and failed, the bytes copied
+            and the first failures.
+    """
+    s3 = get_client('s3')
+    destination_prefix = request.source_prefix if request.destination_prefix is None else request.destination_prefix
+    counts = {"listed": 0, "copied": 0, "skipped": 0, "failed": 0, "only_in_destination": 0, "bytes_copied": 0}
+    failures = []
+
+    def to_copy():
+        for relative_key, source, destination in diff_prefixes(s3, request.source_bucket, request.source_prefix,
+                                                               request.destination_bucket, destination_prefix):
+            if source is None:
+                counts["only_in_destination"] += 1
+                continue
+            counts["listed"] += 1
+            if is_unchanged(source, destination):
+                counts["skipped"] += 1
+            elif request.dry_run:
+                counts["copied"] += 1
+                counts["bytes_copied"] += source["Size"]
+            else:
+                yield relative_key, source
+
+    def copy(item: tuple) -> dict:
+        relative_key, source = item
+        # The listing is enough to copy small objects; large ones are headed for their metadata.
+        head = {"ContentLength": source["Size"], "ETag": source["ETag"],
+                "StorageClass": source.get("StorageClass") if source.get("StorageClass") != "STANDARD" else None}
+        return copy_object(s3, request.source_bucket, source["Key"], request.destination_bucket,
+                           destination_prefix + relative_key,
+                           multipart_threshold=request.multipart_threshold_mb * MB,
+                           part_size=request.part_size_mb * MB, max_concurrency=4,
+                           head=head if source["Size"] < request.multipart_threshold_mb * MB else None)
+
+    start = last_progress = time.monotonic()
+    for (relative_key, source), result, error in imap_unordered(copy, to_copy(), request.max_concurrency):
+        if error:
+            counts["failed"] += 1
+            if len(failures) < _MAX_REPORTED_FAILURES:
+                failures.append(S3SyncFailure(key=source["Key"], error=str(error)))
+            logger.warning("Copying s3://%s/%s failed: %s", request.source_bucket, source["Key"], error)
+        else:
+            counts["copied"] += 1
+            counts["bytes_copied"] += result["bytes"]
+
+        now = time.monotonic()
+        if now - last_progress >= _PROGRESS_INTERVAL_SECONDS:
+            last_progress = now
+            logger.info("Syncing s3://%s/%s: %d listed, %d copied, %d skipped, %d failed, %.0f bytes/s",
+                        request.source_bucket, request.source_prefix, counts["listed"], counts["copied"],
+                        counts["skipped"], counts["failed"], counts["bytes_copied"] / (now - start))
+
+    seconds = time.monotonic() - start
+    message = (f"Synced s3://{request.source_bucket}/{request.source_prefix} to "
+               f"s3://{request.destination_bucket}/{destination_prefix}.")
+    return S3SyncPrefixResponse(message=message, seconds=seconds,
+                                bytes_per_second=counts["bytes_copied"] / seconds if seconds else 0.0,
+                                failures=failures, **counts)
+
+
+@store.kubiya_action()
+def scan_s3_bucket(request: S3ScanBucketRequest) -> S3ScanBucketResponse:
+    """
+    Lists or inventories the objects of a bucket, listing key-space partitions in parallel.
+
+    Partitions are discovered by probing the key space with the delimiter,
+    breadth first, until there are `target_partitions` of them; a prefix
+    with more than a page of objects and sub-prefixes is split into key
+    ranges instead. The partitions
+    are then listed concurrently. The objects are either written as NDJSON
+    to a new file under `S3_SCAN_OUTPUT_DIR` as they are listed, or
+    aggregated into object counts and bytes per prefix, so the key list is
+    never held in memory.
+
+    Args:
+        request (S3ScanBucketRequest): The request containing the bucket, prefix and output mode.
+
+    Returns:
+        S3ScanBucketResponse: The number of partitions, objects and bytes scanned, and the NDJSON path or
+            the per-prefix summary.
+    """
+    s3 = get_client('s3')
+    start = time.monotonic()
+    partitions = _discover_partitions(s3, request.bucket, request.prefix, request.delimiter,
+                                      request.target_partitions or request.max_concurrency * 4)
+
+    output_path = None
+    output = None
+    write_lock = threading.Lock()
+    if request.output == "ndjson":
+        os.makedirs(_SCAN_OUTPUT_DIR, exist_ok=True)
+        fd, output_path = tempfile.mkstemp(prefix="s3-scan-", suffix=".ndjson", dir=_SCAN_OUTPUT_DIR)
+        output = os.fdopen(fd, "w")
+
+    def scan(partition: _Partition) -> tuple:
+        objects = size = 0
+        groups = {}
+        for contents in _list_partition(s3, request.bucket, request.delimiter, partition):
+            objects += len(contents)
+            size += sum(item["Size"] for item in contents)
+            if output is not None:
+                lines = "".join(json.dumps({
+                    "key": item["Key"],
+                    "size": item["Size"],
+                    "etag": item["ETag"],
+                    "last_modified": item["LastModified"].isoformat(),
+                    "storage_class": item.get("StorageClass"),
+                }) + "\n" for item in contents)
+                with write_lock:
+                    output.write(lines)
+            else:
+                for item in contents:
+                    group = groups.setdefault(_group(item["Key"], request.prefix, request.delimiter,
+                                                     request.group_depth), [0, 0])
+                    group[0] += 1
+                    group[1] += item["Size"]
+        return objects, size, groups
+
+    objects = size = 0
+    groups = {}
+    try:
+        for _, result, error in imap_unordered(scan, partitions, request.max_concurrency):
+            if error:
+                raise error
+            objects += result[0]
+            size += result[1]
+            for prefix, (count, group_size) in result[2].items():
+                group = groups.setdefault(prefix, [0, 0])
+                group[0] += count
+                group[1] += group_size
+    finally:
+        if output is not None:
+            output.close()
+
+    prefixes = [S3PrefixSummary(prefix=prefix, objects=count, bytes=group_size)
+                for prefix, (count, group_size) in sorted(groups.items())]
+    message = f"Scanned {objects} objects in s3://{request.bucket}/{request.prefix} over {len(partitions)} partitions."
+    return S3ScanBucketResponse(message=message, partitions=len(partitions), objects=objects, bytes=size,
+                                seconds=time.monotonic() - start, output_path=output_path, prefixes=prefixes)
+
+
+def _discover_partitions(s3, bucket: str, prefix: str, delimiter: str, target: int) -> list:
+    if not delimiter:
+        return _range_partitions(prefix)
+
+    partitions, queue = [], deque([prefix])
+    while queue and len(partitions) + len(queue) < target:
+        probe = queue.popleft()
+        # Only the first page is read: a prefix with more than a page of
+        # sub-prefixes and direct objects is split by key range instead, so
+        # none of its listing happens serially here or twice.
+        page = next(iter(iter_pages(s3, "list_objects_v2", Bucket=bucket, Prefix=probe, Delimiter=delimiter,
+                                    page_size=1000)))
+        children = [common_prefix["Prefix"] for common_prefix in page.get("CommonPrefixes", [])]
+        has_objects = bool(page.get("Contents"))
+
+        if page.get("IsTruncated"):
+            partitions.extend(_range_partitions(probe))
+        elif children:
+            queue.extend(children)
+            if has_objects:
+                partitions.append(_Partition(probe, True, None, None))
+        elif has_objects:
+            partitions.append(_Partition(probe, False, None, None))
+
+    partitions.extend(_Partition(probe, False, None, None) for probe in queue)
+    return partitions
+
+
+def _range_partitions(prefix: str) -> list:
+    # Ranges (previous boundary, boundary], covering every key under the prefix.
+    boundaries = [None] + [prefix + character for character in _RANGE_BOUNDARIES] + [None]
+    return [_Partition(prefix, False, start_after, end) for start_after, end in zip(boundaries, boundaries[1:])]
+
+
+def _list_partition(s3, bucket: str, delimiter: str, partition: _Partition):
+    for page in iter_pages(s3, "list_objects_v2", Bucket=bucket, Prefix=partition.prefix,
+                           Delimiter=delimiter if partition.shallow else None,
+                           StartAfter=partition.start_after, page_size=1000):
+        contents = page.get("Contents", [])
+        if partition.end is not None and contents and contents[-1]["Key"] > partition.end:
+            yield [item for item in contents if item["Key"] <= partition.end]
+            return
+        yield contents
+
+
+def _group(key: str, prefix: str, delimiter: str, depth: int) -> str:
+    # The prefix of the key `depth` delimiter levels below the scanned prefix, or of its parent if shallower.
+    parts = key[len(prefix):].split(delimiter) if delimiter else [key[len(prefix):]]
+    return prefix + "".join(part + delimiter for part in parts[:min(depth, len(parts) - 1)])
+
+
+@store.kubiya_action()
+def delete_s3_objects(request: S3DeleteObjectsRequest) -> S3DeleteObjectsResponse:
+    """
+    Deletes the objects of a bucket matching a key list, a prefix or a last-modified cutoff.
+
+    The matching keys are streamed from the listing and packed into
+    1000-key DeleteObjects requests sent concurrently. Keys that fail with a
+    transient error are retried with backoff. With `include_versions`,
+    every version and delete marker is deleted, which purges the objects
+    from a versioned bucket.
+
+    Args:
+        request (S3DeleteObjectsRequest): The request containing the bucket and the objects to delete.
+
+    Returns:
+        S3DeleteObjectsResponse: The number of objects matched, deleted and failed, and the first failures.
+    """
+    if request.keys is None and request.prefix is None and request.modified_before is None:
+        raise ValueError("One of `keys`, `prefix` or `modified_before` is required")
+
+    s3 = get_client('s3')
+    start = time.monotonic()
+    counts = {"matched": 0, "deleted": 0, "failed": 0}
+    failures = []
+
+    def matching():
+        for entry in _objects_to_delete(s3, request):
+            counts["matched"] += 1
+            if not request.dry_run:
+                yield entry
+
+    def delete(batch: list) -> list:
+        # Returns the (entry, error code, error message) of the keys that could not be deleted.
+        failed = []
+        for attempt in range(max(1, request.max_attempts)):
+            if attempt:
+                time.sleep(_RETRY_BASE_DELAY * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+            try:
+                response = s3.delete_objects(Bucket=request.bucket, Delete={"Objects": batch, "Quiet": True})
+                errors = [({"Key": error["Key"], "VersionId": error.get("VersionId")}, error["Code"], error["Message"])
+                          for error in response.get("Errors", [])]
+            except ClientError as e:
+                # A rejected call fails every key of its batch
+                errors = [(entry, e.response["Error"]["Code"], str(e)) for entry in batch]
+            retryable = [error for error in errors if error[1] in _RETRYABLE_DELETE_ERRORS]
+            failed.extend(error for error in errors if error[1] not in _RETRYABLE_DELETE_ERRORS)
+            batch = [{k: v for k, v in entry.items() if v is not None} for entry, _, _ in retryable]
+            if not batch:
+                return failed
+        return failed + retryable
+
+    batches = batched(matching(), _DELETE_BATCH_SIZE)
+    for batch, failed, error in imap_unordered(delete, batches, request.max_concurrency):
+        if error:
+            raise error
+        counts["deleted"] += len(batch) - len(failed)
+        counts["failed"] += len(failed)
+        for entry, code, message in failed[:_MAX_REPORTED_FAILURES - len(failures)]:
+            failures.append(S3DeleteFailure(key=entry["Key"], version_id=entry.get("VersionId"), code=code,
+                                            error=message))
+
+    action = "Would delete" if request.dry_run else "Deleted"
+    message = f"{action} {counts['matched'] if request.dry_run else counts['deleted']} objects from s3://{request.bucket}."
+    return S3DeleteObjectsResponse(message=message, seconds=time.monotonic() - start, failures=failures, **counts)
+
+
+def _objects_to_delete(s3, request: S3DeleteObjectsRequest):
+    # Streams the DeleteObjects entries ({"Key", "VersionId"}) of the objects to delete.
+    cutoff = None
+    if request.modified_before:
+        cutoff = date_parser.isoparse(request.modified_before)
+        cutoff = cutoff if cutoff.tzinfo else cutoff.replace(tzinfo=timezone.utc)
+
+    def listing(prefix: str, delimiter: str = None, start_after: str = None):
+        if request.include_versions:
+            for page in iter_pages(s3, "list_object_versions", Bucket=request.bucket, Prefix=prefix,
+                                   Delimiter=delimiter, KeyMarker=start_after, page_size=1000):
+                # Versions and delete markers are each in key order; merge them
+                yield from sorted(page.get("Versions", []) + page.get("DeleteMarkers", []),
+                                  key=lambda item: item["Key"])
+        else:
+            yield from iter_items(s3, "list_objects_v2", "Contents", Bucket=request.bucket, Prefix=prefix,
+                                  Delimiter=delimiter, StartAfter=start_after, page_size=1000)
+
+    def lookup(group: tuple) -> list:
+        # Only the keys directly under the parent, from just before the first
+        # key of the group (a strict prefix of it sorts first) up to its last one.
+        parent, keys = group
+        wanted, found = set(keys), []
+        for item in listing(parent, "/", keys[0][:-1] or None):
+            if item["Key"] > keys[-1]:
+                break
+            if item["Key"] in wanted:
+                found.append(item)
+        return found
+
+    def looked_up(groups: list):
+        for _, found, error in imap_unordered(lookup, groups, request.max_concurrency):
+            if error:
+                raise error
+            yield from found
+
+    if request.keys is not None:
+        if request.include_versions or cutoff is not None:
+            # Keys are looked up for their versions or last-modified time in
+            # one listing per parent "directory", directories in parallel.
+            items = looked_up(_key_groups(request.keys))
+        else:
+            items = ({"Key": key} for key in request.keys)
+    else:
+        items = listing(request.prefix or "")
+
+    for item in items:
+        if request.prefix and not item["Key"].startswith(request.prefix):
+            continue
+        if cutoff is not None and item["LastModified"] >= cutoff:
+            continue
+        entry = {"Key": item["Key"]}
+        if request.include_versions and item.get("VersionId"):
+            entry["VersionId"] = item["VersionId"]
+        yield entry
+
+
+def _key_groups(keys: list) -> list:
+    # (parent prefix ending with "/" or "", sorted keys) per parent "directory" of the keys
+    groups = {}
+    for key in sorted(set(keys)):
+        groups.setdefault(key[:key.rfind("/") + 1], []).append(key)
+    return list(groups.items())
+
+
 @store.kubiya_action()
 def create_s3_bucket(request: S3CreateBucketRequest) -> S3CreateBucketResponse:
     """
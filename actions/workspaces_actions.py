@@ -1,3 +1,6 @@
+import random
+import time
+
 from ..models.workspaces_models import (
     TerminateWorkspaceRequest,
     TerminateWorkspaceResponse,
@@ -5,10 +8,27 @@ from ..models.workspaces_models import (
     CreateWorkspaceResponse,
     DescribeWorkspaceRequest,
     DescribeWorkspaceResponse,
+    CreateWorkspacesRequest,
+    CreateWorkspacesResponse,
+    TerminateWorkspacesRequest,
+    TerminateWorkspacesResponse,
+    FailedWorkspaceRequest,
 )
 
 from ..main_store import store
 from ..aws_wrapper import get_client ,get_session
+from ..concurrency import RateLimiter, batched, imap_unordered
+from ..pagination import iter_items
+
+from botocore.exceptions import ClientError
+
+# CreateWorkspaces, TerminateWorkspaces and DescribeWorkspaces accept up to 25 items per call
+_WORKSPACES_BATCH_SIZE = 25
+_RETRY_BASE_DELAY = 1.0
+# Only these FailedRequests/call error codes can succeed on a retry; the rest are returned as they are.
+_RETRYABLE_ERRORS = ("ThrottlingException", "Throttling", "RequestLimitExceeded", "TooManyRequestsException",
+                     "InternalError", "InternalFailure", "InternalServerError", "ServiceUnavailable",
+                     "ServiceUnavailableException", "OperationInProgressException")
 
 
 @store.kubiya_action()
@@ -66,20 +86,7 @@ def create_workspace(request: CreateWorkspaceRequest) -> CreateWorkspaceResponse
     else:
         workspace = get_client("workspaces")
 
-    workspaces_l=[
-        {
-            'DirectoryId': request.directory_id,
-            'UserName': request.user_name,
-            'BundleId': request.bundle_id,
-            'UserVolumeEncryptionEnabled': False,
-            'RootVolumeEncryptionEnabled': False,
-            'WorkspaceProperties': {
-                'RunningMode': 'ALWAYS_ON',
-                'RootVolumeSizeGib': 80,
-                'UserVolumeSizeGib': 10,
-                'ComputeTypeName': 'VALUE'}
-        }
-    ]
+    workspaces_l=[_workspace_request(request.directory_id, request.user_name, request.bundle_id)]
 
     response = workspace.create_workspaces(
         Workspaces=workspaces_l
@@ -97,18 +104,192 @@ def describe_workspaces(request: DescribeWorkspaceRequest) -> DescribeWorkspaceR
     """
     Describes the specified Workspaces.
 
+    Workspace IDs are looked up 25 at a time, in parallel. Without IDs, every
+    page of the workspaces matching the directory, user or bundle filters is
+    read; DescribeWorkspaces takes either a bundle or a directory (and
+    optionally a user in it), not both. With `include_connection_status`,
+    the connection status of each workspace is fetched the same batched way
+    and added as "ConnectionStatus".
+
     Args:
-        request (DescribeWorkspaceRequest): The request containing the details of the workspace to describe.
+        request (DescribeWorkspaceRequest): The request containing the IDs or filters of the workspaces to describe.
 
     Returns:
-        DescribeWorkspaceResponse: The response containing the details of the described workspace.
+        DescribeWorkspaceResponse: The response containing the details of the described workspaces.
     """
-    if request.account_id is not None and request.role_name is not None:
-        workspace = get_session("workspaces", request.account_id, request.role_name)
+    if request.user_name and not request.directory_id:
+        raise ValueError("`user_name` can only be used together with `directory_id`")
+    if request.bundle_id and (request.directory_id or request.user_name):
+        raise ValueError("`bundle_id` cannot be combined with `directory_id` or `user_name`")
+
+    workspace = _workspaces_client(request)
+    workspace_ids = list(dict.fromkeys(([request.workspace_id] if request.workspace_id else [])
+                                       + (request.workspace_ids or [])))
+
+    if workspace_ids:
+        workspaces = _describe_batched(workspace, "describe_workspaces", "Workspaces", workspace_ids,
+                                       request.max_concurrency)
     else:
-        workspace = get_client("workspaces")
+        workspaces = list(iter_items(workspace, "describe_workspaces", "Workspaces",
+                                     DirectoryId=request.directory_id, UserName=request.user_name,
+                                     BundleId=request.bundle_id))
+
+    if request.include_connection_status and workspaces:
+        statuses = _describe_batched(workspace, "describe_workspaces_connection_status",
+                                     "WorkspacesConnectionStatus", [w['WorkspaceId'] for w in workspaces],
+                                     request.max_concurrency)
+        by_id = {status.pop('WorkspaceId'): status for status in statuses}
+        for w in workspaces:
+            w['ConnectionStatus'] = by_id.get(w['WorkspaceId'])
+
+    workspace_details = workspaces[0] if request.workspace_id and workspaces else None
+    return DescribeWorkspaceResponse(workspace_details=workspace_details, workspaces=workspaces)
+
+
+def _describe_batched(workspace, operation_name: str, result_key: str, workspace_ids: list,
+                      max_concurrency: int) -> list:
+    def describe(batch: list) -> list:
+        return list(iter_items(workspace, operation_name, result_key, WorkspaceIds=batch))
+
+    results = []
+    for _, items, error in imap_unordered(describe, batched(workspace_ids, _WORKSPACES_BATCH_SIZE),
+                                          max_concurrency):
+        if error:
+            raise error
+        results.extend(items)
+    return results
+
+
+@store.kubiya_action()
+def create_workspaces(request: CreateWorkspacesRequest) -> CreateWorkspacesResponse:
+    """
+    Creates many Workspaces at once.
+
+    The workspaces are packed into requests of 25 that are sent concurrently
+    under a rate limit. Entries reported in FailedRequests with a throttling
+    or transient error are retried, with exponential backoff, up to
+    `max_attempts` times; other failures are returned right away.
+
+    Args:
+        request (CreateWorkspacesRequest): The request containing the directory, user and bundle of each workspace.
+
+    Returns:
+        CreateWorkspacesResponse: The IDs of the created workspaces and the entries that still failed.
+    """
+    workspace = _workspaces_client(request)
+    entries = [_workspace_request(spec.directory_id, spec.user_name, spec.bundle_id) for spec in request.workspaces]
+
+    def send(batch: list) -> tuple:
+        response = workspace.create_workspaces(Workspaces=batch)
+        failed = [(f['WorkspaceRequest'], f.get('ErrorCode'), f.get('ErrorMessage')) for f in response['FailedRequests']]
+        return response['PendingRequests'], failed
+
+    pending, failed = _send_batched(send, entries, request)
+    return CreateWorkspacesResponse(
+        workspaces_ids=[w['WorkspaceId'] for w in pending],
+        failed=[FailedWorkspaceRequest(directory_id=entry['DirectoryId'], user_name=entry['UserName'],
+                                       error_code=code, error_message=message)
+                for entry, code, message in failed],
+    )
+
 
-    response = workspace.describe_workspaces(
-        WorkspaceIds=[request.workspace_id]
+@store.kubiya_action()
+def terminate_workspaces(request: TerminateWorkspacesRequest) -> TerminateWorkspacesResponse:
+    """
+    Terminates many Workspaces at once.
+
+    The IDs are packed into requests of 25 that are sent concurrently under a
+    rate limit. Workspaces reported in FailedRequests with a throttling or
+    transient error are retried, with exponential backoff, up to
+    `max_attempts` times; other failures are returned right away.
+
+    Args:
+        request (TerminateWorkspacesRequest): The request containing the IDs of the workspaces to terminate.
+
+    Returns:
+        TerminateWorkspacesResponse: The IDs of the terminated workspaces and the ones that still failed.
+    """
+    workspace = _workspaces_client(request)
+    entries = [{'WorkspaceId': workspace_id} for workspace_id in dict.fromkeys(request.workspace_ids)]
+
+    def send(batch: list) -> tuple:
+        response = workspace.terminate_workspaces(TerminateWorkspaceRequests=batch)
+        failed_ids = {f['WorkspaceId']: f for f in response['FailedRequests']}
+        failed = [({'WorkspaceId': workspace_id}, f.get('ErrorCode'), f.get('ErrorMessage'))
+                  for workspace_id, f in failed_ids.items()]
+        return [entry for entry in batch if entry['WorkspaceId'] not in failed_ids], failed
+
+    terminated, failed = _send_batched(send, entries, request)
+    return TerminateWorkspacesResponse(
+        terminated=[entry['WorkspaceId'] for entry in terminated],
+        failed=[FailedWorkspaceRequest(workspace_id=entry['WorkspaceId'], error_code=code, error_message=message)
+                for entry, code, message in failed],
     )
-    return DescribeWorkspaceResponse(workspace_details=response['Workspaces'][0])
+
+
+def _workspaces_client(request):
+    if request.account_id is not None and request.role_name is not None:
+        return get_session("workspaces", request.account_id, request.role_name)
+    return get_client("workspaces")
+
+
+def _workspace_request(directory_id: str, user_name: str, bundle_id: str) -> dict:
+    return {
+        'DirectoryId': directory_id,
+        'UserName': user_name,
+        'BundleId': bundle_id,
+        'UserVolumeEncryptionEnabled': False,
+        'RootVolumeEncryptionEnabled': False,
+        'WorkspaceProperties': {
+            'RunningMode': 'ALWAYS_ON',
+            'RootVolumeSizeGib': 80,
+            'UserVolumeSizeGib': 10,
+            'ComputeTypeName': 'VALUE'}
+    }
+
+
+def _send_batched(send, entries: list, request) -> tuple:
+    """
+    Sends entries in batches of 25, retrying the entries that failed with a throttling or transient error.
+
+    Args:
+        send (Callable): Sends one batch and returns (succeeded, [(entry, error code, error message)]).
+        entries (list): The request entries.
+        request: The action request, providing max_concurrency, requests_per_second and max_attempts.
+
+    Returns:
+        tuple: The succeeded results and the entries that still failed after the last attempt.
+    """
+    limiter = RateLimiter(request.requests_per_second)
+
+    def send_limited(batch: list) -> tuple:
+        limiter.acquire()
+        return send(batch)
+
+    succeeded = []
+    final = []
+    failed = []
+    for attempt in range(max(1, request.max_attempts)):
+        if attempt:
+            time.sleep(_RETRY_BASE_DELAY * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+
+        failed = []
+        batches = batched(entries, _WORKSPACES_BATCH_SIZE)
+        for batch, result, error in imap_unordered(send_limited, batches, request.max_concurrency):
+            if error:
+                # A rejected call (e.g. throttling) fails every entry of its batch
+                if not isinstance(error, ClientError):
+                    raise error
+                failed.extend((entry, error.response['Error']['Code'], str(error)) for entry in batch)
+                continue
+            done, batch_failed = result
+            succeeded.extend(done)
+            failed.extend(batch_failed)
+
+        final.extend(failure for failure in failed if failure[1] not in _RETRYABLE_ERRORS)
+        failed = [failure for failure in failed if failure[1] in _RETRYABLE_ERRORS]
+        if not failed:
+            break
+        entries = [entry for entry, _, _ in failed]
+
+    return succeeded, final + failed
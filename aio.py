@@ -0,0 +1,72 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+from .fanout import run_action as run_action_sync
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Returns the executor async actions run on, with `AWS_ASYNC_WORKERS` threads.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=int(os.getenv("AWS_ASYNC_WORKERS", "32")),
+                                           thread_name_prefix="aws-async")
+        return _executor
+
+
+async def run_action(action_name: str, input: dict, timeout: float = None):
+    """
+    Runs a registered action without blocking the event loop.
+
+    The action runs on the shared executor in a copy of the caller's context,
+    so `region_scope` and `account_scope` carry over. Cancelling the awaiting
+    task, or reaching the timeout, stops waiting for the action; an action
+    already running on a thread finishes in the background and its result is
+    discarded.
+
+    Args:
+        action_name (str): The name of the registered action.
+        input (dict): The input of the action.
+        timeout (float): The maximum time in seconds to wait for the action.
+
+    Returns:
+        The output of the action.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(get_executor(), contextvars.copy_context().run, run_action_sync,
+                                  action_name, input)
+    return await asyncio.wait_for(future, timeout)
+
+
+async def gather_actions(calls: List[Tuple[str, dict]], timeout: float = None) -> List[Tuple]:
+    """
+    Runs several actions concurrently, so they take as long as the slowest of them.
+
+    Args:
+        calls (List[Tuple[str, dict]]): The (action name, input) pairs to run.
+        timeout (float): The maximum time in seconds allowed per action.
+
+    Returns:
+        List[Tuple]: (output, error, seconds) for each call, in the order of `calls`; error is None on success.
+    """
+    async def timed(action_name: str, input: dict) -> Tuple:
+        start = time.monotonic()
+        try:
+            output = await run_action(action_name, input, timeout)
+        except asyncio.TimeoutError:
+            return None, TimeoutError(f"timed out after {timeout}s"), time.monotonic() - start
+        except Exception as e:
+            return None, e, time.monotonic() - start
+        return output, None, time.monotonic() - start
+
+    return await asyncio.gather(*(timed(action_name, input) for action_name, input in calls))
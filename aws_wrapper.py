@@ -1,69 +1,524 @@
+import contextvars
+import hashlib
 import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
 import boto3
+import botocore.session
+from botocore.config import Config
+from botocore.credentials import RefreshableCredentials
+
 from .main_store import store
+from .rate_limits import get_rate_limiter
+from . import instrumentation
+
+# Pooled clients are shared between concurrent actions, so give each one a
+# connection pool large enough to not serialize them on urllib3. The standard
+# retry mode caps retries with a retry quota instead of retrying every
+# throttle, and the client-side rate limiter paces the attempts themselves.
+_CLIENT_CONFIG = Config(
+    max_pool_connections=int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "50")),
+    retries={"mode": "standard", "max_attempts": int(os.getenv("AWS_MAX_ATTEMPTS", "3"))},
+)
+
+
+def _install_rate_limiter(client):
+    # Limits are kept per account, the one of the scope the hooks run in
+    account = get_account()
+    get_rate_limiter().install(client, account=account[0] if account else "")
+
+
+# Called with every client built, and with the client of every resource built
+_client_hooks = [_install_rate_limiter, instrumentation.install]
+
+_region_override = contextvars.ContextVar("aws_region", default=None)
+_account_override = contextvars.ContextVar("aws_account", default=None)
+
+
+class ClientPool:
+    """
+    Thread-safe pool of boto3 clients and resources.
+
+    Entries are keyed by (kind, service, region, credential fingerprint) and
+    reused across actions. Resources are not thread-safe in boto3, so they are
+    additionally keyed by the calling thread and dropped when it exits. When
+    the credentials in `store.secrets` rotate, every entry built from the
+    previous credentials is dropped. Entries are built outside the pool lock,
+    under a lock of their session as boto3 sessions are not thread-safe, so
+    lookups of pooled entries never wait for a build.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._entries = {}
+        self._session_locks = {}
+        self._fingerprint = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, kind: str, service_name: str, region: str, credentials: tuple):
+        """
+        Returns a pooled client or resource, building it on first use.
+
+        Args:
+            kind (str): Either "client" or "resource".
+            service_name (str): The name of the AWS service.
+            region (str): The AWS region.
+            credentials (tuple): The (access key, secret key, session token) triple.
+
+        Returns:
+            A boto3 client or resource for the specified service.
+        """
+        fingerprint = credential_fingerprint(credentials)
+        key = (kind, service_name, region, fingerprint)
+        if kind == "resource":
+            key += (_resource_thread(),)
+
+        with self._lock:
+            if fingerprint != self._fingerprint:
+                self._drop_stale(fingerprint)
+
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                return entry
+            session_lock = self._session_locks.setdefault(fingerprint, threading.Lock())
+
+        # One build at a time per session; callers waiting for the same entry reuse it.
+        with session_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self.hits += 1
+                    return entry
+                self.misses += 1
+                session = self._sessions.get(fingerprint)
+
+            if session is None:
+                access_key, secret_key, session_token = credentials
+                session = boto3.Session(aws_access_key_id=access_key,
+                                        aws_secret_access_key=secret_key,
+                                        aws_session_token=session_token)
+                with self._lock:
+                    if fingerprint == self._fingerprint:
+                        session = self._sessions.setdefault(fingerprint, session)
+
+            start = time.perf_counter()
+            if kind == "resource":
+                entry = session.resource(service_name, region_name=region, config=_CLIENT_CONFIG)
+            else:
+                entry = session.client(service_name, region_name=region, config=_CLIENT_CONFIG)
+            instrumentation.AWS_CLIENT_BUILD.observe(time.perf_counter() - start, service=service_name, kind=kind)
+            _run_client_hooks(entry)
+
+            # An entry built from credentials that rotated meanwhile is used once, not pooled.
+            with self._lock:
+                if fingerprint == self._fingerprint:
+                    self._entries[key] = entry
+            return entry
+
+    def clear(self):
+        """
+        Drops every pooled client, resource and session.
+        """
+        with self._lock:
+            self.evictions += len(self._entries)
+            self._entries.clear()
+            self._session_locks.clear()
+            self._sessions.clear()
+            self._fingerprint = None
+
+    def stats(self) -> dict:
+        """
+        Returns the pool counters.
+
+        Returns:
+            dict: The hit, miss and eviction counters and the current pool size.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+            }
+
+    def _drop_stale(self, fingerprint: str):
+        # Called with the lock held, whenever the credentials in use change.
+        stale = [key for key in self._entries if key[3] != fingerprint]
+        for key in stale:
+            del self._entries[key]
+        self.evictions += len(stale)
+        self._sessions = {fingerprint: self._sessions[fingerprint]} if fingerprint in self._sessions else {}
+        self._session_locks = {key: lock for key, lock in self._session_locks.items() if key == fingerprint}
+        self._fingerprint = fingerprint
+
+    def _drop_thread(self, ident: int):
+        # Called once the thread is gone, its resources cannot be used anymore.
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == "resource" and key[4] == ident]:
+                del self._entries[key]
+
+
+_pool = ClientPool()
+
+
+def register_client_hook(hook):
+    """
+    Registers a function called with every boto3 client built from now on.
+
+    Hooks typically register botocore event handlers on `client.meta.events`.
+    Resources are hooked through their underlying client. Hooks run in the
+    `account_scope` of the account the client acts in, so `get_account()`
+    tells them apart.
+
+    Args:
+        hook (Callable): The function to call with each new client.
+    """
+    _client_hooks.append(hook)
+
+
+def _run_client_hooks(entry, account: tuple = None):
+    client = entry.meta.client if hasattr(entry.meta, "client") else entry
+    token = _account_override.set(account)
+    try:
+        for hook in _client_hooks:
+            hook(client)
+    finally:
+        _account_override.reset(token)
+
+
+class _ThreadExit:
+    # Held in thread-local storage, so it is collected when its thread exits.
+    pass
+
+
+_thread_exit = threading.local()
+
+
+def _resource_thread() -> int:
+    # Returns the ID of the calling thread, which keys its resources, and
+    # registers dropping them once the thread exits.
+    ident = threading.get_ident()
+    if getattr(_thread_exit, "token", None) is None:
+        _thread_exit.token = _ThreadExit()
+        weakref.finalize(_thread_exit.token, _drop_thread_resources, ident)
+    return ident
+
+
+def _drop_thread_resources(ident: int):
+    _pool._drop_thread(ident)
+    _assumed_roles._drop_thread(ident)
+
+
+def credential_fingerprint(credentials: tuple) -> str:
+    """
+    Returns a stable, non-reversible fingerprint of a set of credentials.
+
+    Args:
+        credentials (tuple): The (access key, secret key, session token) triple.
+
+    Returns:
+        str: The hex digest identifying the credentials.
+    """
+    raw = "\0".join(value or "" for value in credentials)
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+
+def get_region() -> str:
+    """
+    Returns the AWS region for actions: the one of the enclosing `region_scope`, or `AWS_REGION`.
+    """
+    return _region_override.get() or os.getenv("AWS_REGION", "eu-west-1")
 
 
-def get_resource(service_name: str):
+@contextmanager
+def account_scope(account_id: str, role_name: str):
     """
-    Returns a boto3 resource for a specific service.
+    Makes every client and resource built within the block act in another account.
+
+    The role is assumed through the shared assumed-role session cache, so
+    repeated scopes for the same account reuse the same session.
+
+    Args:
+        account_id (str): The target account ID.
+        role_name (str): The name of the role to assume in the target account.
+    """
+    token = _account_override.set((account_id, role_name))
+    try:
+        yield
+    finally:
+        _account_override.reset(token)
+
+
+def get_account() -> tuple:
+    """
+    Returns the (account_id, role_name) of the enclosing `account_scope`, or None outside of one.
+    """
+    return _account_override.get()
+
+
+@contextmanager
+def region_scope(region: str):
+    """
+    Makes every client built within the block default to the given region.
+
+    Args:
+        region (str): The AWS region.
+    """
+    token = _region_override.set(region)
+    try:
+        yield
+    finally:
+        _region_override.reset(token)
+
+
+def _store_credentials() -> tuple:
+    return (store.secrets["AWS_ACCESS_KEY_ID"],
+            store.secrets["AWS_SECRET_ACCESS_KEY"],
+            store.secrets["AWS_SESSION_TOKEN"])
+
+
+def get_resource(service_name: str, region: str = None):
+    """
+    Returns a pooled boto3 resource for a specific service.
+
+    Within an `account_scope`, the resource uses the assumed role of that account.
 
     Args:
         service_name (str): The name of the AWS service.
+        region (str): The AWS region, defaults to `AWS_REGION`.
 
     Returns:
         A boto3 resource for the specified service.
     """
-    region = os.getenv("AWS_REGION", "eu-west-1")
-    return boto3.resource(service_name,
-                          aws_access_key_id=store.secrets["AWS_ACCESS_KEY_ID"],
-                          aws_secret_access_key=store.secrets["AWS_SECRET_ACCESS_KEY"],
-                          aws_session_token=store.secrets["AWS_SESSION_TOKEN"],
-                          region_name=region
-                          )
+    account = _account_override.get()
+    if account is not None:
+        return _assumed_roles.get("resource", service_name, *account, region or get_region())
+    return _pool.get("resource", service_name, region or get_region(), _store_credentials())
 
 
-def get_client(service_name: str):
+def get_client(service_name: str, region: str = None):
     """
-    Returns a boto3 client for a specific service.
+    Returns a pooled boto3 client for a specific service.
+
+    Within an `account_scope`, the client uses the assumed role of that account.
 
     Args:
         service_name (str): The name of the AWS service.
+        region (str): The AWS region, defaults to `AWS_REGION`.
 
     Returns:
         A boto3 client for the specified service.
     """
-    region = os.getenv("AWS_REGION", "eu-west-1")
-    return boto3.client(service_name,
-                        aws_access_key_id=store.secrets["AWS_ACCESS_KEY_ID"],
-                        aws_secret_access_key=store.secrets["AWS_SECRET_ACCESS_KEY"],
-                        aws_session_token=store.secrets["AWS_SESSION_TOKEN"],
-                        region_name=region
-                        )
+    account = _account_override.get()
+    if account is not None:
+        return _assumed_roles.get("client", service_name, *account, region or get_region())
+    return _pool.get("client", service_name, region or get_region(), _store_credentials())
 
 
-def get_session(service_name: str, account_id: str, role_name: str):
+def client_pool_stats() -> dict:
     """
-    Returns a boto3 session.
+    Returns the hit/miss counters of the process-wide client pool.
     """
+    return _pool.stats()
+
+
+class AssumedRoleCache:
+    """
+    Thread-safe cache of assumed-role sessions.
+
+    Sessions are keyed by (account_id, role_name, region) and hold botocore
+    RefreshableCredentials, which re-assume the role shortly before the
+    credentials expire. Each session keeps the clients built from it, and the
+    resources of each thread until it exits, so repeated cross-account calls
+    reuse both the credentials and the clients.
+    Concurrent first calls for the same role wait on a single AssumeRole.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._key_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.assume_role_calls = 0
+
+    def get(self, kind: str, service_name: str, account_id: str, role_name: str, region: str):
+        """
+        Returns a client or resource for the service, using the cached session of the role.
+
+        Args:
+            kind (str): Either "client" or "resource".
+            service_name (str): The name of the AWS service.
+            account_id (str): The target account ID.
+            role_name (str): The name of the role to assume in the target account.
+            region (str): The AWS region.
+
+        Returns:
+            A boto3 client or resource for the specified service.
+        """
+        session, entries, lock = self._session(account_id, role_name, region)
+        key = (kind, service_name)
+        if kind == "resource":
+            key += (_resource_thread(),)
+        with lock:
+            entry = entries.get(key)
+            if entry is None:
+                start = time.perf_counter()
+                if kind == "resource":
+                    entry = session.resource(service_name, config=_CLIENT_CONFIG)
+                else:
+                    entry = session.client(service_name, config=_CLIENT_CONFIG)
+                instrumentation.AWS_CLIENT_BUILD.observe(time.perf_counter() - start, service=service_name,
+                                                         kind=kind)
+                _run_client_hooks(entry, (account_id, role_name))
+                entries[key] = entry
+            return entry
+
+    def clear(self):
+        """
+        Drops every cached session and its clients.
+        """
+        with self._lock:
+            self._sessions.clear()
+            self._key_locks.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: The hit and miss counters, the number of AssumeRole calls and the number of cached sessions.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "assume_role_calls": self.assume_role_calls,
+                "size": len(self._sessions),
+            }
+
+    def _drop_thread(self, ident: int):
+        with self._lock:
+            sessions = list(self._sessions.values())
+        for _, entries, lock in sessions:
+            with lock:
+                for key in [key for key in entries if key[0] == "resource" and key[2] == ident]:
+                    del entries[key]
+
+    def _session(self, account_id: str, role_name: str, region: str) -> tuple:
+        key = (account_id, role_name, region)
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is not None:
+                self.hits += 1
+                return entry
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Only one thread assumes the role, the others wait and reuse its session.
+        with key_lock:
+            with self._lock:
+                entry = self._sessions.get(key)
+                if entry is not None:
+                    self.hits += 1
+                    return entry
+                self.misses += 1
+
+            role_arn = f'arn:aws:iam::{account_id}:role/{role_name}'
+            credentials = RefreshableCredentials.create_from_metadata(
+                metadata=self._assume_role(role_arn),
+                refresh_using=lambda: self._assume_role(role_arn),
+                method="sts-assume-role",
+            )
+            botocore_session = botocore.session.get_session()
+            botocore_session._credentials = credentials
+            session = boto3.Session(botocore_session=botocore_session, region_name=region)
+            entry = (session, {}, threading.Lock())
+
+            with self._lock:
+                self._sessions[key] = entry
+            return entry
+
+    def _assume_role(self, role_arn: str) -> dict:
+        # Always assume the role with the store credentials, also when the
+        # credentials are refreshed from within an account_scope.
+        sts_client = _pool.get("client", "sts", get_region(), _store_credentials())
+        start = time.perf_counter()
+        assumed_role = sts_client.assume_role(
+            RoleArn=role_arn,
+            RoleSessionName='AssumeRoleSession'
+        )
+        instrumentation.AWS_CREDENTIALS.observe(time.perf_counter() - start, method="sts-assume-role")
+        with self._lock:
+            self.assume_role_calls += 1
+
+        credentials = assumed_role['Credentials']
+        return {
+            "access_key": credentials['AccessKeyId'],
+            "secret_key": credentials['SecretAccessKey'],
+            "token": credentials['SessionToken'],
+            "expiry_time": credentials['Expiration'].isoformat(),
+        }
+
+
+_assumed_roles = AssumedRoleCache()
+
+
+def get_session(service_name: str, account_id: str, role_name: str, region: str = None):
+    """
+    Returns a boto3 client for a service in another account.
+
+    The role is assumed once per (account_id, role_name, region) and the
+    credentials are refreshed shortly before they expire.
+
+    Args:
+        service_name (str): The name of the AWS service.
+        account_id (str): The target account ID.
+        role_name (str): The name of the role to assume in the target account.
+        region (str): The AWS region, defaults to `AWS_REGION`.
+
+    Returns:
+        A boto3 client for the specified service.
+    """
+    return _assumed_roles.get("client", service_name, account_id, role_name, region or get_region())
+
+
+def assumed_role_stats() -> dict:
+    """
+    Returns the counters of the assumed-role session cache.
+    """
+    return _assumed_roles.stats()
+
+
+def _limit_labels(limit: dict) -> dict:
+    return {key: limit[key] for key in ("account", "region", "service", "operation")}
 
-    # Assume role in the target account
-    sts_client = get_client("sts")
-    role_arn = f'arn:aws:iam::{account_id}:role/{role_name}'
-    assumed_role = sts_client.assume_role(
-        RoleArn=role_arn,
-        RoleSessionName='AssumeRoleSession'
-    )
 
-    # Create a session with the assumed role credentials
-    region = os.getenv("AWS_REGION", "eu-west-1")
-    session = boto3.Session(
-        aws_access_key_id=assumed_role['Credentials']['AccessKeyId'],
-        aws_secret_access_key=assumed_role['Credentials']['SecretAccessKey'],
-        aws_session_token=assumed_role['Credentials']['SessionToken'],
-        region_name=region
-    )
+def _collect_stats() -> list:
+    pool = _pool.stats()
+    assumed_roles = _assumed_roles.stats()
+    limits = get_rate_limiter().stats()
+    return [
+        ("aws_client_pool_entries", "Clients and resources in the client pool.", [({}, pool["size"])]),
+        ("aws_client_pool_lookups", "Client pool lookups by result.",
+         [({"result": "hit"}, pool["hits"]), ({"result": "miss"}, pool["misses"])]),
+        ("aws_client_pool_evictions", "Pooled clients dropped after a credential change.", [({}, pool["evictions"])]),
+        ("aws_assumed_role_sessions", "Cached assumed-role sessions.", [({}, assumed_roles["size"])]),
+        ("aws_assume_role_calls", "AssumeRole calls made, refreshes included.",
+         [({}, assumed_roles["assume_role_calls"])]),
+        ("aws_rate_limit", "Current client-side rate limit in requests per second.",
+         [(_limit_labels(l), l["rate"]) for l in limits if l["rate"] is not None]),
+        ("aws_rate_limit_throttles", "Throttling errors seen per operation.",
+         [(_limit_labels(l), l["throttles"]) for l in limits]),
+        ("aws_rate_limit_wait_seconds", "Time spent waiting for the client-side rate limiter.",
+         [(_limit_labels(l), l["wait_seconds"]) for l in limits]),
+    ]
 
-    # Create the client using the session
-    client = session.client(service_name)
 
-    return client
\ No newline at end of file
+instrumentation.register_collector(_collect_stats)
@@ -0,0 +1,199 @@
+"""
+Benchmarks every action against a synthetic AWS account, offline.
+
+Each scenario runs in its own process, so that import time, peak RSS and the
+process-wide caches and pools are measured from a cold start. AWS calls are
+answered in-process by `synthetic_aws.SyntheticAccount`, after botocore has
+validated and serialized them, and are counted per operation.
+
+A scenario fails when the action fails, when it makes more AWS calls than the
+budget of its scenario (see `scenarios.py`), or, against a baseline, when it
+makes more calls or gets slower, heavier or slower to import than the
+tolerances allow.
+
+Results are compared with the committed `baseline.json` by default. After
+an intended change in calls or cost, refresh it with --save-baseline.
+
+Usage:
+    python benchmarks/run.py
+    python benchmarks/run.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run.py --scale 1000 --only s3 --only list_users --baseline ""
+"""
+import argparse
+import importlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from scenarios import SCENARIOS
+
+_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Below these absolute differences a change is noise, whatever the relative tolerance
+_MIN_SECONDS_DELTA = 0.05
+_MIN_RSS_DELTA_MB = 10.0
+
+
+def run_scenario(scenario, scale: int, latency: float) -> dict:
+    """
+    Runs one scenario in the current process, which must not have imported the action store yet.
+
+    Args:
+        scenario (Scenario): The scenario to run.
+        scale (int): The size of the synthetic account.
+        latency (float): The simulated latency of every AWS call in seconds.
+
+    Returns:
+        dict: The latency, AWS calls, call budget, peak RSS and import time of the scenario, and its error.
+    """
+    from synthetic_aws import SyntheticAccount
+
+    package = os.path.basename(_REPO)
+    sys.path.insert(0, os.path.dirname(_REPO))
+    start = time.perf_counter()
+    main_store = importlib.import_module(f"{package}.main_store")
+    aws_wrapper = importlib.import_module(f"{package}.aws_wrapper")
+    import_seconds = time.perf_counter() - start
+
+    account = SyntheticAccount(scale, latency)
+    aws_wrapper.register_client_hook(account.install)
+    store = main_store.store
+    store.secrets = {"AWS_ACCESS_KEY_ID": "AKIA0000000000000000", "AWS_SECRET_ACCESS_KEY": "secret",
+                     "AWS_SESSION_TOKEN": "token", "AWS_DEFAULT_REGION": "eu-west-1"}
+
+    result = {"scenario": scenario.name, "action": scenario.action, "scale": scale,
+              "import_seconds": import_seconds, "max_calls": scenario.max_calls(account), "error": None,
+              "known_error": scenario.known_error}
+    try:
+        for action_name, setup_input in scenario.setup:
+            _execute(store, action_name, setup_input(account))
+        account.reset_calls()
+        action_input = scenario.input(account)
+        start = time.perf_counter()
+        _execute(store, scenario.action, action_input)
+        result["seconds"] = time.perf_counter() - start
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["seconds"] = None
+
+    result["calls"] = sum(account.calls.values())
+    result["calls_by_operation"] = dict(sorted(account.calls.items()))
+    # ru_maxrss is in kilobytes on Linux
+    result["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return result
+
+
+def _execute(store, action_name: str, action_input: dict):
+    output = store.execute_action(action_name, action_input)
+    if isinstance(output, dict) and "error" in output:
+        raise ValueError(output["error"])
+    return output
+
+
+def check(result: dict, baseline: dict = None, tolerance: float = 0.5) -> list:
+    """
+    Returns the reasons a scenario result fails, empty if it passes.
+
+    Args:
+        result (dict): The result of the scenario.
+        baseline (dict): The result of the same scenario in the baseline, if any.
+        tolerance (float): The relative increase of latency, peak RSS and import time allowed over the baseline.
+
+    Returns:
+        list: The failure messages.
+    """
+    if result["error"]:
+        if result.get("known_error") and result["known_error"] in result["error"]:
+            return []
+        return [result["error"]]
+    failures = []
+    if result["calls"] > result["max_calls"]:
+        failures.append(f"{result['calls']} AWS calls, over the budget of {result['max_calls']}")
+    if baseline is None or baseline.get("error") or baseline["scale"] != result["scale"]:
+        return failures
+
+    if result["calls"] > baseline["calls"]:
+        failures.append(f"{result['calls']} AWS calls, {baseline['calls']} in the baseline")
+    for field, unit, min_delta in (("seconds", "s", _MIN_SECONDS_DELTA),
+                                   ("import_seconds", "s", _MIN_SECONDS_DELTA),
+                                   ("peak_rss_mb", "MB", _MIN_RSS_DELTA_MB)):
+        value, reference = result[field], baseline[field]
+        if value > reference * (1 + tolerance) and value - reference > min_delta:
+            failures.append(f"{field} {value:.3f}{unit}, {reference:.3f}{unit} in the baseline")
+    return failures
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=10000, help="EC2 instances in the synthetic account; "
+                                                                 "every other resource is sized from it")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="simulated latency of every AWS call")
+    parser.add_argument("--only", action="append", help="run the scenarios whose name contains this")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per scenario, the fastest one is kept")
+    parser.add_argument("--baseline", default=_BASELINE, help="JSON results to compare with, empty for none")
+    parser.add_argument("--save-baseline", help="where to write the results as a new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="relative slowdown or memory growth allowed over the baseline")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    latency = args.latency_ms / 1000
+
+    if args.worker:
+        scenario = next(s for s in SCENARIOS if s.name == args.worker)
+        print(json.dumps(run_scenario(scenario, args.scale, latency)))
+        return 0
+
+    scenarios = [s for s in SCENARIOS if not args.only or any(name in s.name for name in args.only)]
+    baseline = {}
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = {result["scenario"]: result for result in json.load(f)["results"]}
+
+    results, failed = [], 0
+    print(f"{'scenario':<32} {'seconds':>9} {'calls':>7} {'budget':>7} {'rss MB':>8} {'import s':>9}  status")
+    with tempfile.TemporaryDirectory() as scratch:
+        for scenario in scenarios:
+            result = None
+            for attempt in range(max(args.repeat, 1)):
+                candidate = _run_worker(scenario, args.scale, args.latency_ms, scratch, attempt)
+                # The fastest successful run wins; a failed one is only kept if every run fails
+                if (result is None or result["seconds"] is None
+                        or candidate["seconds"] is not None and candidate["seconds"] < result["seconds"]):
+                    result = candidate
+            results.append(result)
+            failures = check(result, baseline.get(scenario.name), args.tolerance)
+            failed += bool(failures)
+            status = "FAIL: " + "; ".join(failures) if failures else "known error" if result["error"] else "ok"
+            seconds = f"{result['seconds']:.3f}" if result["seconds"] is not None else "-"
+            print(f"{scenario.name:<32} {seconds:>9} {result['calls']:>7} {result['max_calls']:>7} "
+                  f"{result['peak_rss_mb']:>8.1f} {result['import_seconds']:>9.3f}  "
+                  f"{status}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({"scale": args.scale, "latency_ms": args.latency_ms, "results": results}, f, indent=2)
+    print(f"{len(results) - failed} passed, {failed} failed")
+    return 1 if failed else 0
+
+
+def _run_worker(scenario, scale: int, latency_ms: float, scratch: str, attempt: int) -> dict:
+    env = dict(os.environ, **scenario.env)
+    env["ECR_INDEX_PATH"] = os.path.join(scratch, f"{scenario.name}-{attempt}.sqlite")
+    command = [sys.executable, os.path.abspath(__file__), "--worker", scenario.name, "--scale", str(scale),
+               "--latency-ms", str(latency_ms)]
+    completed = subprocess.run(command, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        return {"scenario": scenario.name, "action": scenario.action, "scale": scale, "seconds": None, "calls": 0,
+                "max_calls": 0, "peak_rss_mb": 0.0, "import_seconds": 0.0, "calls_by_operation": {},
+                "known_error": None,
+                "error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "worker failed"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+import math
+from collections import namedtuple
+
+from synthetic_aws import LARGE_OBJECT_SIZE
+
+# `input` and `max_calls` are functions of the SyntheticAccount. `max_calls` is
+# the AWS call budget of the measured invocation: it grows with the pages the
+# action has to read, so a call per item (N+1) exceeds it as soon as the
+# account is large. `setup` holds (action, input) pairs run first, uncounted,
+# e.g. to warm a cache. `known_error` is part of an error the action is known
+# to fail with: the run reports it without failing, until the action is fixed.
+Scenario = namedtuple("Scenario", ["name", "action", "input", "max_calls", "setup", "env", "known_error"],
+                      defaults=((), {}, None))
+
+_METRIC_START, _METRIC_END = "2023-01-01T00:00:00Z", "2023-01-02T00:00:00Z"
+
+
+def pages(count: int, page_size: int) -> int:
+    return max(1, math.ceil(count / page_size))
+
+
+def _metric_queries(account) -> list:
+    return [{"Id": f"m{k}", "ReturnData": True,
+             "MetricStat": {"Metric": {"Namespace": "Benchmark", "MetricName": metric["MetricName"],
+                                       "Dimensions": metric["Dimensions"]}, "Period": 60, "Stat": "Average"}}
+            for k, metric in enumerate(account.metrics[:max(account.scale // 100, 1)])]
+
+
+def _get_metric_data(account, **extra) -> dict:
+    return dict(MetricDataQueries=_metric_queries(account), StartTime=_METRIC_START, EndTime=_METRIC_END, **extra)
+
+
+def _metric_calls(account) -> int:
+    queries = max(account.scale // 100, 1)
+    return pages(queries, 500) * pages(min(queries, 500) * 1440, 100800)
+
+
+def _usernames(account) -> list:
+    return [user["UserName"] for user in account.users[::2]]
+
+
+def _user_lookup_calls(account) -> int:
+    # list_users gets up to 10 users one by one, more through a listing of every user
+    names = len(_usernames(account))
+    return names if names <= 10 else pages(len(account.users), 1000)
+
+
+def _metric_data(account) -> list:
+    return [{"MetricName": f"Metric{k}", "Dimensions": [{"Name": "Shard", "Value": str(k % 10)}],
+             "Value": float(k), "Unit": "Count"} for k in range(max(account.scale // 10, 1))]
+
+
+def _run_actions_calls(account) -> list:
+    return [{"action_name": "list_functions", "input": {}},
+            {"action_name": "list_clusters", "input": {}},
+            {"action_name": "describe_alarms", "input": {}}]
+
+
+_FIND_IMAGES = {"search_pattern": "v1.2.", "match": "prefix"}
+
+SCENARIOS = [
+    Scenario("health_check", "health_check", lambda a: {}, lambda a: 1),
+
+    # EC2
+    Scenario("list_ec2_instances", "list_ec2_instances", lambda a: {},
+             lambda a: pages(len(a.instances) // 4, 1000)),
+    Scenario("list_ec2_instances_projected", "list_ec2_instances",
+             lambda a: {"fields": "{id: InstanceId, type: InstanceType, state: State.Name}"},
+             lambda a: pages(len(a.instances) // 4, 1000)),
+    Scenario("list_ec2_instances_by_id", "list_ec2_instances",
+             lambda a: {"instance_ids": [i["InstanceId"] for i in a.instances[:100]]}, lambda a: 1),
+    Scenario("list_unused_security_groups", "list_unused_security_groups", lambda a: {},
+             lambda a: pages(len(a.security_groups), 1000) + pages(len(a.network_interfaces), 1000)),
+    Scenario("create_ec2_instance", "create_ec2_instance",
+             lambda a: {"image_id": "ami-0123456789abcdef0", "instance_type": "t3.micro", "min_count": 1,
+                        "max_count": 1}, lambda a: 1),
+    Scenario("create_ec2_instances", "create_ec2_instances",
+             lambda a: {"image_id": "ami-0123456789abcdef0", "instance_type": "t3.micro", "count": 100,
+                        "subnet_ids": [f"subnet-{k:017x}" for k in range(4)]}, lambda a: 4),
+    Scenario("terminate_ec2_instance", "terminate_ec2_instance",
+             lambda a: {"instance_id": a.instances[0]["InstanceId"]}, lambda a: 1),
+    Scenario("terminate_ec2_instances", "terminate_ec2_instances",
+             lambda a: {"instance_ids": [i["InstanceId"] for i in a.instances[::10]]},
+             lambda a: pages(len(a.instances[::10]), 100)),
+
+    # ECR
+    Scenario("create_repository", "create_repository", lambda a: {"repository_name": "bench"}, lambda a: 1),
+    Scenario("delete_repository", "delete_repository", lambda a: {"repository_name": "bench"}, lambda a: 1),
+    Scenario("describe_repositories", "describe_repositories", lambda a: {},
+             lambda a: pages(len(a.repositories), 100)),
+    Scenario("list_images", "list_images", lambda a: {"repository_name": a.repositories[0]}, lambda a: 1),
+    # A search against an index refreshed from CloudTrail must not re-scan unchanged repositories.
+    Scenario("find_images", "find_images", lambda a: _FIND_IMAGES,
+             lambda a: pages(len(a.repositories), 1000) + 2 + len(a.repositories), setup=(("find_images", lambda a: _FIND_IMAGES),),
+             env={"ECR_INDEX_TTL_SECONDS": "0"}),
+    Scenario("find_images_full_refresh", "find_images", lambda a: dict(_FIND_IMAGES, refresh=True),
+             lambda a: pages(len(a.repositories), 1000) + len(a.repositories)),
+
+    # ECS and EKS
+    Scenario("register_task_definition", "register_task_definition",
+             lambda a: {"family": "bench", "taskRoleArn": "arn:aws:iam::123456789012:role/task",
+                        "executionRoleArn": "arn:aws:iam::123456789012:role/execution", "networkMode": "awsvpc",
+                        "containerDefinitions": [{"name": "app", "image": "nginx"}]}, lambda a: 1),
+    Scenario("deregister_task_definition", "deregister_task_definition",
+             lambda a: {"task_definition_arn": a.task_definitions[0]}, lambda a: 1),
+    Scenario("describe_task_definition", "describe_task_definition",
+             lambda a: {"task_definition_arn": a.task_definitions[0]}, lambda a: 1),
+    Scenario("list_task_definitions", "list_task_definitions", lambda a: {},
+             lambda a: pages(len(a.task_definitions), 100)),
+    Scenario("create_cluster", "create_cluster",
+             lambda a: {"name": "bench", "roleArn": "arn:aws:iam::123456789012:role/eks",
+                        "resourcesVpcConfig": {"subnetIds": ["subnet-00000000000000001"]}}, lambda a: 1),
+    Scenario("delete_cluster", "delete_cluster", lambda a: {"cluster_name": a.clusters[0]}, lambda a: 1),
+    Scenario("describe_cluster", "describe_cluster", lambda a: {"cluster_name": a.clusters[0]}, lambda a: 1),
+    Scenario("list_clusters", "list_clusters", lambda a: {}, lambda a: pages(len(a.clusters), 100)),
+
+    # IAM
+    Scenario("create_user", "create_user", lambda a: {"username": "bench"}, lambda a: 1,
+             known_error="TypeError"),
+    Scenario("delete_user", "delete_user", lambda a: {"username": a.users[0]["UserName"]}, lambda a: 1),
+    Scenario("list_users", "list_users", lambda a: {}, lambda a: pages(len(a.users), 100)),
+    Scenario("list_users_by_name", "list_users", lambda a: {"usernames": _usernames(a)}, _user_lookup_calls),
+    Scenario("create_access_key", "create_access_key", lambda a: {"username": a.users[0]["UserName"]},
+             lambda a: 1),
+    Scenario("list_access_keys", "list_access_keys", lambda a: {"username": a.users[0]["UserName"]},
+             lambda a: 1),
+    Scenario("grant_s3_access", "grant_s3_access",
+             lambda a: {"bucket_name": "bench-source", "user_name": "bench", "permissions": "read-only"},
+             lambda a: 1),
+
+    # Lambda and Route 53
+    Scenario("create_function", "create_function",
+             lambda a: {"FunctionName": "bench", "Runtime": "python3.9", "Handler": "index.handler",
+                        "Role": "arn:aws:iam::123456789012:role/lambda", "Code": {"ZipFile": b"bench"}},
+             lambda a: 1),
+    Scenario("delete_function", "delete_function", lambda a: {"function_name": "bench"}, lambda a: 1),
+    Scenario("get_function", "get_function", lambda a: {"function_name": a.functions[0]["FunctionName"]},
+             lambda a: 1),
+    Scenario("list_functions", "list_functions", lambda a: {}, lambda a: pages(len(a.functions), 50)),
+    Scenario("list_hosted_zones", "list_hosted_zones", lambda a: {}, lambda a: pages(len(a.hosted_zones), 100)),
+    Scenario("create_hosted_zone", "create_hosted_zone",
+             lambda a: {"name": "bench.example.com", "caller_reference": "bench", "vpc_id": "vpc-0000000000000001",
+                        "vpc_region": "eu-west-1", "comment": "bench", "private_zone": True}, lambda a: 1),
+
+    # S3
+    Scenario("copy_object_to_s3", "copy_object_to_s3",
+             lambda a: {"source_bucket": "bench-large", "destination_bucket": "bench-destination",
+                        "object_key": "large/blob.bin"},
+             lambda a: 5 + math.ceil(LARGE_OBJECT_SIZE / (64 * 1024 ** 2))),
+    Scenario("sync_s3_prefix", "sync_s3_prefix",
+             lambda a: {"source_bucket": "bench-source", "destination_bucket": "bench-destination",
+                        "source_prefix": "data/"},
+             lambda a: pages(len(a.buckets["bench-source"]), 1000) + pages(len(a.buckets["bench-destination"]), 1000)
+             + len(a.buckets["bench-source"]) - len(a.buckets["bench-destination"])),
+    Scenario("scan_s3_bucket", "scan_s3_bucket", lambda a: {"bucket": "bench-source", "target_partitions": 32},
+             lambda a: pages(len(a.buckets["bench-source"]), 1000) + 32 * 2),
+    Scenario("delete_s3_objects", "delete_s3_objects", lambda a: {"bucket": "bench-source", "prefix": "data/"},
+             lambda a: 2 * pages(len(a.buckets["bench-source"]), 1000)),
+    Scenario("delete_s3_objects_by_key", "delete_s3_objects",
+             lambda a: {"bucket": "bench-source", "keys": [item["Key"] for item in a.buckets["bench-source"]],
+                        "modified_before": "2100-01-01T00:00:00Z", "dry_run": True},
+             lambda a: len({item["Key"].rpartition("/")[0] for item in a.buckets["bench-source"]})
+             + pages(len(a.buckets["bench-source"]), 1000)),
+    Scenario("create_s3_bucket", "create_s3_bucket", lambda a: {"bucket_name": "bench", "region": "eu-west-1"},
+             lambda a: 1),
+
+    # CloudWatch
+    Scenario("create_alarm", "create_alarm",
+             lambda a: {"AlarmName": "bench", "ComparisonOperator": "GreaterThanThreshold", "EvaluationPeriods": 1,
+                        "MetricName": "CPUUtilization", "Namespace": "AWS/EC2", "Period": 60,
+                        "Statistic": "Average", "Threshold": 90.0}, lambda a: 1,
+             known_error="KeyError"),
+    Scenario("delete_alarm", "delete_alarm", lambda a: {"alarm_name": a.alarms[0]["AlarmName"]}, lambda a: 1),
+    Scenario("describe_alarms", "describe_alarms", lambda a: {}, lambda a: pages(len(a.alarms), 100)),
+    Scenario("describe_alarms_projected", "describe_alarms",
+             lambda a: {"Fields": "{name: AlarmName, state: StateValue}"}, lambda a: pages(len(a.alarms), 100)),
+    Scenario("put_metric_data", "put_metric_data", lambda a: {"Namespace": "Benchmark", "MetricData": _metric_data(a)},
+             lambda a: pages(len(_metric_data(a)), 1000)),
+    Scenario("flush_metric_data", "flush_metric_data", lambda a: {}, lambda a: pages(len(_metric_data(a)), 1000),
+             setup=(("put_metric_data", lambda a: {"Namespace": "Benchmark", "MetricData": _metric_data(a),
+                                                   "Buffered": True}),)),
+    Scenario("get_metric_data", "get_metric_data", _get_metric_data, _metric_calls),
+    # Settled datapoints are served from the cache
+    Scenario("get_metric_data_cached", "get_metric_data", lambda a: _get_metric_data(a, UseCache=True),
+             lambda a: 0, setup=(("get_metric_data", lambda a: _get_metric_data(a, UseCache=True)),)),
+    Scenario("list_metrics", "list_metrics", lambda a: {"Namespace": "Benchmark"},
+             lambda a: pages(len(a.metrics), 500)),
+    Scenario("list_metrics_catalog", "list_metrics",
+             lambda a: {"Namespace": "Benchmark", "MetricName": "NetworkIn", "UseCatalog": True}, lambda a: 0,
+             setup=(("list_metrics", lambda a: {"Namespace": "Benchmark", "UseCatalog": True}),)),
+    Scenario("invalidate_metric_catalog", "invalidate_metric_catalog", lambda a: {}, lambda a: 0),
+
+    # WorkSpaces
+    Scenario("describe_workspaces", "describe_workspaces", lambda a: {}, lambda a: pages(len(a.workspaces), 25)),
+    Scenario("describe_workspaces_by_id", "describe_workspaces",
+             lambda a: {"workspace_ids": list(a.workspaces_by_id), "include_connection_status": True},
+             lambda a: 2 * pages(len(a.workspaces), 25)),
+    Scenario("create_workspace", "create_workspace",
+             lambda a: {"directory_id": "d-1234567890", "user_name": "bench", "bundle_id": "wsb-12345678a"},
+             lambda a: 1),
+    Scenario("create_workspaces", "create_workspaces",
+             lambda a: {"workspaces": [{"directory_id": "d-1234567890", "user_name": f"bench-{k}",
+                                        "bundle_id": "wsb-12345678a"} for k in range(100)]}, lambda a: 4),
+    Scenario("terminate_workspace", "terminate_workspace",
+             lambda a: {"workspace_id": a.workspaces[0]["WorkspaceId"]}, lambda a: 1),
+    Scenario("terminate_workspaces", "terminate_workspaces",
+             lambda a: {"workspace_ids": list(a.workspaces_by_id)}, lambda a: pages(len(a.workspaces), 25)),
+
+    # Fan-out and composition
+    Scenario("fan_out_regions", "fan_out_regions", lambda a: {"action_name": "list_functions"},
+             lambda a: 1 + 4 * pages(len(a.functions), 50)),
+    Scenario("fan_out_accounts", "fan_out_accounts",
+             lambda a: {"action_name": "list_functions",
+                        "accounts": [{"account_id": f"1000000000{k:02d}", "role_name": "bench"} for k in range(3)]},
+             lambda a: 3 + 3 * pages(len(a.functions), 50)),
+    Scenario("run_actions", "run_actions", lambda a: {"calls": _run_actions_calls(a)},
+             lambda a: pages(len(a.functions), 50) + pages(len(a.clusters), 100) + pages(len(a.alarms), 100)),
+
+    # Diagnostics
+    Scenario("client_pool_stats", "client_pool_stats", lambda a: {}, lambda a: 0),
+    Scenario("metric_cache_stats", "metric_cache_stats", lambda a: {}, lambda a: 0),
+    Scenario("rate_limiter_stats", "rate_limiter_stats", lambda a: {}, lambda a: 0),
+    Scenario("prometheus_metrics", "prometheus_metrics", lambda a: {}, lambda a: 0),
+    Scenario("import_time_report", "import_time_report", lambda a: {}, lambda a: 0),
+]
@@ -0,0 +1,470 @@
+import bisect
+import hashlib
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import botocore.session
+from botocore.awsrequest import AWSResponse
+
+# Largest page each paginated operation returns, and its size without a limit
+_PAGE_SIZES = {
+    "DescribeInstances": 1000,
+    "DescribeSecurityGroups": 1000,
+    "DescribeNetworkInterfaces": 1000,
+    "DescribeRepositories": 1000,
+    "DescribeImages": 1000,
+    "ListImages": 1000,
+    "ListUsers": 1000,
+    "ListFunctions": 50,
+    "DescribeAlarms": 100,
+    "ListMetrics": 500,
+    "ListHostedZones": 100,
+    "DescribeWorkspaces": 25,
+    "DescribeWorkspacesConnectionStatus": 25,
+    "LookupEvents": 50,
+}
+_DEFAULT_PAGE_SIZES = {"ListUsers": 100, "DescribeRepositories": 100, "DescribeImages": 100, "ListImages": 100}
+
+_EPOCH = datetime(2023, 1, 1, tzinfo=timezone.utc)
+_REGIONS = ("eu-west-1", "eu-central-1", "us-east-1", "us-west-2")
+_INSTANCE_TYPES = ("t3.micro", "t3.large", "m5.xlarge", "c5.2xlarge")
+_IMAGES_PER_REPOSITORY = 5
+LARGE_OBJECT_SIZE = 1024 ** 3
+
+
+class _Error(Exception):
+    def __init__(self, code: str, status: int = 400):
+        super().__init__(code)
+        self.code = code
+        self.status = status
+
+
+class SyntheticAccount:
+    """
+    An in-memory AWS account served to boto3 clients through botocore event hooks.
+
+    The account is generated from `scale`, the number of EC2 instances; every
+    other resource is sized relative to it (scale / 5 ECR repositories,
+    scale / 10 IAM users, scale S3 objects, ...). Calls are answered before
+    anything is sent, after parameter validation and serialization, and are
+    counted per operation. `latency` seconds are slept per call so that the
+    number of sequential calls shows in the measured latency.
+    """
+
+    def __init__(self, scale: int, latency: float = 0.0):
+        self.scale = scale
+        self.latency = latency
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self._paginators = {}
+        self._session = botocore.session.get_session()
+        self._build()
+
+    def install(self, client):
+        """
+        Hooks the account into a boto3 client, so that its calls never leave the process.
+
+        Args:
+            client: The boto3 client to answer.
+        """
+        service_model = client.meta.service_model
+        service_id = service_model.service_id.hyphenize()
+
+        def stash_params(params: dict, context: dict, **kwargs):
+            context["synthetic_params"] = params
+
+        def answer(model, context: dict, **kwargs):
+            with self._lock:
+                self.calls[f"{service_model.service_name}.{model.name}"] += 1
+            if self.latency:
+                time.sleep(self.latency)
+            params = context.get("synthetic_params", {})
+            try:
+                parsed = self._call(service_model.service_name, model.name, params)
+            except _Error as e:
+                return (AWSResponse("", e.status, {}, None),
+                        {"Error": {"Code": e.code, "Message": e.code}, "ResponseMetadata": {"HTTPStatusCode": e.status}})
+            parsed.setdefault("ResponseMetadata", {"HTTPStatusCode": 200, "RetryAttempts": 0})
+            return AWSResponse("", 200, {}, None), parsed
+
+        client.meta.events.register(f"before-parameter-build.{service_id}", stash_params)
+        client.meta.events.register(f"before-call.{service_id}", answer)
+
+    def reset_calls(self):
+        with self._lock:
+            self.calls.clear()
+
+    def _call(self, service_name: str, operation_name: str, params: dict) -> dict:
+        handler = getattr(self, f"_{service_name.replace('-', '_')}_{_snake(operation_name)}", None)
+        if handler is not None:
+            return handler(params)
+        lister = getattr(self, f"_list_{service_name.replace('-', '_')}_{_snake(operation_name)}", None)
+        if lister is not None:
+            return self._page(service_name, operation_name, params, lister(params))
+        # Mutations whose response the actions do not read
+        return {}
+
+    def _page(self, service_name: str, operation_name: str, params: dict, items: list) -> dict:
+        config = self._paginator(service_name, operation_name)
+        input_token = _first(config["input_token"])
+        output_token = _first(config["output_token"])
+        size = _DEFAULT_PAGE_SIZES.get(operation_name, _PAGE_SIZES.get(operation_name, 100))
+        if config.get("limit_key") and params.get(config["limit_key"]):
+            size = min(int(params[config["limit_key"]]), _PAGE_SIZES.get(operation_name, 1000))
+        start = int(params.get(input_token) or 0)
+        response = {_first(config["result_key"]): items[start:start + size]}
+        more = start + size < len(items)
+        if more:
+            response[output_token] = str(start + size)
+        if config.get("more_results"):
+            response[config["more_results"]] = more
+        return response
+
+    def _paginator(self, service_name: str, operation_name: str) -> dict:
+        key = (service_name, operation_name)
+        if key not in self._paginators:
+            model = self._session.get_paginator_model(service_name)
+            self._paginators[key] = model.get_paginator(operation_name)
+        return self._paginators[key]
+
+    def _build(self):
+        n = self.scale
+        self.instances = [{
+            "InstanceId": f"i-{k:017x}",
+            "InstanceType": _INSTANCE_TYPES[k % len(_INSTANCE_TYPES)],
+            "ImageId": "ami-0123456789abcdef0",
+            "State": {"Code": 16, "Name": "running"},
+            "LaunchTime": _EPOCH + timedelta(minutes=k),
+            "PrivateIpAddress": f"10.{k >> 16 & 255}.{k >> 8 & 255}.{k & 255}",
+            "SubnetId": f"subnet-{k % 8:017x}",
+            "VpcId": "vpc-0000000000000001",
+            "Tags": [{"Key": "Name", "Value": f"instance-{k}"}],
+        } for k in range(n)]
+
+        group_count = max(n // 20, 4)
+        self.security_groups = [{
+            "GroupId": f"sg-{k:017x}",
+            "GroupName": "default" if k == 0 else f"group-{k}",
+            "VpcId": "vpc-0000000000000001",
+            "IpPermissions": [{"IpProtocol": "tcp", "FromPort": 443, "ToPort": 443,
+                               "UserIdGroupPairs": [{"GroupId": f"sg-{(k + 1) % group_count:017x}"}]}]
+            if k % 10 == 0 else [],
+        } for k in range(group_count)]
+        self.network_interfaces = [{
+            "NetworkInterfaceId": f"eni-{k:017x}",
+            "Groups": [{"GroupId": f"sg-{k % (group_count // 2):017x}", "GroupName": "group"}],
+        } for k in range(n // 2)]
+
+        self.repositories = [f"service-{k:05d}" for k in range(max(n // 5, 1))]
+        self.users = [{
+            "UserName": f"user-{k:05d}",
+            "UserId": f"AIDA{k:017d}",
+            "Arn": f"arn:aws:iam::123456789012:user/user-{k:05d}",
+            "Path": "/",
+            "CreateDate": _EPOCH + timedelta(hours=k),
+        } for k in range(max(n // 10, 1))]
+        self.users_by_name = {user["UserName"]: user for user in self.users}
+        self.functions = [{
+            "FunctionName": f"function-{k:05d}",
+            "FunctionArn": f"arn:aws:lambda:eu-west-1:123456789012:function:function-{k:05d}",
+            "Runtime": "python3.9",
+            "MemorySize": 128,
+        } for k in range(max(n // 10, 1))]
+        self.alarms = [{
+            "AlarmName": f"alarm-{k:05d}",
+            "Namespace": "AWS/EC2",
+            "MetricName": "CPUUtilization",
+            "Dimensions": [{"Name": "InstanceId", "Value": f"i-{k:017x}"}],
+            "StateValue": "OK",
+            "Threshold": 90.0,
+        } for k in range(max(n // 10, 1))]
+        self.metrics = [{
+            "Namespace": "Benchmark",
+            "MetricName": ("CPUUtilization", "NetworkIn", "NetworkOut", "DiskReadOps")[k % 4],
+            "Dimensions": [{"Name": "InstanceId", "Value": f"i-{k // 4:017x}"}],
+        } for k in range(n)]
+        self.workspaces = [{
+            "WorkspaceId": f"ws-{k:08x}",
+            "DirectoryId": "d-1234567890",
+            "UserName": f"user-{k:05d}",
+            "BundleId": "wsb-12345678a",
+            "State": "AVAILABLE",
+        } for k in range(max(n // 10, 1))]
+        self.workspaces_by_id = {workspace["WorkspaceId"]: workspace for workspace in self.workspaces}
+        self.clusters = [f"cluster-{k:03d}" for k in range(n // 100 + 1)]
+        self.task_definitions = [f"arn:aws:ecs:eu-west-1:123456789012:task-definition/family-{k // 10:04d}:{k % 10 + 1}"
+                                 for k in range(max(n // 10, 1))]
+        self.hosted_zones = [{"Id": f"/hostedzone/Z{k:012d}", "Name": f"zone-{k}.example.com.",
+                              "CallerReference": str(k), "Config": {"PrivateZone": False}}
+                             for k in range(n // 100 + 1)]
+
+        # Every source object exists in the destination for the first half of the keys only.
+        source = [{
+            "Key": f"data/{k % 10:02d}/part-{k:07d}.json",
+            "Size": 1024 + k % 1000,
+            "ETag": '"%s"' % hashlib.md5(str(k).encode()).hexdigest(),
+            "LastModified": _EPOCH + timedelta(seconds=k),
+            "StorageClass": "STANDARD",
+        } for k in range(n)]
+        source.sort(key=lambda item: item["Key"])
+        self.buckets = {
+            "bench-source": source,
+            "bench-destination": [dict(item) for item in source if int(item["Key"][-12:-5]) < n // 2],
+            "bench-large": [{"Key": "large/blob.bin", "Size": LARGE_OBJECT_SIZE, "ETag": '"%s-8"' % ("0" * 32),
+                             "LastModified": _EPOCH, "StorageClass": "STANDARD"}],
+        }
+        self._bucket_keys = {bucket: [item["Key"] for item in items] for bucket, items in self.buckets.items()}
+
+    # EC2
+
+    def _list_ec2_describe_instances(self, params: dict) -> list:
+        instances = _filtered(self.instances, params.get("Filters"),
+                              {"instance-id": "InstanceId", "instance-type": "InstanceType"})
+        return [{"ReservationId": f"r-{k:017x}", "OwnerId": "123456789012", "Instances": instances[k:k + 4]}
+                for k in range(0, len(instances), 4)]
+
+    def _list_ec2_describe_security_groups(self, params: dict) -> list:
+        return self.security_groups
+
+    def _list_ec2_describe_network_interfaces(self, params: dict) -> list:
+        return self.network_interfaces
+
+    def _ec2_describe_regions(self, params: dict) -> dict:
+        return {"Regions": [{"RegionName": region, "OptInStatus": "opt-in-not-required"} for region in _REGIONS]}
+
+    def _ec2_run_instances(self, params: dict) -> dict:
+        return {"Instances": [{"InstanceId": f"i-{self.scale + k:017x}", "InstanceType": params["InstanceType"]}
+                              for k in range(params["MaxCount"])]}
+
+    def _ec2_terminate_instances(self, params: dict) -> dict:
+        return {"TerminatingInstances": [{"InstanceId": instance_id,
+                                          "PreviousState": {"Code": 16, "Name": "running"},
+                                          "CurrentState": {"Code": 32, "Name": "shutting-down"}}
+                                         for instance_id in params["InstanceIds"]]}
+
+    # ECR and CloudTrail
+
+    def _list_ecr_describe_repositories(self, params: dict) -> list:
+        names = params.get("repositoryNames") or self.repositories
+        return [{"repositoryName": name, "repositoryArn": f"arn:aws:ecr:eu-west-1:123456789012:repository/{name}"}
+                for name in names]
+
+    def _list_ecr_describe_images(self, params: dict) -> list:
+        repository = params["repositoryName"]
+        seed = self.repositories.index(repository) if repository in self.repositories else 0
+        return [{
+            "repositoryName": repository,
+            "imageDigest": "sha256:" + hashlib.sha256(f"{repository}:{k}".encode()).hexdigest(),
+            "imageTags": [f"v1.{k}.{seed % 100}", f"build-{seed * _IMAGES_PER_REPOSITORY + k}"],
+            "imagePushedAt": _EPOCH + timedelta(hours=k),
+        } for k in range(_IMAGES_PER_REPOSITORY)]
+
+    def _list_ecr_list_images(self, params: dict) -> list:
+        return [{"imageDigest": image["imageDigest"], "imageTag": image_tag}
+                for image in self._list_ecr_describe_images(params) for image_tag in image["imageTags"]]
+
+    def _ecr_create_repository(self, params: dict) -> dict:
+        return {"repository": {"repositoryName": params["repositoryName"],
+                               "repositoryArn": f"arn:aws:ecr:eu-west-1:123456789012:repository/{params['repositoryName']}"}}
+
+    def _list_cloudtrail_lookup_events(self, params: dict) -> list:
+        return []
+
+    # IAM and STS
+
+    def _list_iam_list_users(self, params: dict) -> list:
+        return self.users
+
+    def _iam_get_user(self, params: dict) -> dict:
+        user = self.users_by_name.get(params["UserName"])
+        if user is None:
+            raise _Error("NoSuchEntity", 404)
+        return {"User": user}
+
+    def _iam_create_user(self, params: dict) -> dict:
+        return {"User": {"UserName": params["UserName"], "UserId": "AIDA00000000000000000",
+                         "Arn": f"arn:aws:iam::123456789012:user/{params['UserName']}", "Path": "/",
+                         "CreateDate": _EPOCH}}
+
+    def _iam_create_access_key(self, params: dict) -> dict:
+        return {"AccessKey": {"UserName": params["UserName"], "AccessKeyId": "AKIA0000000000000000",
+                              "SecretAccessKey": "secret", "Status": "Active", "CreateDate": _EPOCH}}
+
+    def _iam_list_access_keys(self, params: dict) -> dict:
+        return {"AccessKeyMetadata": [{"UserName": params["UserName"], "AccessKeyId": "AKIA0000000000000000",
+                                       "Status": "Active", "CreateDate": _EPOCH}]}
+
+    def _sts_assume_role(self, params: dict) -> dict:
+        return {"Credentials": {"AccessKeyId": "ASIA0000000000000000", "SecretAccessKey": "secret",
+                                "SessionToken": "token",
+                                "Expiration": datetime.now(timezone.utc) + timedelta(hours=1)},
+                "AssumedRoleUser": {"AssumedRoleId": "AROA0000000000000000:session", "Arn": params["RoleArn"]}}
+
+    # Lambda, EKS, ECS and Route 53
+
+    def _list_lambda_list_functions(self, params: dict) -> list:
+        return self.functions
+
+    def _lambda_get_function(self, params: dict) -> dict:
+        return {"Configuration": self.functions[0]}
+
+    def _lambda_create_function(self, params: dict) -> dict:
+        return {"FunctionName": params["FunctionName"]}
+
+    def _list_eks_list_clusters(self, params: dict) -> list:
+        return self.clusters
+
+    def _eks_describe_cluster(self, params: dict) -> dict:
+        return {"cluster": {"name": params["name"], "status": "ACTIVE", "version": "1.27"}}
+
+    def _eks_create_cluster(self, params: dict) -> dict:
+        return {"cluster": {"name": params["name"], "status": "CREATING"}}
+
+    def _ecs_list_clusters(self, params: dict) -> dict:
+        return {"clusterArns": [f"arn:aws:ecs:eu-west-1:123456789012:cluster/{name}" for name in self.clusters]}
+
+    def _list_ecs_list_task_definitions(self, params: dict) -> list:
+        return self.task_definitions
+
+    def _ecs_describe_task_definition(self, params: dict) -> dict:
+        return {"taskDefinition": {"taskDefinitionArn": params["taskDefinition"], "revision": 1}}
+
+    def _ecs_register_task_definition(self, params: dict) -> dict:
+        return {"taskDefinition": {"family": params["family"], "revision": 1}}
+
+    def _list_route53_list_hosted_zones(self, params: dict) -> list:
+        return self.hosted_zones
+
+    def _route53_create_hosted_zone(self, params: dict) -> dict:
+        return {"HostedZone": {"Id": "/hostedzone/Z000000000000", "Name": params["Name"],
+                               "CallerReference": params["CallerReference"]}}
+
+    # CloudWatch
+
+    def _list_cloudwatch_describe_alarms(self, params: dict) -> list:
+        if params.get("AlarmNames"):
+            names = set(params["AlarmNames"])
+            return [alarm for alarm in self.alarms if alarm["AlarmName"] in names]
+        return self.alarms
+
+    def _list_cloudwatch_list_metrics(self, params: dict) -> list:
+        metrics = [metric for metric in self.metrics if metric["Namespace"] == params.get("Namespace")]
+        if params.get("MetricName"):
+            metrics = [metric for metric in metrics if metric["MetricName"] == params["MetricName"]]
+        return metrics
+
+    def _cloudwatch_put_metric_alarm(self, params: dict) -> dict:
+        return {}
+
+    def _cloudwatch_get_metric_data(self, params: dict) -> dict:
+        start, end = params["StartTime"], params["EndTime"]
+        results = []
+        for query in params["MetricDataQueries"]:
+            if query.get("ReturnData") is False:
+                continue
+            period = query.get("MetricStat", {}).get("Period") or query.get("Period") or 60
+            first = int(start.timestamp()) // period * period
+            if first < start.timestamp():
+                first += period
+            timestamps = [datetime.fromtimestamp(t, timezone.utc) for t in range(first, int(end.timestamp()), period)]
+            results.append({"Id": query["Id"], "Label": query.get("Label", query["Id"]), "StatusCode": "Complete",
+                            "Timestamps": timestamps, "Values": [float(t.minute) for t in timestamps]})
+        return {"MetricDataResults": results, "Messages": []}
+
+    # WorkSpaces
+
+    def _list_workspaces_describe_workspaces(self, params: dict) -> list:
+        if params.get("WorkspaceIds"):
+            return [self.workspaces_by_id[w] for w in params["WorkspaceIds"] if w in self.workspaces_by_id]
+        return [w for w in self.workspaces
+                if all(w[name] == params[name] for name in ("DirectoryId", "UserName", "BundleId") if params.get(name))]
+
+    def _list_workspaces_describe_workspaces_connection_status(self, params: dict) -> list:
+        return [{"WorkspaceId": workspace_id, "ConnectionState": "DISCONNECTED"}
+                for workspace_id in params.get("WorkspaceIds") or self.workspaces_by_id]
+
+    def _workspaces_create_workspaces(self, params: dict) -> dict:
+        return {"FailedRequests": [],
+                "PendingRequests": [dict(request, WorkspaceId=f"ws-{hash(request['UserName']) & 0xffffffff:08x}",
+                                         State="PENDING") for request in params["Workspaces"]]}
+
+    def _workspaces_terminate_workspaces(self, params: dict) -> dict:
+        return {"FailedRequests": []}
+
+    # S3
+
+    def _s3_list_objects_v2(self, params: dict) -> dict:
+        bucket = params["Bucket"]
+        if bucket not in self.buckets:
+            raise _Error("NoSuchBucket", 404)
+        keys, items = self._bucket_keys[bucket], self.buckets[bucket]
+        prefix, delimiter = params.get("Prefix", ""), params.get("Delimiter")
+        max_keys = min(params.get("MaxKeys") or 1000, 1000)
+        start_after = max(params.get("StartAfter") or "", params.get("ContinuationToken") or "")
+        i = max(bisect.bisect_right(keys, start_after), bisect.bisect_left(keys, prefix))
+
+        contents, common_prefixes, last = [], [], None
+        while i < len(keys) and keys[i].startswith(prefix) and len(contents) + len(common_prefixes) < max_keys:
+            position = keys[i].find(delimiter, len(prefix)) if delimiter else -1
+            if position >= 0:
+                common_prefix = keys[i][:position + len(delimiter)]
+                common_prefixes.append({"Prefix": common_prefix})
+                # Continue after every key of the common prefix
+                last = common_prefix + "\U0010ffff"
+                i = bisect.bisect_left(keys, last)
+            else:
+                contents.append(items[i])
+                last = keys[i]
+                i += 1
+
+        truncated = i < len(keys) and keys[i].startswith(prefix)
+        response = {"Contents": contents, "CommonPrefixes": common_prefixes, "KeyCount": len(contents),
+                    "IsTruncated": truncated, "Prefix": prefix, "MaxKeys": max_keys}
+        if truncated:
+            response["NextContinuationToken"] = last
+        return response
+
+    def _s3_head_object(self, params: dict) -> dict:
+        keys = self._bucket_keys.get(params["Bucket"], [])
+        i = bisect.bisect_left(keys, params["Key"])
+        if i == len(keys) or keys[i] != params["Key"]:
+            raise _Error("404", 404)
+        item = self.buckets[params["Bucket"]][i]
+        return {"ContentLength": item["Size"], "ETag": item["ETag"], "LastModified": item["LastModified"],
+                "ContentType": "application/octet-stream", "Metadata": {"owner": "benchmark"}}
+
+    def _s3_get_object_tagging(self, params: dict) -> dict:
+        return {"TagSet": [{"Key": "team", "Value": "benchmark"}]}
+
+    def _s3_copy_object(self, params: dict) -> dict:
+        return {"CopyObjectResult": {"ETag": '"%s"' % ("0" * 32), "LastModified": _EPOCH}}
+
+    def _s3_create_multipart_upload(self, params: dict) -> dict:
+        return {"Bucket": params["Bucket"], "Key": params["Key"], "UploadId": "upload"}
+
+    def _s3_upload_part_copy(self, params: dict) -> dict:
+        return {"CopyPartResult": {"ETag": '"%032x"' % params["PartNumber"], "LastModified": _EPOCH}}
+
+    def _s3_complete_multipart_upload(self, params: dict) -> dict:
+        return {"Bucket": params["Bucket"], "Key": params["Key"], "ETag": '"%s-8"' % ("0" * 32)}
+
+    def _s3_delete_objects(self, params: dict) -> dict:
+        return {"Deleted": [{"Key": entry["Key"]} for entry in params["Delete"]["Objects"]], "Errors": []}
+
+
+def _filtered(items: list, filters: list, fields: dict) -> list:
+    for f in filters or []:
+        if f["Name"] in fields:
+            values = set(f["Values"])
+            items = [item for item in items if item[fields[f["Name"]]] in values]
+    return items
+
+
+def _first(value):
+    return value[0] if isinstance(value, list) else value
+
+
+def _snake(name: str) -> str:
+    return "".join("_" + c.lower() if c.isupper() and i else c.lower() for i, c in enumerate(name))
@@ -0,0 +1,160 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+DEFAULT_MAX_WORKERS = 10
+
+_EXHAUSTED = object()
+
+
+def imap_unordered(func: Callable, items: Iterable, max_workers: int = DEFAULT_MAX_WORKERS,
+                   stop: threading.Event = None, timeout: float = None) -> Iterator[Tuple]:
+    """
+    Runs `func` over `items` on a bounded worker pool, yielding results as they complete.
+
+    Items are pulled lazily and at most twice `max_workers` calls are in flight,
+    so `items` may be an unbounded stream (e.g. pages of a paginator). Setting
+    `stop`, or closing the generator, stops submitting new work and cancels
+    the calls that have not started yet. Calls run in a copy of the caller's
+    context, so scopes such as `aws_wrapper.region_scope` carry over.
+
+    Args:
+        func (Callable): The function to call with each item.
+        items (Iterable): The items to process.
+        max_workers (int): The maximum number of concurrent calls.
+        stop (threading.Event): An optional event that ends the run early when set.
+        timeout (float): An optional limit in seconds on each call, counted from when it starts
+            running. Calls that exceed it are reported with a TimeoutError and their result is
+            discarded.
+
+    Yields:
+        tuple: (item, result, error) for each completed call; error is None on success.
+    """
+    stop = stop or threading.Event()
+    items = iter(items)
+    in_flight = {}
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        while True:
+            while not stop.is_set() and len(in_flight) < max_workers * 2:
+                item = next(items, _EXHAUSTED)
+                if item is _EXHAUSTED:
+                    break
+                started = [None]
+                future = executor.submit(contextvars.copy_context().run, _run, func, item, started)
+                in_flight[future] = (item, started)
+
+            if stop.is_set():
+                for future in in_flight:
+                    future.cancel()
+
+            if not in_flight:
+                return
+
+            done, _ = wait(in_flight, timeout=_next_deadline(in_flight, timeout), return_when=FIRST_COMPLETED)
+            for future in done:
+                item, _ = in_flight.pop(future)
+                if future.cancelled():
+                    continue
+                error = future.exception()
+                yield item, None if error else future.result(), error
+
+            if timeout is not None:
+                now = time.monotonic()
+                for future, (item, started) in list(in_flight.items()):
+                    if started[0] is not None and now - started[0] > timeout:
+                        del in_flight[future]
+                        yield item, None, TimeoutError(f"timed out after {timeout}s")
+    finally:
+        stop.set()
+        for future in in_flight:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket.
+
+    Tokens refill at `rate` per second up to `burst`. Callers that find the
+    bucket empty reserve the next token and sleep until it is due, so waiting
+    callers are served in order.
+    """
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Takes a token, waiting for it if needed.
+
+        Returns:
+            float: The time waited in seconds.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if delay:
+            time.sleep(delay)
+        return delay
+
+    def set_rate(self, rate: float, burst: float = None):
+        """
+        Changes the refill rate (and burst) of the bucket, keeping the tokens already accrued.
+
+        Args:
+            rate (float): The new number of tokens per second.
+            burst (float): The new bucket size, by default one second worth of tokens.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self.rate = rate
+            self.burst = burst or max(1.0, rate)
+            self._tokens = min(self._tokens, self.burst)
+
+
+def batched(items: Iterable, size: int) -> Iterator[List]:
+    """
+    Splits a stream of items into lists of at most `size` items.
+
+    Args:
+        items (Iterable): The items to split.
+        size (int): The maximum size of a batch.
+
+    Yields:
+        List: The next batch.
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _run(func: Callable, item, started: list):
+    started[0] = time.monotonic()
+    return func(item)
+
+
+def _next_deadline(in_flight: dict, timeout: float):
+    # Seconds until the earliest running call times out
+    if timeout is None:
+        return None
+    starts = [started[0] for _, started in in_flight.values() if started[0] is not None]
+    if not starts:
+        return timeout
+    return max(0.0, min(starts) + timeout - time.monotonic())
@@ -0,0 +1,328 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from botocore.exceptions import ClientError
+
+from .concurrency import RateLimiter, imap_unordered
+from .pagination import iter_items, iter_pages
+
+# CloudTrail delivers management events within ~15 minutes, so incremental
+# syncs look back that far before the previous sync.
+_CLOUDTRAIL_DELAY_SECONDS = 15 * 60
+_CHANGE_EVENTS = ("PutImage", "BatchDeleteImage")
+# LookupEvents is limited to 2 requests per second per account and region
+_LOOKUP_EVENTS_RATE = 2.0
+
+_MATCH_CLAUSES = {
+    "substring": "instr(image_tag, ?) > 0",
+    "prefix": "image_tag >= ? AND image_tag < ?",
+    "glob": "image_tag GLOB ?",
+    "regex": "image_tag REGEXP ?",
+}
+
+# Rows are keyed by account and region. `account` is the account ID of the
+# enclosing account_scope, or "" for the store's own credentials. An index
+# written with another schema version is dropped and rebuilt.
+_SCHEMA_VERSION = 2
+_SCHEMA = """
+DROP TABLE IF EXISTS repositories;
+DROP TABLE IF EXISTS images;
+DROP TABLE IF EXISTS sync_state;
+CREATE TABLE repositories (
+    account TEXT NOT NULL,
+    region TEXT NOT NULL,
+    repository_name TEXT NOT NULL,
+    fingerprint TEXT,
+    synced_at REAL,
+    PRIMARY KEY (account, region, repository_name)
+);
+CREATE TABLE images (
+    account TEXT NOT NULL,
+    region TEXT NOT NULL,
+    repository_name TEXT NOT NULL,
+    image_digest TEXT NOT NULL,
+    image_tag TEXT NOT NULL,
+    pushed_at REAL,
+    PRIMARY KEY (account, region, repository_name, image_digest, image_tag)
+);
+CREATE INDEX images_by_tag ON images (account, region, image_tag);
+CREATE TABLE sync_state (
+    account TEXT NOT NULL,
+    region TEXT NOT NULL,
+    synced_at REAL,
+    full_synced_at REAL,
+    PRIMARY KEY (account, region)
+);
+"""
+
+
+class ECRIndex:
+    """
+    Local on-disk index of ECR repository -> digest -> tags -> pushedAt.
+
+    The index is refreshed incrementally: repositories that were created or
+    deleted are always picked up, and image details are re-scanned for the
+    repositories that CloudTrail reports a push or delete for since the last
+    sync. Every other repository gets a cheap ListImages check of its tags,
+    which catches the images a lifecycle policy expired, as those leave no
+    CloudTrail event. A full re-scan runs every `full_sync_interval` seconds,
+    when there is no previous sync, or when CloudTrail cannot be read,
+    including when `cloudtrail:LookupEvents` is denied. LookupEvents calls
+    are paced at its limit of 2 per second per account and region. Every
+    account and region is indexed and refreshed on its own.
+    """
+
+    def __init__(self, path: str, full_sync_interval: int = 24 * 3600):
+        self._lock = threading.Lock()
+        self._refresh_locks = {}
+        self._lookup_limiters = {}
+        self._full_sync_interval = full_sync_interval
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.create_function("REGEXP", 2, _regexp, deterministic=True)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            if self._conn.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                self._conn.executescript(_SCHEMA)
+                self._conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+    def synced_at(self, account: str, region: str):
+        """
+        Returns the time of the last sync of the registry, or None if it was never synced.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT synced_at FROM sync_state WHERE account = ? AND region = ?",
+                                     (account, region)).fetchone()
+        return row[0] if row else None
+
+    def search(self, account: str, region: str, pattern: str, match: str = "substring", limit: int = None) -> list:
+        """
+        Finds the indexed images whose tag matches the pattern.
+
+        Args:
+            account (str): The account ID of the registry, "" for the store's own credentials.
+            region (str): The region of the registry.
+            pattern (str): The pattern to match tags against.
+            match (str): One of "substring", "prefix", "glob" (SQLite GLOB syntax) or "regex".
+            limit (int): The maximum number of images to return.
+
+        Returns:
+            list: The repository name, digest, tag and push time of each matched image.
+
+        Raises:
+            ValueError: If the match mode is "regex" and the pattern is not a valid regular expression.
+        """
+        if match == "regex":
+            compile_regex(pattern)
+        params = [account, region, pattern]
+        if match == "prefix":
+            params.append(pattern + "\U0010ffff")
+        query = ("SELECT repository_name, image_digest, image_tag, pushed_at FROM images "
+                 f"WHERE account = ? AND region = ? AND {_MATCH_CLAUSES[match]} ORDER BY repository_name, image_tag")
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [{
+            "repositoryName": repository_name,
+            "imageDigest": image_digest,
+            "imageTag": image_tag,
+            "imagePushedAt": datetime.fromtimestamp(pushed_at, timezone.utc).isoformat() if pushed_at else None,
+        } for repository_name, image_digest, image_tag, pushed_at in rows]
+
+    def ensure_fresh(self, ecr, cloudtrail, account: str, region: str, max_age: float, max_concurrency: int,
+                     full: bool = False):
+        """
+        Refreshes the index of a registry if it is older than `max_age` seconds or if `full` is set.
+
+        Concurrent callers for the same registry wait for a single refresh
+        instead of each running their own; other registries refresh in parallel.
+
+        Args:
+            ecr: The ECR client of the account and region.
+            cloudtrail: The CloudTrail client of the account and region.
+            account (str): The account ID of the registry, "" for the store's own credentials.
+            region (str): The region of the registry.
+            max_age (float): The maximum age of the index in seconds.
+            max_concurrency (int): The maximum number of repositories scanned at once.
+            full (bool): Whether to re-scan every repository regardless of the index age.
+
+        Returns:
+            dict: The refresh statistics, or None if the index was fresh enough.
+        """
+        with self._lock:
+            refresh_lock = self._refresh_locks.setdefault((account, region), threading.Lock())
+        with refresh_lock:
+            synced_at = self.synced_at(account, region)
+            if not full and synced_at is not None and time.time() - synced_at <= max_age:
+                return None
+            return self.refresh(ecr, cloudtrail, account, region, max_concurrency, full=full)
+
+    def refresh(self, ecr, cloudtrail, account: str, region: str, max_concurrency: int, full: bool = False) -> dict:
+        """
+        Brings the index of a registry up to date.
+
+        Args:
+            ecr: The ECR client of the account and region.
+            cloudtrail: The CloudTrail client of the account and region.
+            account (str): The account ID of the registry, "" for the store's own credentials.
+            region (str): The region of the registry.
+            max_concurrency (int): The maximum number of repositories scanned at once.
+            full (bool): Whether to re-scan every repository.
+
+        Returns:
+            dict: The number of repositories listed, checked, scanned, changed and removed.
+        """
+        started_at = time.time()
+        with self._lock:
+            state = self._conn.execute("SELECT synced_at, full_synced_at FROM sync_state "
+                                       "WHERE account = ? AND region = ?", (account, region)).fetchone()
+            known = dict(self._conn.execute(
+                "SELECT repository_name, fingerprint FROM repositories WHERE account = ? AND region = ?",
+                (account, region)).fetchall())
+
+        repository_names = set(iter_items(ecr, "describe_repositories", "repositories[].repositoryName",
+                                          page_size=1000))
+        removed = set(known) - repository_names
+
+        full = full or state is None or started_at - state[1] > self._full_sync_interval
+        to_scan, to_check = repository_names, set()
+        if not full:
+            with self._lock:
+                limiter = self._lookup_limiters.setdefault((account, region), RateLimiter(_LOOKUP_EVENTS_RATE))
+            changed = _changed_repositories(cloudtrail, state[0] - _CLOUDTRAIL_DELAY_SECONDS, limiter)
+            if changed is None:
+                full = True
+            else:
+                to_scan = (repository_names - set(known)) | (changed & repository_names)
+                to_check = repository_names - to_scan
+
+        def check(repository_name: str) -> str:
+            return _fingerprint((image["imageDigest"], image["imageTag"]) for image in iter_items(
+                ecr, "list_images", "imageIds", repositoryName=repository_name, filter={"tagStatus": "TAGGED"},
+                page_size=1000))
+
+        for repository_name, fingerprint, error in imap_unordered(check, sorted(to_check), max_concurrency):
+            if error:
+                raise error
+            if fingerprint != known[repository_name]:
+                to_scan = to_scan | {repository_name}
+
+        def scan(repository_name: str) -> list:
+            rows = []
+            for page in iter_pages(ecr, "describe_images", repositoryName=repository_name,
+                                   filter={"tagStatus": "TAGGED"}, page_size=1000):
+                for image in page["imageDetails"]:
+                    pushed_at = image["imagePushedAt"].timestamp() if image.get("imagePushedAt") else None
+                    for image_tag in image.get("imageTags", []):
+                        rows.append((account, region, repository_name, image["imageDigest"], image_tag,
+                                     pushed_at))
+            return rows
+
+        changed_count = 0
+        for repository_name, rows, error in imap_unordered(scan, sorted(to_scan), max_concurrency):
+            if error:
+                raise error
+            fingerprint = _fingerprint(row[3:5] for row in rows)
+            with self._lock, self._conn:
+                if known.get(repository_name) != fingerprint:
+                    changed_count += 1
+                    self._conn.execute("DELETE FROM images WHERE account = ? AND region = ? AND repository_name = ?",
+                                       (account, region, repository_name))
+                    self._conn.executemany("INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?)", rows)
+                self._conn.execute("INSERT OR REPLACE INTO repositories VALUES (?, ?, ?, ?, ?)",
+                                   (account, region, repository_name, fingerprint, started_at))
+
+        with self._lock, self._conn:
+            for repository_name in removed:
+                self._conn.execute("DELETE FROM images WHERE account = ? AND region = ? AND repository_name = ?",
+                                   (account, region, repository_name))
+                self._conn.execute("DELETE FROM repositories WHERE account = ? AND region = ? AND repository_name = ?",
+                                   (account, region, repository_name))
+            self._conn.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)",
+                               (account, region, started_at, started_at if full else state[1]))
+
+        return {
+            "full": full,
+            "repositories": len(repository_names),
+            "checked": len(to_check),
+            "scanned": len(to_scan),
+            "changed": changed_count,
+            "removed": len(removed),
+        }
+
+
+def _changed_repositories(cloudtrail, since: float, limiter: RateLimiter):
+    # Returns the repositories pushed to or deleted from since the given time,
+    # or None when CloudTrail cannot be read (e.g. access denied) and a full
+    # scan is needed. Every request waits for the LookupEvents rate limit.
+    changed = set()
+    try:
+        for event_name in _CHANGE_EVENTS:
+            limiter.acquire()
+            for page in iter_pages(cloudtrail, "lookup_events",
+                                   LookupAttributes=[{"AttributeKey": "EventName", "AttributeValue": event_name}],
+                                   StartTime=datetime.fromtimestamp(since, timezone.utc)):
+                for event in page.get("Events", []):
+                    parameters = json.loads(event["CloudTrailEvent"]).get("requestParameters") or {}
+                    if parameters.get("repositoryName"):
+                        changed.add(parameters["repositoryName"])
+                if page.get("NextToken"):
+                    limiter.acquire()
+    except ClientError:
+        return None
+    return changed
+
+
+def _fingerprint(tags) -> str:
+    # Identifies the (digest, tag) pairs of a repository, in any order
+    return hashlib.sha256(json.dumps(sorted(list(tag) for tag in tags)).encode()).hexdigest()
+
+
+@lru_cache(maxsize=64)
+def compile_regex(pattern: str):
+    """
+    Compiles a regex tag pattern.
+
+    Args:
+        pattern (str): The regular expression.
+
+    Returns:
+        re.Pattern: The compiled pattern.
+
+    Raises:
+        ValueError: If the pattern is not a valid regular expression.
+    """
+    try:
+        return re.compile(pattern)
+    except re.error as e:
+        raise ValueError(f"Invalid regex {pattern!r}: {e}") from e
+
+
+def _regexp(pattern: str, value: str) -> bool:
+    return value is not None and compile_regex(pattern).search(value) is not None
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> ECRIndex:
+    """
+    Returns the process-wide ECR index, stored at `ECR_INDEX_PATH`.
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            path = os.getenv("ECR_INDEX_PATH", os.path.join(tempfile.gettempdir(), "ecr_index.sqlite"))
+            _index = ECRIndex(path)
+        return _index
@@ -0,0 +1,122 @@
+from typing import Iterator, List, Tuple
+
+from pydantic import BaseModel
+
+from .main_store import store
+from .aws_wrapper import get_client, account_scope, region_scope
+from .concurrency import imap_unordered
+
+# Only actions that cannot change anything may be fanned out across regions
+READ_ONLY_PREFIXES = ("list_", "describe_", "get_", "find_")
+FAN_OUT_PREFIX = "fan_out_"
+
+
+def is_read_only(action_name: str) -> bool:
+    """
+    Returns whether the action only reads from AWS and may be fanned out.
+    """
+    return action_name.startswith(READ_ONLY_PREFIXES) and action_name in store.get_registered_actions()
+
+
+def enabled_regions() -> List[str]:
+    """
+    Returns the regions enabled for the account.
+    """
+    return [region["RegionName"] for region in get_client("ec2").describe_regions()["Regions"]]
+
+
+def run_action(action_name: str, input: dict):
+    """
+    Runs a registered action and returns its output, raising if it reported an error.
+
+    Args:
+        action_name (str): The name of the registered action.
+        input (dict): The input of the action.
+
+    Returns:
+        The output of the action.
+    """
+    output = store.execute_action(action_name, input)
+    if isinstance(output, dict) and "error" in output:
+        raise ValueError(output["error"])
+    return output
+
+
+def run_in_regions(action_name: str, input: dict, regions: List[str], max_concurrency: int,
+                    timeout: float = None) -> Iterator[Tuple]:
+    """
+    Runs a read-only action once per region, concurrently.
+
+    Args:
+        action_name (str): The name of the registered action.
+        input (dict): The input of the action, the same for every region.
+        regions (List[str]): The regions to run the action in.
+        max_concurrency (int): The maximum number of regions queried at once.
+        timeout (float): The maximum time in seconds allowed per region.
+
+    Yields:
+        tuple: (region, output, error) for each region as soon as it completes.
+    """
+    if not is_read_only(action_name):
+        raise ValueError(f"`{action_name}` is not a read-only action")
+
+    def run(region: str):
+        with region_scope(region):
+            return run_action(action_name, input)
+
+    yield from imap_unordered(run, regions, max_concurrency, timeout=timeout)
+
+
+def run_in_accounts(action_name: str, input: dict, accounts: List[Tuple[str, str]], max_concurrency: int,
+                    timeout: float = None) -> Iterator[Tuple]:
+    """
+    Runs an action once per account, concurrently.
+
+    Each run happens within an `account_scope`, so every client the action
+    builds through `aws_wrapper` uses the assumed role of that account, and
+    the assumed sessions are reused across runs.
+
+    Args:
+        action_name (str): The name of the registered action.
+        input (dict): The input of the action, the same for every account.
+        accounts (List[Tuple[str, str]]): The (account_id, role_name) pairs to run the action in.
+        max_concurrency (int): The maximum number of accounts in flight at once.
+        timeout (float): The maximum time in seconds allowed per account.
+
+    Yields:
+        tuple: ((account_id, role_name), output, error) for each account as soon as it completes.
+    """
+    if action_name.startswith(FAN_OUT_PREFIX) or action_name not in store.get_registered_actions():
+        raise ValueError(f"`{action_name}` cannot be fanned out across accounts")
+
+    def run(account: Tuple[str, str]):
+        with account_scope(*account):
+            return run_action(action_name, input)
+
+    yield from imap_unordered(run, accounts, max_concurrency, timeout=timeout)
+
+
+def tag_output(output, **tags) -> dict:
+    """
+    Flattens an action output into lists of items tagged with where they came from.
+
+    List fields contribute one item per element, any other field that is set
+    contributes a single item. Items that are not dicts are wrapped as
+    {"value": item}.
+
+    Args:
+        output: The output of an action.
+        **tags: The tags to add to each item, e.g. region="eu-west-1".
+
+    Returns:
+        dict: The tagged items, by field name.
+    """
+    fields = output.dict() if isinstance(output, BaseModel) else dict(output or {})
+    tagged = {}
+    for name, value in fields.items():
+        if value is None:
+            continue
+        values = value if isinstance(value, list) else [value]
+        tagged[name] = [{**item, **tags} if isinstance(item, dict) else {"value": item, **tags}
+                        for item in values]
+    return tagged
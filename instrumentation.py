@@ -0,0 +1,205 @@
+import functools
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import kubiya
+
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """
+    Thread-safe Prometheus histogram with labels.
+    """
+
+    def __init__(self, name: str, help: str, buckets: tuple = _BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    lines.append(f"{self.name}_bucket{_labels(key + (('le', repr(bound)),))} {count}")
+                lines.append(f"{self.name}_bucket{_labels(key + (('le', '+Inf'),))} {series['count']}")
+                lines.append(f"{self.name}_sum{_labels(key)} {series['sum']}")
+                lines.append(f"{self.name}_count{_labels(key)} {series['count']}")
+        return lines
+
+
+class Counter:
+    """
+    Thread-safe Prometheus counter with labels.
+    """
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            lines.extend(f"{self.name}{_labels(key)} {value}" for key, value in sorted(self._series.items()))
+        return lines
+
+
+ACTION_DURATION = Histogram("kubiya_action_duration_seconds", "Duration of action invocations.")
+AWS_CALL_DURATION = Histogram("aws_call_duration_seconds", "Duration of AWS API calls, retries included.")
+AWS_CALL_RETRIES = Counter("aws_call_retries_total", "Retries of AWS API calls.")
+AWS_CALL_STATUS = Counter("aws_calls_total", "AWS API calls by final HTTP status.")
+AWS_CALL_ERRORS = Counter("aws_call_errors_total", "AWS API calls that failed, by error code or exception.")
+AWS_RESPONSE_BYTES = Counter("aws_response_bytes_total", "Bytes of AWS API responses, as declared by Content-Length.")
+AWS_CLIENT_BUILD = Histogram("aws_client_build_seconds", "Time to build a boto3 client or resource.")
+AWS_CREDENTIALS = Histogram("aws_credentials_seconds", "Time to obtain credentials, e.g. to assume a role.")
+
+_METRICS = (ACTION_DURATION, AWS_CALL_DURATION, AWS_CALL_RETRIES, AWS_CALL_STATUS, AWS_CALL_ERRORS,
+            AWS_RESPONSE_BYTES, AWS_CLIENT_BUILD, AWS_CREDENTIALS)
+_collectors = []
+
+
+class InstrumentedActionStore(kubiya.ActionStore):
+    """
+    ActionStore that times every invocation of its registered actions.
+    """
+
+    def register_action(self, action_name: str, action: callable):
+        super().register_action(action_name, _timed(action_name, action))
+
+
+def _timed(action_name: str, action: callable) -> callable:
+    @functools.wraps(action)
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        status = "error"
+        try:
+            output = action(*args, **kwargs)
+            status = "error" if isinstance(output, dict) and "error" in output else "ok"
+            return output
+        finally:
+            ACTION_DURATION.observe(time.perf_counter() - start, action=action_name, status=status)
+
+    return timed
+
+
+def install(client):
+    """
+    Hooks per-call timing, retry, status, error and response size metrics into a botocore client.
+
+    Args:
+        client: The boto3 client to instrument.
+    """
+    service = client.meta.service_model.service_id.hyphenize()
+
+    # Timing starts before the parameters are validated and serialized, and
+    # ahead of any before-call handler that answers the call itself.
+    def before_parameter_build(model, context: dict, **kwargs):
+        context["instrumentation_start"] = time.perf_counter()
+
+    def after_call(model, http_response, parsed: dict, context: dict, **kwargs):
+        labels = {"service": service, "operation": model.name}
+        if "instrumentation_start" in context:
+            AWS_CALL_DURATION.observe(time.perf_counter() - context["instrumentation_start"], **labels)
+        metadata = parsed.get("ResponseMetadata", {})
+        if metadata.get("RetryAttempts"):
+            AWS_CALL_RETRIES.inc(metadata["RetryAttempts"], **labels)
+        AWS_CALL_STATUS.inc(status=str(http_response.status_code), **labels)
+        if "Error" in parsed:
+            AWS_CALL_ERRORS.inc(error=parsed["Error"].get("Code", "Unknown"), **labels)
+        content_length = http_response.headers.get("content-length")
+        if content_length and content_length.isdigit():
+            AWS_RESPONSE_BYTES.inc(int(content_length), **labels)
+
+    def after_call_error(model, exception: Exception, context: dict, **kwargs):
+        labels = {"service": service, "operation": model.name}
+        if "instrumentation_start" in context:
+            AWS_CALL_DURATION.observe(time.perf_counter() - context["instrumentation_start"], **labels)
+        AWS_CALL_ERRORS.inc(error=type(exception).__name__, **labels)
+
+    client.meta.events.register(f"before-parameter-build.{service}", before_parameter_build)
+    client.meta.events.register(f"after-call.{service}", after_call)
+    client.meta.events.register(f"after-call-error.{service}", after_call_error)
+
+
+def register_collector(collector: callable):
+    """
+    Registers a function exported as gauges on every scrape.
+
+    Args:
+        collector (Callable): Returns (name, help, [(labels dict, value)]) tuples.
+    """
+    _collectors.append(collector)
+
+
+def prometheus_text() -> str:
+    """
+    Renders every metric, and the gauges of the registered collectors, in the Prometheus text format.
+    """
+    lines = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        for name, help, samples in collector():
+            lines.extend([f"# HELP {name} {help}", f"# TYPE {name} gauge"])
+            lines.extend(f"{name}{_labels(tuple(sorted(labels.items())))} {value}" for labels, value in samples)
+    return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(port: int) -> ThreadingHTTPServer:
+    """
+    Serves `prometheus_text` at /metrics on the given port from a background thread.
+
+    Args:
+        port (int): The port to listen on.
+
+    Returns:
+        ThreadingHTTPServer: The running server.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("", port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+def _labels(key: tuple) -> str:
+    if not key:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in key)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(key, escaped)) + "}"
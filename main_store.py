@@ -1,9 +1,36 @@
+import os
 
-import kubiya
+from .instrumentation import InstrumentedActionStore, start_metrics_server
 
-# ActionStore is a singleton that stores all the actions in the application
+# ActionStore is a singleton that stores all the actions in the application.
+# Every action invocation is timed, see instrumentation.py.
 
-store = kubiya.ActionStore("aws", "0.1.3")
+store = InstrumentedActionStore("aws", "0.1.3")
 store.uses_secrets(["AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_SESSION_TOKEN"])
 
-from .actions import ec2_actions, iam_actions, ecr_actions, ecs_actions, cloudwatch_actions, eks_actions,workspaces_actions, lambda_actions,route53_actions, s3_actions, health_check
\ No newline at end of file
+ACTION_MODULES = (
+    "ec2_actions",
+    "iam_actions",
+    "ecr_actions",
+    "ecs_actions",
+    "cloudwatch_actions",
+    "eks_actions",
+    "workspaces_actions",
+    "lambda_actions",
+    "route53_actions",
+    "s3_actions",
+    "health_check",
+    "diagnostics_actions",
+    "fanout_actions",
+    "composite_actions",
+)
+
+# With AWS_LAZY_ACTIONS set, actions are registered from their source and each
+# module (and boto3 with it) is only imported on its first invocation.
+from .action_loader import load_actions
+
+load_actions(store, ACTION_MODULES, lazy=os.getenv("AWS_LAZY_ACTIONS", "false").lower() in ("1", "true", "yes"))
+
+# With METRICS_PORT set, the Prometheus metrics are also served over HTTP at /metrics.
+if os.getenv("METRICS_PORT"):
+    start_metrics_server(int(os.getenv("METRICS_PORT")))
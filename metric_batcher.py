@@ -0,0 +1,354 @@
+import atexit
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+from botocore.exceptions import ClientError, ConnectionError, HTTPClientError
+from dateutil import parser as date_parser
+
+from .aws_wrapper import account_scope, get_account, get_client, get_region
+
+logger = logging.getLogger(__name__)
+
+# PutMetricData accepts up to 1000 metrics and a 1 MB payload per request;
+# the payload budget leaves room for the action, version and namespace fields.
+MAX_METRICS_PER_REQUEST = 1000
+MAX_PAYLOAD_BYTES = 1000 * 1000
+# A datum carries at most 150 distinct values in its Values/Counts arrays.
+MAX_DISTINCT_VALUES = 150
+# Failed requests with these error codes, or a 5xx status, are sent again later.
+_RETRYABLE_ERRORS = ("Throttling", "ThrottlingException", "TooManyRequestsException", "RequestLimitExceeded",
+                     "InternalFailure", "InternalServiceError", "ServiceUnavailable")
+
+
+class _Aggregate:
+    """
+    The datapoints buffered for one metric, dimension set and timestamp.
+
+    Values are kept as a value -> count histogram, which becomes a
+    Values/Counts datum. Past `MAX_DISTINCT_VALUES` distinct values, or once a
+    StatisticValues datum is merged in, it collapses into a StatisticSet.
+    """
+
+    def __init__(self, datum: dict, timestamp: datetime):
+        self.datum = {key: datum[key] for key in ("MetricName", "Dimensions", "Unit", "StorageResolution")
+                      if datum.get(key) is not None}
+        self.timestamp = timestamp
+        self.counts = Counter()
+        self.statistics = None
+
+    def add(self, datum: dict):
+        if datum.get("StatisticValues") is not None:
+            self._collapse()
+            self._merge_statistics(datum["StatisticValues"])
+            return
+
+        if datum.get("Values") is not None:
+            values = zip(datum["Values"], datum.get("Counts") or [1.0] * len(datum["Values"]))
+        else:
+            values = [(datum["Value"], 1.0)]
+        for value, count in values:
+            if self.statistics is not None:
+                self._merge_statistics({"SampleCount": count, "Sum": value * count, "Minimum": value,
+                                        "Maximum": value})
+            else:
+                self.counts[value] += count
+                if len(self.counts) > MAX_DISTINCT_VALUES:
+                    self._collapse()
+
+    def to_datum(self) -> dict:
+        datum = dict(self.datum, Timestamp=self.timestamp)
+        if self.statistics is not None:
+            datum["StatisticValues"] = dict(self.statistics)
+        else:
+            datum["Values"] = list(self.counts)
+            datum["Counts"] = list(self.counts.values())
+        return datum
+
+    def _collapse(self):
+        if self.statistics is None:
+            self.statistics = {}
+            for value, count in self.counts.items():
+                self._merge_statistics({"SampleCount": count, "Sum": value * count, "Minimum": value,
+                                        "Maximum": value})
+            self.counts.clear()
+
+    def _merge_statistics(self, statistics: dict):
+        if not self.statistics:
+            self.statistics.update(statistics)
+            return
+        self.statistics["SampleCount"] += statistics["SampleCount"]
+        self.statistics["Sum"] += statistics["Sum"]
+        self.statistics["Minimum"] = min(self.statistics["Minimum"], statistics["Minimum"])
+        self.statistics["Maximum"] = max(self.statistics["Maximum"], statistics["Maximum"])
+
+
+class MetricBatcher:
+    """
+    Buffered, pre-aggregating publisher for PutMetricData.
+
+    Datapoints are buffered per (account, region, namespace), the account
+    being the `account_scope` they are added in, and aggregated per metric,
+    dimension set and timestamp, truncated to the storage resolution (one
+    minute, or one second for high-resolution metrics). A background thread
+    sends a buffer once it holds a full request worth of metrics, once its
+    oldest datapoint is `max_age` seconds old, and at interpreter exit, each
+    one with the credentials of its own account.
+
+    Requests that fail with throttling, a 5xx or a connection error are put
+    back into their buffer and sent with the next flush, as long as the
+    buffer holds fewer than `max_pending` metrics. Any other failure, such as
+    a validation error, drops the request.
+    """
+
+    def __init__(self, max_age: float = 10.0, max_pending: int = 10 * MAX_METRICS_PER_REQUEST):
+        self.max_age = max_age
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._buffers = {}
+        self._thread = None
+        self.datapoints = 0
+        self.requests = 0
+        self.metrics_sent = 0
+        self.failures = 0
+        self.requeued = 0
+        self.dropped = 0
+        self.last_error = None
+
+    def add(self, namespace: str, metric_data: list, region: str = None):
+        """
+        Buffers datapoints for a later PutMetricData call.
+
+        Args:
+            namespace (str): The namespace of the metrics.
+            metric_data (list): MetricDatum dicts with a Value, Values/Counts or StatisticValues.
+            region (str): The AWS region, defaults to `AWS_REGION`.
+        """
+        now = time.time()
+        with self._lock:
+            buffer = self._buffers.setdefault((get_account(), region or get_region(), namespace),
+                                              {"since": now, "entries": {}})
+            for datum in metric_data:
+                _merge(buffer, datum, _truncate(datum.get("Timestamp"), datum.get("StorageResolution"), now))
+                self.datapoints += 1
+            full = len(buffer["entries"]) >= MAX_METRICS_PER_REQUEST
+            self._ensure_thread()
+        if full:
+            self._wakeup.set()
+
+    def flush(self, force: bool = True) -> dict:
+        """
+        Sends the buffered datapoints.
+
+        Args:
+            force (bool): Whether to send every buffer, or only the ones that are full or older than `max_age`.
+
+        Returns:
+            dict: The number of requests and metrics sent, of failed requests and of metrics requeued.
+        """
+        now = time.time()
+        with self._lock:
+            due = [key for key, buffer in self._buffers.items()
+                   if force or len(buffer["entries"]) >= MAX_METRICS_PER_REQUEST
+                   or now - buffer["since"] >= self.max_age]
+            buffers = [(key, self._buffers.pop(key)) for key in due]
+
+        requests = metrics = failures = requeued = dropped = 0
+        last_error = None
+        for key, buffer in buffers:
+            account, region, namespace = key
+            metric_data = [entry.to_datum() for entry in buffer["entries"].values()]
+            # A fresh context drops the account scope of the caller, if any, for the one of the buffer
+            sent, failed = contextvars.Context().run(_send_as, account, region, namespace, metric_data)
+            requests += sent + len(failed)
+            metrics += len(metric_data) - sum(len(chunk) for chunk, _ in failed)
+            failures += len(failed)
+            for chunk, error in failed:
+                last_error = error
+                kept = self._requeue(key, buffer["since"], chunk) if _is_retryable(error) else 0
+                requeued += kept
+                dropped += len(chunk) - kept
+                logger.warning("PutMetricData to %s in %s failed, %d of %d metrics requeued: %s",
+                               namespace, region, kept, len(chunk), error)
+
+        with self._lock:
+            self.requests += requests
+            self.metrics_sent += metrics
+            self.failures += failures
+            self.requeued += requeued
+            self.dropped += dropped
+            if last_error is not None:
+                self.last_error = str(last_error)
+        return {"requests": requests, "metrics": metrics, "failures": failures, "requeued": requeued}
+
+    def stats(self) -> dict:
+        """
+        Returns the batcher counters.
+
+        Returns:
+            dict: The datapoints buffered, requests and metrics sent, failed requests, metrics requeued
+                and dropped, and pending metrics.
+        """
+        with self._lock:
+            return {
+                "datapoints": self.datapoints,
+                "requests": self.requests,
+                "metrics_sent": self.metrics_sent,
+                "failures": self.failures,
+                "requeued": self.requeued,
+                "dropped": self.dropped,
+                "pending": sum(len(buffer["entries"]) for buffer in self._buffers.values()),
+                "last_error": self.last_error,
+            }
+
+    def _requeue(self, key: tuple, since: float, metric_data: list) -> int:
+        # Merges the metrics of a failed request back into their buffer, which
+        # keeps its original age so the next flush sends it again. Returns how
+        # many metrics were kept.
+        kept = 0
+        with self._lock:
+            buffer = self._buffers.setdefault(key, {"since": since, "entries": {}})
+            buffer["since"] = min(buffer["since"], since)
+            for datum in metric_data:
+                if len(buffer["entries"]) >= self.max_pending:
+                    break
+                _merge(buffer, datum, datum["Timestamp"])
+                kept += 1
+        return kept
+
+    def _ensure_thread(self):
+        # Called with the lock held.
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="metric-batcher", daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(timeout=self.max_age / 2)
+            self._wakeup.clear()
+            try:
+                self.flush(force=False)
+            except Exception as e:
+                logger.warning("Flushing buffered metrics failed: %s", e)
+
+
+def pack_metric_data(metric_data: list):
+    """
+    Splits metric data into PutMetricData-sized chunks.
+
+    Chunks hold at most `MAX_METRICS_PER_REQUEST` metrics and their
+    query-encoded size stays under `MAX_PAYLOAD_BYTES`.
+
+    Args:
+        metric_data (list): The MetricDatum dicts to send.
+
+    Yields:
+        list: The metric data of the next request.
+    """
+    chunk, size = [], 0
+    for datum in metric_data:
+        datum_size = _encoded_size(datum, f"MetricData.member.{MAX_METRICS_PER_REQUEST}")
+        if chunk and (len(chunk) == MAX_METRICS_PER_REQUEST or size + datum_size > MAX_PAYLOAD_BYTES):
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(datum)
+        size += datum_size
+    if chunk:
+        yield chunk
+
+
+def send_metric_data(cloudwatch, namespace: str, metric_data: list) -> tuple:
+    """
+    Publishes metric data in as few PutMetricData requests as the limits allow.
+
+    Args:
+        cloudwatch: The CloudWatch client.
+        namespace (str): The namespace of the metrics.
+        metric_data (list): The MetricDatum dicts to send.
+
+    Returns:
+        tuple: The number of successful requests, and the (chunk, error) pairs of the failed ones.
+    """
+    sent, failed = 0, []
+    for chunk in pack_metric_data(metric_data):
+        try:
+            cloudwatch.put_metric_data(Namespace=namespace, MetricData=chunk)
+            sent += 1
+        except Exception as e:
+            failed.append((chunk, e))
+    return sent, failed
+
+
+def _send_as(account: tuple, region: str, namespace: str, metric_data: list) -> tuple:
+    if account is None:
+        return send_metric_data(get_client("cloudwatch", region=region), namespace, metric_data)
+    with account_scope(*account):
+        return send_metric_data(get_client("cloudwatch", region=region), namespace, metric_data)
+
+
+def _merge(buffer: dict, datum: dict, timestamp: datetime):
+    key = (datum["MetricName"], _dimensions_key(datum.get("Dimensions")), datum.get("Unit"),
+           datum.get("StorageResolution"), timestamp)
+    entry = buffer["entries"].get(key)
+    if entry is None:
+        entry = buffer["entries"][key] = _Aggregate(datum, timestamp)
+    entry.add(datum)
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, ClientError):
+        return (error.response.get("Error", {}).get("Code") in _RETRYABLE_ERRORS
+                or error.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0) >= 500)
+    return isinstance(error, (ConnectionError, HTTPClientError))
+
+
+def _truncate(timestamp, storage_resolution: int, now: float) -> datetime:
+    if timestamp is None:
+        timestamp = datetime.fromtimestamp(now, timezone.utc)
+    elif isinstance(timestamp, str):
+        timestamp = date_parser.isoparse(timestamp)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    if storage_resolution == 1:
+        return timestamp.replace(microsecond=0)
+    return timestamp.replace(second=0, microsecond=0)
+
+
+def _dimensions_key(dimensions: list) -> tuple:
+    return tuple(sorted((d["Name"], d["Value"]) for d in dimensions or []))
+
+
+def _encoded_size(value, prefix: str) -> int:
+    # Size of the value in the query protocol, i.e. "Prefix.Key=value&" per leaf.
+    if isinstance(value, dict):
+        return sum(_encoded_size(v, f"{prefix}.{k}") for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(_encoded_size(v, f"{prefix}.member.{i}") for i, v in enumerate(value, 1))
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return len(prefix) + len(quote(str(value), safe="")) + 2
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher() -> MetricBatcher:
+    """
+    Returns the process-wide metric batcher, flushing every `METRIC_BATCH_MAX_AGE` seconds and
+    keeping at most `METRIC_BATCH_MAX_PENDING` metrics per buffer for retries.
+    """
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = MetricBatcher(max_age=float(os.getenv("METRIC_BATCH_MAX_AGE", "10")),
+                                     max_pending=int(os.getenv("METRIC_BATCH_MAX_PENDING",
+                                                               str(10 * MAX_METRICS_PER_REQUEST))))
+        return _batcher
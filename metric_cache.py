@@ -0,0 +1,192 @@
+import bisect
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from .metric_data import fetch_metric_data, query_period, referenced_ids
+
+
+class MetricCache:
+    """
+    LRU cache of settled CloudWatch datapoints.
+
+    Datapoints older than `settle_seconds` no longer change, so they are kept
+    per (scope, query) where the query is identified by its metric, period and
+    statistic, or by its expression and the queries it references. A repeated
+    query only fetches the tail that is not cached yet and splices it onto the
+    cached history. The cache holds at most `max_points` datapoints.
+    """
+
+    def __init__(self, settle_seconds: float = 3600, max_points: int = 1000000):
+        self.settle_seconds = settle_seconds
+        self.max_points = max_points
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._points = 0
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+        self.cached_points_served = 0
+        self.fetched_points_served = 0
+        self.evictions = 0
+
+    def get_metric_data(self, cloudwatch, scope: tuple, queries: list, start_time: datetime, end_time: datetime,
+                        window_seconds: int = None, max_concurrency: int = 10) -> dict:
+        """
+        Runs GetMetricData like `fetch_metric_data`, serving settled datapoints from the cache.
+
+        Args:
+            cloudwatch: The CloudWatch client.
+            scope (tuple): What the client is bound to, e.g. (region, account), so scopes never share entries.
+            queries (list): The MetricDataQuery dicts.
+            start_time (datetime): The start of the time range.
+            end_time (datetime): The end of the time range.
+            window_seconds (int): The length of each window fetched in parallel.
+            max_concurrency (int): The maximum number of concurrent calls.
+
+        Returns:
+            dict: Per query ID, its label, status code, epoch-second timestamps and values.
+        """
+        start, end = start_time.timestamp(), end_time.timestamp()
+        alignment = max(query_period(query) for query in queries)
+        settled_until = min(end, math.floor((time.time() - self.settle_seconds) / alignment) * alignment)
+        keys = _query_keys(scope, queries)
+        # Queries with ReturnData set to false only feed expressions and have no datapoints of their own.
+        returned = [query["Id"] for query in queries if query.get("ReturnData", True)]
+
+        with self._lock:
+            usable = {}
+            for query_id in returned:
+                entry = self._entries.get(keys[query_id])
+                if entry is not None and entry["start"] <= start < entry["end"]:
+                    usable[query_id] = entry
+                    self._entries.move_to_end(keys[query_id])
+
+        # A single tail fetch for the whole query set keeps expressions with their inputs.
+        fetch_start = min(entry["end"] for entry in usable.values()) if len(usable) == len(returned) else start
+        fetched = {}
+        if fetch_start < end:
+            fetched = fetch_metric_data(cloudwatch, queries, datetime.fromtimestamp(fetch_start, timezone.utc),
+                                        end_time, window_seconds=window_seconds, max_concurrency=max_concurrency)
+
+        results = {}
+        cached_points = fetched_points = 0
+        for query_id in returned:
+            entry = usable.get(query_id)
+            result = fetched.get(query_id) or {"Label": entry and entry["label"], "StatusCode": "Complete",
+                                               "Timestamps": [], "Values": []}
+            fetched_points += len(result["Timestamps"])
+            timestamps, values = result["Timestamps"], result["Values"]
+            if entry is not None:
+                cut = bisect.bisect_left(entry["timestamps"], fetch_start)
+                timestamps = entry["timestamps"][:cut] + timestamps
+                values = entry["values"][:cut] + values
+
+            low, high = bisect.bisect_left(timestamps, start), bisect.bisect_left(timestamps, end)
+            results[query_id] = dict(result, Timestamps=timestamps[low:high], Values=values[low:high])
+            cached_points += high - low - len(result["Timestamps"]) if entry is not None else 0
+
+            entry_start = entry["start"] if entry is not None else start
+            if result["StatusCode"] == "Complete" and settled_until > (entry["end"] if entry else start):
+                self._store(keys[query_id], result["Label"], timestamps, values, entry_start, settled_until)
+
+        with self._lock:
+            if fetch_start >= end:
+                self.hits += 1
+            elif usable:
+                self.partial_hits += 1
+            else:
+                self.misses += 1
+            self.cached_points_served += cached_points
+            self.fetched_points_served += fetched_points
+        return results
+
+    def clear(self):
+        """
+        Drops every cached datapoint.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._points = 0
+
+    def stats(self) -> dict:
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: The full, partial and missed lookups, the share of datapoints served from the cache,
+                the evictions and the current size.
+        """
+        with self._lock:
+            served = self.cached_points_served + self.fetched_points_served
+            return {
+                "hits": self.hits,
+                "partial_hits": self.partial_hits,
+                "misses": self.misses,
+                "hit_ratio": self.cached_points_served / served if served else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "points": self._points,
+            }
+
+    def _store(self, key: str, label: str, timestamps: list, values: list, entry_start: float, entry_end: float):
+        high = bisect.bisect_left(timestamps, entry_end)
+        entry = {
+            "label": label,
+            "start": entry_start,
+            "end": entry_end,
+            "timestamps": timestamps[:high],
+            "values": values[:high],
+        }
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._points -= len(previous["timestamps"])
+            self._entries[key] = entry
+            self._points += len(entry["timestamps"])
+            while self._points > self.max_points and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._points -= len(evicted["timestamps"])
+                self.evictions += 1
+
+
+def _query_keys(scope: tuple, queries: list) -> dict:
+    # Label and ReturnData do not change the datapoints, so they are left out.
+    # Expressions are keyed together with the keys of the queries they reference.
+    by_id = {query["Id"]: query for query in queries}
+    keys = {}
+
+    def key(query_id: str, seen: frozenset) -> str:
+        if query_id not in keys:
+            query = by_id[query_id]
+            references = sorted(referenced_ids(query, set(by_id)) - seen)
+            keys[query_id] = json.dumps({
+                "scope": scope,
+                "metric_stat": query.get("MetricStat"),
+                "expression": query.get("Expression"),
+                "period": query.get("Period"),
+                "references": {ref: key(ref, seen | {query_id}) for ref in references},
+            }, sort_keys=True, default=str)
+        return keys[query_id]
+
+    return {query_id: key(query_id, frozenset()) for query_id in by_id}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> MetricCache:
+    """
+    Returns the process-wide metric cache, configured by `METRIC_CACHE_SETTLE_SECONDS` and `METRIC_CACHE_MAX_POINTS`.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = MetricCache(settle_seconds=float(os.getenv("METRIC_CACHE_SETTLE_SECONDS", "3600")),
+                                 max_points=int(os.getenv("METRIC_CACHE_MAX_POINTS", "1000000")))
+        return _cache
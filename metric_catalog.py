@@ -0,0 +1,187 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from .pagination import iter_items
+
+
+class _NamespaceIndex:
+    """
+    The metrics of one namespace, indexed by metric name and dimension.
+    """
+
+    def __init__(self, metrics: list):
+        self.metrics = metrics
+        self.loaded_at = time.time()
+        self.by_name = {}
+        self.by_dimension_name = {}
+        self.by_dimension = {}
+        for position, metric in enumerate(metrics):
+            self.by_name.setdefault(metric["MetricName"], []).append(position)
+            for dimension in metric.get("Dimensions", []):
+                self.by_dimension_name.setdefault(dimension["Name"], []).append(position)
+                self.by_dimension.setdefault((dimension["Name"], dimension["Value"]), []).append(position)
+
+    def find(self, metric_name: str = None, dimensions: list = None) -> list:
+        candidates = []
+        if metric_name is not None:
+            candidates.append(self.by_name.get(metric_name, []))
+        for dimension in dimensions or []:
+            if dimension.get("Value") is not None:
+                candidates.append(self.by_dimension.get((dimension["Name"], dimension["Value"]), []))
+            else:
+                candidates.append(self.by_dimension_name.get(dimension["Name"], []))
+        if not candidates:
+            return self.metrics
+
+        # Intersect starting from the most selective index
+        candidates.sort(key=len)
+        positions = set(candidates[0])
+        for other in candidates[1:]:
+            positions.intersection_update(other)
+        return [self.metrics[position] for position in sorted(positions)]
+
+
+class MetricCatalog:
+    """
+    In-memory catalog of the metrics of each namespace.
+
+    A namespace is listed in full on its first lookup, which waits for it.
+    Once it is older than `ttl` seconds, lookups keep answering from the
+    current listing while a background thread lists the namespace again.
+    Every listing carries a generation that `invalidate` bumps, so a listing
+    started before an invalidation is never stored. At most `max_namespaces`
+    listings are kept, the least recently used are evicted first.
+    """
+
+    def __init__(self, ttl: float = 900, max_namespaces: int = 1000):
+        self.ttl = ttl
+        self.max_namespaces = max_namespaces
+        self._lock = threading.Lock()
+        self._namespaces = OrderedDict()
+        self._key_locks = {}
+        self._generations = {}
+        self._refreshing = set()
+        self.evictions = 0
+
+    def find(self, cloudwatch, scope: tuple, namespace: str, metric_name: str = None,
+             dimensions: list = None) -> tuple:
+        """
+        Finds the metrics of a namespace matching the ListMetrics filters.
+
+        Args:
+            cloudwatch: The CloudWatch client.
+            scope (tuple): What the client is bound to, e.g. (region, account), so scopes never share listings.
+            namespace (str): The namespace of the metrics.
+            metric_name (str): The name of the metrics.
+            dimensions (list): Dimension filters, each with a Name and an optional Value.
+
+        Returns:
+            tuple: The matching metrics, and the age of the listing in seconds.
+        """
+        key = (scope, namespace)
+        with self._lock:
+            index = self._namespaces.get(key)
+            if index is not None:
+                self._namespaces.move_to_end(key)
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+            if index is not None and time.time() - index.loaded_at > self.ttl and key not in self._refreshing:
+                self._refreshing.add(key)
+                threading.Thread(target=self._refresh, args=(cloudwatch, key), name="metric-catalog",
+                                 daemon=True).start()
+
+        if index is None:
+            # Only one caller lists the namespace, the others wait and reuse its listing.
+            with key_lock:
+                with self._lock:
+                    index = self._namespaces.get(key)
+                if index is None:
+                    index = self._load(cloudwatch, key)
+        return index.find(metric_name, dimensions), time.time() - index.loaded_at
+
+    def invalidate(self, namespace: str = None) -> int:
+        """
+        Drops the listing of a namespace, or of every namespace, in every scope.
+
+        Listings in progress for the namespace are discarded when they complete.
+
+        Args:
+            namespace (str): The namespace to drop, None for all of them.
+
+        Returns:
+            int: The number of listings dropped.
+        """
+        with self._lock:
+            for key in self._generations:
+                if namespace is None or key[1] == namespace:
+                    self._generations[key] += 1
+            keys = [key for key in self._namespaces if namespace is None or key[1] == namespace]
+            for key in keys:
+                del self._namespaces[key]
+        return len(keys)
+
+    def stats(self) -> dict:
+        """
+        Returns the number of listed namespaces and metrics, and of evicted listings.
+        """
+        with self._lock:
+            return {
+                "namespaces": len(self._namespaces),
+                "metrics": sum(len(index.metrics) for index in self._namespaces.values()),
+                "evictions": self.evictions,
+            }
+
+    def _load(self, cloudwatch, key: tuple) -> _NamespaceIndex:
+        # The listing is returned to the caller either way, but only stored if
+        # the namespace was not invalidated while it was being listed.
+        with self._lock:
+            generation = self._generations.setdefault(key, 0)
+        index = _NamespaceIndex(list(iter_items(cloudwatch, "list_metrics", "Metrics", Namespace=key[1])))
+        with self._lock:
+            if self._generations.get(key) == generation:
+                self._namespaces[key] = index
+                self._namespaces.move_to_end(key)
+                self._evict()
+        return index
+
+    def _evict(self):
+        # Called with the lock held. The lock and generation of a key that is
+        # being refreshed are dropped by the refresh once it completes.
+        while len(self._namespaces) > self.max_namespaces:
+            key, _ = self._namespaces.popitem(last=False)
+            self.evictions += 1
+            if key not in self._refreshing:
+                self._key_locks.pop(key, None)
+                self._generations.pop(key, None)
+
+    def _refresh(self, cloudwatch, key: tuple):
+        # A failed refresh keeps the current listing; the next stale lookup retries.
+        try:
+            with self._key_locks[key]:
+                self._load(cloudwatch, key)
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+                if key not in self._namespaces:
+                    self._key_locks.pop(key, None)
+                    self._generations.pop(key, None)
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> MetricCatalog:
+    """
+    Returns the process-wide metric catalog, refreshed every `METRIC_CATALOG_TTL_SECONDS` and
+    holding at most `METRIC_CATALOG_MAX_NAMESPACES` listings.
+    """
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = MetricCatalog(ttl=float(os.getenv("METRIC_CATALOG_TTL_SECONDS", "900")),
+                                     max_namespaces=int(os.getenv("METRIC_CATALOG_MAX_NAMESPACES", "1000")))
+        return _catalog
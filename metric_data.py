@@ -0,0 +1,158 @@
+import heapq
+import math
+import re
+from datetime import datetime, timezone
+
+from dateutil import parser as date_parser
+
+from .concurrency import imap_unordered
+from .pagination import iter_pages
+
+# GetMetricData accepts up to 500 queries and returns up to 100,800 datapoints per call.
+MAX_QUERIES_PER_CALL = 500
+MAX_DATAPOINTS_PER_CALL = 100800
+
+# Worst status first, so merged parts report the worst status of any of them
+_STATUS_ORDER = ("Forbidden", "InternalError", "PartialData", "Complete")
+_IDENTIFIER = re.compile(r"[a-z][A-Za-z0-9_]*")
+
+
+def parse_time(value) -> datetime:
+    """
+    Parses an ISO 8601 string (or passes through a datetime) into an aware UTC datetime.
+    """
+    if isinstance(value, str):
+        value = date_parser.isoparse(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def fetch_metric_data(cloudwatch, queries: list, start_time: datetime, end_time: datetime,
+                      window_seconds: int = None, max_concurrency: int = 10) -> dict:
+    """
+    Runs GetMetricData over any number of queries and any time range.
+
+    Queries are sharded at the per-call query limit, keeping math expressions
+    in the same shard as the queries they reference. The time range is split
+    into windows laid out from the start time in multiples of the longest
+    period, and every (shard, window) pair is fetched in parallel, following NextToken to the end. Each query's
+    datapoints are merged in timestamp order.
+
+    Args:
+        cloudwatch: The CloudWatch client.
+        queries (list): The MetricDataQuery dicts.
+        start_time (datetime): The start of the time range.
+        end_time (datetime): The end of the time range.
+        window_seconds (int): The length of each window. By default there is one window per
+            100,800 datapoints, up to `max_concurrency` windows.
+        max_concurrency (int): The maximum number of concurrent calls.
+
+    Returns:
+        dict: Per query ID, its label, status code, epoch-second timestamps and values.
+
+    Raises:
+        ValueError: If there are no queries.
+    """
+    if not queries:
+        raise ValueError("At least one MetricDataQuery is required")
+    start, end = start_time.timestamp(), end_time.timestamp()
+    windows = _windows(queries, start, end, window_seconds, max_concurrency)
+    tasks = [(shard, window_index) for shard in _shards(queries) for window_index in range(len(windows))]
+
+    def fetch(task: tuple) -> list:
+        shard, window_index = task
+        window_start, window_end = windows[window_index]
+        return list(iter_pages(cloudwatch, "get_metric_data", MetricDataQueries=shard, ScanBy="TimestampAscending",
+                               StartTime=datetime.fromtimestamp(window_start, timezone.utc),
+                               EndTime=datetime.fromtimestamp(window_end, timezone.utc)))
+
+    parts = {}
+    for (_, window_index), pages, error in imap_unordered(fetch, tasks, max_concurrency):
+        if error:
+            raise error
+        # PartialData on a page only means more pages follow: a query's status is the one of its last page
+        statuses = {}
+        for page in pages:
+            for result in page["MetricDataResults"]:
+                part = parts.setdefault(result["Id"], {"Label": result.get("Label"), "StatusCode": "Complete",
+                                                       "series": []})
+                statuses[result["Id"]] = result["StatusCode"]
+                part["series"].append((window_index, [(int(timestamp.timestamp()), value) for timestamp, value
+                                                      in zip(result["Timestamps"], result["Values"])]))
+        for query_id, status in statuses.items():
+            parts[query_id]["StatusCode"] = min(parts[query_id]["StatusCode"], status, key=_STATUS_ORDER.index)
+
+    results = {}
+    for query_id, part in parts.items():
+        # Windows are disjoint and pages are ascending, so this is a linear merge
+        series = [points for _, points in sorted(part["series"], key=lambda s: s[0])]
+        merged = list(heapq.merge(*series, key=lambda point: point[0]))
+        results[query_id] = {
+            "Label": part["Label"],
+            "StatusCode": part["StatusCode"],
+            "Timestamps": [timestamp for timestamp, _ in merged],
+            "Values": [value for _, value in merged],
+        }
+    return results
+
+
+def _shards(queries: list) -> list:
+    # Groups queries with the expressions that reference them (union-find),
+    # then packs the groups into shards of at most MAX_QUERIES_PER_CALL.
+    ids = {query["Id"] for query in queries}
+    parent = {query_id: query_id for query_id in ids}
+
+    def find(query_id: str) -> str:
+        while parent[query_id] != query_id:
+            parent[query_id] = parent[parent[query_id]]
+            query_id = parent[query_id]
+        return query_id
+
+    for query in queries:
+        for referenced in referenced_ids(query, ids):
+            parent[find(referenced)] = find(query["Id"])
+
+    groups = {}
+    for query in queries:
+        groups.setdefault(find(query["Id"]), []).append(query)
+
+    shards, shard = [], []
+    for group in sorted(groups.values(), key=len, reverse=True):
+        if len(group) > MAX_QUERIES_PER_CALL:
+            raise ValueError(f"An expression references more than {MAX_QUERIES_PER_CALL} queries")
+        if len(shard) + len(group) > MAX_QUERIES_PER_CALL:
+            shards.append(shard)
+            shard = []
+        shard.extend(group)
+    if shard:
+        shards.append(shard)
+    return shards
+
+
+def query_period(query: dict) -> int:
+    """
+    Returns the period of a MetricDataQuery, defaulting to one minute for expressions without one.
+    """
+    return (query.get("MetricStat") or {}).get("Period") or query.get("Period") or 60
+
+
+def referenced_ids(query: dict, ids: set) -> set:
+    """
+    Returns the IDs among `ids` that the expression of a MetricDataQuery refers to.
+    """
+    return set(_IDENTIFIER.findall(query.get("Expression") or "")) & ids
+
+
+def _windows(queries: list, start: float, end: float, window_seconds: int, max_concurrency: int) -> list:
+    # CloudWatch lays datapoints out from StartTime, so windows start at
+    # `start` plus multiples of a length that is a multiple of the longest
+    # period: no datapoint straddles two windows when the other periods divide it.
+    alignment = max(query_period(query) for query in queries)
+    if window_seconds is None:
+        datapoints = sum((end - start) / query_period(query) for query in queries)
+        count = min(max_concurrency, max(1, math.ceil(datapoints / MAX_DATAPOINTS_PER_CALL)))
+        window_seconds = (end - start) / count
+    window_seconds = max(alignment, math.ceil(window_seconds / alignment) * alignment)
+    return [(window_start, min(end, window_start + window_seconds))
+            for window_start in (start + k * window_seconds for k in range(math.ceil((end - start) / window_seconds)))]
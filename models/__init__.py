@@ -1,3 +1,5 @@
 from typing import Literal
 
-s3permissions = Literal["read-only", "read-write"]
\ No newline at end of file
+s3permissions = Literal["read-only", "read-write"]
+ecr_match_modes = Literal["substring", "prefix", "glob", "regex"]
+s3_scan_outputs = Literal["summary", "ndjson"]
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import Any, List, Optional
 
 
 class CreateAlarmRequest(BaseModel):
@@ -30,29 +30,55 @@ class DeleteAlarmResponse(BaseModel):
 
 class DescribeAlarmsRequest(BaseModel):
     AlarmNames: List[str] = None
+    MaxItems: int = None
+    NextToken: str = None
+    # JMESPath expression applied to each alarm, e.g. "{name: AlarmName, state: StateValue}"
+    Fields: str = None
 
 
 class DescribeAlarmsResponse(BaseModel):
-    alarms: List[dict]
+    # The alarms, or their projections when `Fields` is set
+    alarms: List[Any]
+    next_token: Optional[str] = None
 
 
 class PutMetricDataRequest(BaseModel):
     Namespace: str
     MetricData: List[dict]
+    # Buffer and pre-aggregate the datapoints instead of sending them right away
+    Buffered: bool = None
 
 
 class PutMetricDataResponse(BaseModel):
+    buffered: bool = False
+    requests: int = 0
+
+
+class FlushMetricDataRequest(BaseModel):
     pass
 
 
+class FlushMetricDataResponse(BaseModel):
+    requests: int
+    metrics: int
+    failures: int
+    requeued: int = 0
+    stats: dict
+
+
 class GetMetricDataRequest(BaseModel):
     MetricDataQueries: List[dict]
     StartTime: str
     EndTime: str
-    NextToken: str = None
+    # Length of the time windows fetched in parallel, sized automatically by default
+    WindowSeconds: int = None
+    MaxConcurrency: int = 10
+    # Serve settled datapoints from the local metric cache and only fetch the tail
+    UseCache: bool = None
 
 
 class GetMetricDataResponse(BaseModel):
+    # One entry per query: Id, Label, StatusCode and the Timestamps (epoch seconds) and Values columns
     metric_data: List[dict]
 
 
@@ -60,7 +86,21 @@ class ListMetricsRequest(BaseModel):
     Namespace: str
     MetricName: str = None
     Dimensions: List[dict] = None
+    MaxItems: int = None
+    NextToken: str = None
+    # Answer from the in-memory metric catalog instead of calling ListMetrics
+    UseCatalog: bool = None
 
 
 class ListMetricsResponse(BaseModel):
     metrics: List[dict]
+    next_token: Optional[str] = None
+    catalog_age_seconds: Optional[float] = None
+
+
+class InvalidateMetricCatalogRequest(BaseModel):
+    Namespace: str = None
+
+
+class InvalidateMetricCatalogResponse(BaseModel):
+    invalidated: int
@@ -0,0 +1,24 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+class ActionCall(BaseModel):
+    action_name: str
+    input: dict = {}
+
+
+class RunActionsRequest(BaseModel):
+    calls: List[ActionCall]
+    timeout_seconds: float = 60
+
+
+class ActionCallResult(BaseModel):
+    action_name: str
+    output: Optional[dict] = None
+    error: Optional[str] = None
+    seconds: float
+
+
+class RunActionsResponse(BaseModel):
+    results: List[ActionCallResult]
+    seconds: float
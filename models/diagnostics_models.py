@@ -0,0 +1,80 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+class ClientPoolStatsRequest(BaseModel):
+    pass
+
+
+class ClientPoolStatsResponse(BaseModel):
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    assumed_roles: dict = None
+
+
+class MetricCacheStatsRequest(BaseModel):
+    pass
+
+
+class MetricCacheStatsResponse(BaseModel):
+    hits: int
+    partial_hits: int
+    misses: int
+    hit_ratio: float
+    evictions: int
+    entries: int
+    points: int
+
+
+class RateLimiterStatsRequest(BaseModel):
+    pass
+
+
+class OperationRateLimit(BaseModel):
+    # The account ID of the scope the calls were made in, "" for the store's own credentials
+    account: str
+    region: str
+    service: str
+    operation: str
+    # Current and configured requests per second, None when unlimited
+    rate: Optional[float]
+    max_rate: Optional[float]
+    requests: int
+    throttles: int
+    waits: int
+    wait_seconds: float
+
+
+class RateLimiterStatsResponse(BaseModel):
+    operations: List[OperationRateLimit]
+    throttles: int
+    wait_seconds: float
+
+
+class PrometheusMetricsRequest(BaseModel):
+    pass
+
+
+class PrometheusMetricsResponse(BaseModel):
+    content_type: str = "text/plain; version=0.0.4"
+    text: str
+
+
+class ImportTimeReportRequest(BaseModel):
+    pass
+
+
+class ModuleImportTime(BaseModel):
+    module: str
+    lazy: bool
+    loaded: bool
+    register_seconds: float
+    import_seconds: float
+    modules_loaded: int
+
+
+class ImportTimeReportResponse(BaseModel):
+    modules: List[ModuleImportTime]
+    total_seconds: float
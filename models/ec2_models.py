@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, List, Optional
 
 
 class TerminateInstanceRequest(BaseModel):
@@ -19,21 +19,70 @@ class CreateInstanceRequest(BaseModel):
 
 class CreateInstanceResponse(BaseModel):
     instance_id: str
+    instance_ids: List[str] = None
+
+
+class TerminateInstancesRequest(BaseModel):
+    instance_ids: List[str]
+    batch_size: int = 100
+    max_concurrency: int = 10
+
+
+class InstanceStateChange(BaseModel):
+    instance_id: str
+    previous_state: str = None
+    current_state: str = None
+    error: str = None
+
+
+class TerminateInstancesResponse(BaseModel):
+    instances: List[InstanceStateChange]
+    failed: int
+
+
+class CreateInstancesRequest(BaseModel):
+    image_id: str
+    instance_type: str
+    count: int
+
+    # Instances are spread evenly over the subnets, tried in order when capacity runs out.
+    subnet_ids: List[str] = None
+    fallback_instance_types: List[str] = None
+    max_concurrency: int = 10
+
+
+class InstancePlacement(BaseModel):
+    subnet_id: str = None
+    instance_type: str
+    instance_ids: List[str]
+
+
+class CreateInstancesResponse(BaseModel):
+    instance_ids: List[str]
+    placements: List[InstancePlacement]
+    shortfall: int
+    errors: List[str]
 
 
 class ListInstancesRequest(BaseModel):
     instance_ids: List[str] = None
     instance_types: List[str] = None
+    max_results: int = None
+    next_token: str = None
+    # JMESPath expression applied to each instance, e.g. "{id: InstanceId, type: InstanceType, state: State.Name}"
+    fields: str = None
 
 
 class ListInstancesResponse(BaseModel):
-    instances: List[dict]
+    # The instances, or their projections when `fields` is set
+    instances: List[Any]
+    next_token: Optional[str] = None
 
 class SecurityGroup(BaseModel):
     id: str = None
     name: str = None
 class ListUnusedSecurityGroupsRequest(BaseModel):
-    pass
+    vpc_id: str = None
         
 class ListUnusedSecurityGroupsResponse(BaseModel):
     unused: List[SecurityGroup]
\ No newline at end of file
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
+from . import ecr_match_modes
 
 
 class CreateRepositoryRequest(BaseModel):
@@ -21,10 +22,13 @@ class DeleteRepositoryResponse(BaseModel):
 
 class DescribeRepositoriesRequest(BaseModel):
     repository_names: List[str] = None
+    max_results: int = None
+    next_token: str = None
 
 
 class DescribeRepositoriesResponse(BaseModel):
     repositories: List[dict]
+    next_token: Optional[str] = None
 
 
 class ListImagesRequest(BaseModel):
@@ -36,11 +40,17 @@ class ListImagesRequest(BaseModel):
 
 class ListImagesResponse(BaseModel):
     images: List[dict]
+    next_token: Optional[str] = None
 
 
 class FindImagesRequest(BaseModel):
     search_pattern: str
+    match: ecr_match_modes = "substring"
+    limit: int = None
+    refresh: bool = False
+    max_concurrency: int = 10
 
 
 class FindImagesResponse(BaseModel):
     matched_images: List[dict]
+    index_refresh: Optional[dict] = None
@@ -48,3 +48,4 @@ class ListTaskDefinitionsRequest(BaseModel):
 
 class ListTaskDefinitionsResponse(BaseModel):
     task_definitions: List[str]
+    next_token: Optional[str] = None
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, List, Optional
 
 
 class CreateClusterRequest(BaseModel):
@@ -24,10 +24,13 @@ class DeleteClusterResponse(BaseModel):
 
 class DescribeClusterRequest(BaseModel):
     cluster_name: str
+    # JMESPath expression applied to the cluster, e.g. "{status: status, version: version, endpoint: endpoint}"
+    fields: str = None
 
 
 class DescribeClusterResponse(BaseModel):
-    cluster: dict
+    # The cluster, or its projection when `fields` is set
+    cluster: Any
 
 
 class ListClustersRequest(BaseModel):
@@ -37,3 +40,4 @@ class ListClustersRequest(BaseModel):
 
 class ListClustersResponse(BaseModel):
     clusters: List[str]
+    next_token: Optional[str] = None
@@ -0,0 +1,37 @@
+from pydantic import BaseModel
+from typing import Dict, List
+
+
+class FanOutRegionsRequest(BaseModel):
+    action_name: str
+    input: dict = {}
+
+    # Leave empty to run in every region enabled for the account.
+    regions: List[str] = None
+    max_concurrency: int = 10
+    timeout_seconds: float = 60
+
+
+class FanOutRegionsResponse(BaseModel):
+    results: Dict[str, List[dict]]
+    regions: List[str]
+    errors: Dict[str, str]
+
+
+class AccountRole(BaseModel):
+    account_id: str
+    role_name: str
+
+
+class FanOutAccountsRequest(BaseModel):
+    action_name: str
+    input: dict = {}
+    accounts: List[AccountRole]
+    max_concurrency: int = 10
+    timeout_seconds: float = 300
+
+
+class FanOutAccountsResponse(BaseModel):
+    results: Dict[str, List[dict]]
+    accounts: List[str]
+    errors: Dict[str, str]
@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+from typing import List
+
+
+class HealthRequest(BaseModel):
+    pass
+
+
+class HealthResponse(BaseModel):
+    params: bool
+    connection: bool
+    errors: List[str]
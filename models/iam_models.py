@@ -21,9 +21,12 @@ class DeleteUserResponse(BaseModel):
 
 class ListUsersRequest(BaseModel):
     usernames: Optional[List[str]] = None
+    max_results: int = None
+    next_token: str = None
 
 class ListUsersResponse(BaseModel):
     users: List[dict]
+    next_token: Optional[str] = None
 
 
 class CreateAccessKeyRequest(BaseModel):
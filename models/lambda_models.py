@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import Any, List, Optional
 
 
 class CreateFunctionRequest(BaseModel):
@@ -28,15 +28,20 @@ class DeleteFunctionResponse(BaseModel):
 
 class GetFunctionRequest(BaseModel):
     function_name: str
+    # JMESPath expression applied to the function configuration, e.g. "{runtime: Runtime, memory: MemorySize}"
+    fields: str = None
 
 
 class GetFunctionResponse(BaseModel):
-    function: dict
+    # The function configuration, or its projection when `fields` is set
+    function: Any
 
 
 class ListFunctionsRequest(BaseModel):
     max_results: int = None
+    next_token: str = None
 
 
 class ListFunctionsResponse(BaseModel):
     functions: List[str]
+    next_token: Optional[str] = None
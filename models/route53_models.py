@@ -9,6 +9,7 @@ class ListHostedZonesListRequest(BaseModel):
 
 class ListHostedZonesListResponse(BaseModel):
     message: dict
+    next_token: Optional[str] = None
 
 class CreateHostedZonesRequest(BaseModel):
     name: str
@@ -1,12 +1,106 @@
 from pydantic import BaseModel
+from typing import List, Optional
+
+from . import s3_scan_outputs
 
 class S3MoveObjectRequest(BaseModel):
     source_bucket: str
     destination_bucket: str
     object_key: str
+    # Objects from this size on are copied in parallel parts
+    multipart_threshold_mb: int = 256
+    part_size_mb: int = 64
+    max_concurrency: int = 10
 
 class S3MoveObjectResponse(BaseModel):
     message: str
+    bytes_copied: Optional[int] = None
+    parts: Optional[int] = None
+    seconds: Optional[float] = None
+    throughput_bytes_per_second: Optional[float] = None
+
+class S3SyncPrefixRequest(BaseModel):
+    source_bucket: str
+    source_prefix: str = ""
+    destination_bucket: str
+    # Defaults to the source prefix
+    destination_prefix: Optional[str] = None
+    max_concurrency: int = 32
+    multipart_threshold_mb: int = 256
+    part_size_mb: int = 64
+    # Only report what would be copied
+    dry_run: bool = False
+
+class S3SyncFailure(BaseModel):
+    key: str
+    error: str
+
+class S3SyncPrefixResponse(BaseModel):
+    message: str
+    listed: int
+    copied: int
+    skipped: int
+    failed: int
+    only_in_destination: int
+    bytes_copied: int
+    seconds: float
+    bytes_per_second: float
+    # The first failures, up to a fixed number
+    failures: List[S3SyncFailure] = []
+
+class S3ScanBucketRequest(BaseModel):
+    bucket: str
+    prefix: str = ""
+    delimiter: str = "/"
+    # "summary" aggregates per prefix, "ndjson" writes one line per object to a new file under S3_SCAN_OUTPUT_DIR
+    output: s3_scan_outputs = "summary"
+    # Number of delimiter levels below the prefix to aggregate the summary by
+    group_depth: int = 1
+    max_concurrency: int = 32
+    # Defaults to four partitions per worker
+    target_partitions: Optional[int] = None
+
+class S3PrefixSummary(BaseModel):
+    prefix: str
+    objects: int
+    bytes: int
+
+class S3ScanBucketResponse(BaseModel):
+    message: str
+    partitions: int
+    objects: int
+    bytes: int
+    seconds: float
+    output_path: Optional[str] = None
+    prefixes: List[S3PrefixSummary] = []
+
+class S3DeleteObjectsRequest(BaseModel):
+    bucket: str
+    # Any combination of an explicit key list, a prefix and a last-modified cutoff
+    keys: Optional[List[str]] = None
+    prefix: Optional[str] = None
+    modified_before: Optional[str] = None
+    # Permanently delete every version and delete marker instead of adding delete markers
+    include_versions: bool = False
+    max_concurrency: int = 16
+    max_attempts: int = 3
+    # Only count the matching objects
+    dry_run: bool = False
+
+class S3DeleteFailure(BaseModel):
+    key: str
+    version_id: Optional[str] = None
+    code: str
+    error: str
+
+class S3DeleteObjectsResponse(BaseModel):
+    message: str
+    matched: int
+    deleted: int
+    failed: int
+    seconds: float
+    # The first failures, up to a fixed number
+    failures: List[S3DeleteFailure] = []
 
 class S3CreateBucketRequest(BaseModel):
     bucket_name: str
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, PositiveFloat
 from typing import List  ,Optional
 
 
@@ -24,11 +24,20 @@ class DescribeWorkspaceRequest(BaseModel):
     account_id: Optional[str]
     role_name: Optional[str]
 
-    workspace_id: str
+    # Either workspace IDs, or filters on the directory (and user) or the bundle.
+    workspace_id: Optional[str]
+    workspace_ids: Optional[List[str]]
+    directory_id: Optional[str]
+    user_name: Optional[str]
+    bundle_id: Optional[str]
+
+    include_connection_status: bool = False
+    max_concurrency: int = 10
 
 
 class DescribeWorkspaceResponse(BaseModel):
-    workspace_details: dict
+    workspace_details: Optional[dict]
+    workspaces: List[dict] = []
 
 class TerminateWorkspaceRequest(BaseModel):
 
@@ -40,4 +49,51 @@ class TerminateWorkspaceRequest(BaseModel):
 
 
 class TerminateWorkspaceResponse(BaseModel):
-    workspace_id: str
\ No newline at end of file
+    workspace_id: str
+
+class WorkspaceSpec(BaseModel):
+    directory_id: str
+    user_name: str
+    bundle_id: str
+
+
+class FailedWorkspaceRequest(BaseModel):
+    workspace_id: Optional[str]
+    directory_id: Optional[str]
+    user_name: Optional[str]
+    error_code: Optional[str]
+    error_message: Optional[str]
+
+
+class CreateWorkspacesRequest(BaseModel):
+
+    #When working with multiple accounts, you can specify the account ID and role name to use for the action.
+    account_id: Optional[str]
+    role_name: Optional[str]
+
+    workspaces: List[WorkspaceSpec]
+    max_concurrency: int = 4
+    requests_per_second: PositiveFloat = 2
+    max_attempts: int = 3
+
+
+class CreateWorkspacesResponse(BaseModel):
+    workspaces_ids: List[str]
+    failed: List[FailedWorkspaceRequest]
+
+
+class TerminateWorkspacesRequest(BaseModel):
+
+    #When working with multiple accounts, you can specify the account ID and role name to use for the action.
+    account_id: Optional[str]
+    role_name: Optional[str]
+
+    workspace_ids: List[str]
+    max_concurrency: int = 4
+    requests_per_second: PositiveFloat = 2
+    max_attempts: int = 3
+
+
+class TerminateWorkspacesResponse(BaseModel):
+    terminated: List[str]
+    failed: List[FailedWorkspaceRequest]
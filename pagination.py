@@ -0,0 +1,135 @@
+from functools import lru_cache
+from typing import Iterator, List, Optional, Tuple
+
+import jmespath
+from jmespath.exceptions import JMESPathError
+
+
+def iter_pages(client, operation_name: str, limit: int = None, cursor: str = None, page_size: int = None,
+               **kwargs):
+    """
+    Streams the pages of a paginated AWS operation.
+
+    Pages are fetched on demand, so only the current page is held in memory.
+    Parameters set to None are dropped, which lets request model fields be
+    passed through as they are.
+
+    Args:
+        client: The boto3 client to call.
+        operation_name (str): The name of the paginated operation, e.g. "describe_instances".
+        limit (int): The maximum number of items to return across all pages.
+        cursor (str): A resume cursor returned by a previous call.
+        page_size (int): The number of items to request per page.
+        **kwargs: The parameters of the operation.
+
+    Returns:
+        PageIterator: An iterator over the pages. Once exhausted, its `resume_token`
+            is the cursor to continue from, or None if there are no more items.
+    """
+    pagination_config = {
+        "MaxItems": limit,
+        "StartingToken": cursor,
+        "PageSize": page_size,
+    }
+    params = {name: value for name, value in kwargs.items() if value is not None}
+    params["PaginationConfig"] = {name: value for name, value in pagination_config.items() if value is not None}
+    return client.get_paginator(operation_name).paginate(**params)
+
+
+def iter_items(client, operation_name: str, result_key: str, limit: int = None, cursor: str = None,
+               page_size: int = None, projection: str = None, **kwargs) -> Iterator:
+    """
+    Streams the items of a paginated AWS operation, page by page.
+
+    With a projection, each item is reduced as its page is read, so the rest
+    of the item is dropped along with the page.
+
+    Args:
+        client: The boto3 client to call.
+        operation_name (str): The name of the paginated operation.
+        result_key (str): A JMESPath expression selecting the items of a page, e.g. "Reservations[].Instances[]".
+        limit (int): The maximum number of items to return across all pages.
+        cursor (str): A resume cursor returned by a previous call.
+        page_size (int): The number of items to request per page.
+        projection (str): A JMESPath expression applied to each item, e.g. "{id: InstanceId, state: State.Name}".
+        **kwargs: The parameters of the operation.
+
+    Yields:
+        The items of every page, in order.
+    """
+    expression = jmespath.compile(result_key)
+    projection = compile_projection(projection)
+    for page in iter_pages(client, operation_name, limit=limit, cursor=cursor, page_size=page_size, **kwargs):
+        items = expression.search(page) or []
+        yield from (projection.search(item) for item in items) if projection else items
+
+
+def paginate(client, operation_name: str, result_key: str, limit: int = None, cursor: str = None,
+             page_size: int = None, projection: str = None, **kwargs) -> Tuple[List, Optional[str]]:
+    """
+    Fetches the items of a paginated AWS operation, up to an optional limit.
+
+    The limit applies to the operation's own result key (e.g. reservations for
+    describe_instances) and is enforced by botocore, which produces an opaque
+    cursor when it stops before the last item.
+
+    Args:
+        client: The boto3 client to call.
+        operation_name (str): The name of the paginated operation.
+        result_key (str): A JMESPath expression selecting the items of a page.
+        limit (int): The maximum number of items to return, None for all of them.
+        cursor (str): A resume cursor returned by a previous call.
+        page_size (int): The number of items to request per page.
+        projection (str): A JMESPath expression applied to each item as its page is read.
+        **kwargs: The parameters of the operation.
+
+    Returns:
+        tuple: The items and the cursor to resume from, or None if there are no more items.
+    """
+    expression = jmespath.compile(result_key)
+    projection = compile_projection(projection)
+    pages = iter_pages(client, operation_name, limit=limit, cursor=cursor, page_size=page_size, **kwargs)
+    items = []
+    for page in pages:
+        page_items = expression.search(page) or []
+        if projection:
+            page_items = [projection.search(item) for item in page_items]
+        items.extend(page_items)
+    return items, pages.resume_token
+
+
+def project(value, projection: str = None):
+    """
+    Applies a JMESPath projection to a single AWS object.
+
+    Args:
+        value: The object, e.g. the cluster of a DescribeCluster response.
+        projection (str): The JMESPath expression, None to return the object as it is.
+
+    Returns:
+        The projected object.
+    """
+    projection = compile_projection(projection)
+    return projection.search(value) if projection else value
+
+
+@lru_cache(maxsize=128)
+def compile_projection(projection: str = None):
+    """
+    Compiles the JMESPath projection requested by a caller.
+
+    Args:
+        projection (str): The JMESPath expression, or None.
+
+    Returns:
+        ParsedResult: The compiled expression, None when there is no projection.
+
+    Raises:
+        ValueError: If the expression is not valid JMESPath.
+    """
+    if not projection:
+        return None
+    try:
+        return jmespath.compile(projection)
+    except JMESPathError as e:
+        raise ValueError(f"Invalid JMESPath projection {projection!r}: {e}") from e
@@ -0,0 +1,182 @@
+import json
+import os
+import threading
+import time
+
+from botocore.retries.standard import RetryEventAdapter, ThrottlingErrorDetector
+
+from .concurrency import RateLimiter
+
+# Multiplicative decrease on throttling, additive recovery while calls succeed,
+# each at most once per adjustment interval so a burst of in-flight throttles
+# only halves the rate once.
+_DECREASE_FACTOR = 0.5
+_RECOVERY_STEP = 0.1
+_ADJUST_INTERVAL_SECONDS = 1.0
+
+
+class _OperationLimit:
+    """
+    The token bucket and counters of one (account, region, service, operation).
+
+    Operations without a configured rate are not limited until their first
+    throttle, which starts a bucket at half the rate they were sent at.
+    """
+
+    def __init__(self, max_rate: float, min_rate: float):
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.limiter = RateLimiter(max_rate) if max_rate else None
+        self.requests = 0
+        self.throttles = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self._lock = threading.Lock()
+        self._last_decrease = 0.0
+        self._last_increase = 0.0
+        self._window_start = time.monotonic()
+        self._window_requests = 0
+        self._sent_rate = 0.0
+
+    @property
+    def rate(self):
+        return self.limiter.rate if self.limiter else None
+
+    def acquire(self):
+        with self._lock:
+            self.requests += 1
+            now = time.monotonic()
+            if now - self._window_start >= 1.0:
+                self._sent_rate = self._window_requests / (now - self._window_start)
+                self._window_start, self._window_requests = now, 0
+            self._window_requests += 1
+            limiter = self.limiter
+        if limiter is not None:
+            waited = limiter.acquire()
+            if waited:
+                with self._lock:
+                    self.waits += 1
+                    self.wait_seconds += waited
+
+    def on_throttle(self):
+        with self._lock:
+            self.throttles += 1
+            now = time.monotonic()
+            if now - self._last_decrease < _ADJUST_INTERVAL_SECONDS:
+                return
+            self._last_decrease = now
+            current = self.limiter.rate if self.limiter else max(self._sent_rate, self._window_requests)
+            rate = max(self.min_rate, current * _DECREASE_FACTOR)
+            if self.limiter is None:
+                self.limiter = RateLimiter(rate)
+            else:
+                self.limiter.set_rate(rate)
+
+    def on_success(self):
+        with self._lock:
+            if self.limiter is None or self.limiter.rate == self.max_rate:
+                return
+            now = time.monotonic()
+            if (now - self._last_decrease < _ADJUST_INTERVAL_SECONDS
+                    or now - self._last_increase < _ADJUST_INTERVAL_SECONDS):
+                return
+            self._last_increase = now
+            step = (self.max_rate or self.limiter.rate) * _RECOVERY_STEP
+            rate = self.limiter.rate + max(step, 1.0)
+            self.limiter.set_rate(min(rate, self.max_rate) if self.max_rate else rate)
+
+
+class AdaptiveRateLimiter:
+    """
+    Client-side rate limiter shared by every client built through `aws_wrapper`.
+
+    Each (account, region, service, operation) gets its own token bucket,
+    since AWS throttles every account on its own, and every HTTP attempt
+    (retries included) takes a token from it. Rates are configured per
+    "service.Operation" or per "service"; throttling errors halve the rate
+    and successful calls bring it back up to the configured one.
+    """
+
+    def __init__(self, rates: dict = None, min_rate: float = 0.5):
+        self.rates = rates or {}
+        self.min_rate = min_rate
+        self._lock = threading.Lock()
+        self._limits = {}
+        self._throttling = ThrottlingErrorDetector(RetryEventAdapter())
+
+    def install(self, client, account: str = ""):
+        """
+        Hooks the limiter into a botocore client.
+
+        Args:
+            client: The boto3 client to limit.
+            account (str): The account ID the client acts in, "" for the store's own credentials.
+        """
+        region = client.meta.region_name
+        service = client.meta.service_model.service_id.hyphenize()
+
+        def before_send(event_name: str, **kwargs):
+            self._limit(account, region, service, event_name.rsplit(".", 1)[-1]).acquire()
+
+        def needs_retry(event_name: str, **kwargs):
+            limit = self._limit(account, region, service, event_name.rsplit(".", 1)[-1])
+            response = kwargs.get("response")
+            if self._throttling.is_throttling_error(**kwargs):
+                limit.on_throttle()
+            elif response is not None and 200 <= response[0].status_code < 300:
+                limit.on_success()
+
+        client.meta.events.register(f"before-send.{service}", before_send)
+        client.meta.events.register(f"needs-retry.{service}", needs_retry)
+
+    def stats(self) -> list:
+        """
+        Returns the rate and counters of every operation called so far.
+
+        Returns:
+            list: One entry per (account, region, service, operation) with its current and configured rate
+                (None when unlimited), requests, throttles, waits and total wait time.
+        """
+        with self._lock:
+            limits = list(self._limits.items())
+        return [{
+            "account": account,
+            "region": region,
+            "service": service,
+            "operation": operation,
+            "rate": limit.rate,
+            "max_rate": limit.max_rate,
+            "requests": limit.requests,
+            "throttles": limit.throttles,
+            "waits": limit.waits,
+            "wait_seconds": limit.wait_seconds,
+        } for (account, region, service, operation), limit in sorted(limits, key=lambda item: item[0])]
+
+    def _limit(self, account: str, region: str, service: str, operation: str) -> _OperationLimit:
+        key = (account, region, service, operation)
+        with self._lock:
+            limit = self._limits.get(key)
+            if limit is None:
+                max_rate = self.rates.get(f"{service}.{operation}", self.rates.get(service))
+                limit = self._limits[key] = _OperationLimit(max_rate, self.min_rate)
+            return limit
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> AdaptiveRateLimiter:
+    """
+    Returns the process-wide rate limiter.
+
+    `AWS_RATE_LIMITS` holds the configured rates in requests per second as a
+    JSON object, e.g. {"iam.ListUsers": 5, "ecr": 20}; service names are
+    botocore service IDs in lower case with dashes (e.g. "cloudwatch", "ec2").
+    """
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = AdaptiveRateLimiter(json.loads(os.getenv("AWS_RATE_LIMITS", "{}")),
+                                                min_rate=float(os.getenv("AWS_MIN_RATE_LIMIT", "0.5")))
+        return _rate_limiter
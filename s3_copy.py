@@ -0,0 +1,136 @@
+import math
+from urllib.parse import urlencode
+
+from boto3.s3.transfer import TransferConfig
+
+from .pagination import iter_items
+
+MB = 1024 * 1024
+# UploadPartCopy parts are at least 5 MB, except the last one, and an upload has at most 10,000 parts.
+MIN_PART_SIZE = 5 * MB
+MAX_PARTS = 10000
+# CopyObject copies objects of up to 5 GB
+MAX_SINGLE_COPY_SIZE = 5 * 1024 * MB
+
+# Headers a multipart copy does not carry over by itself
+_PRESERVED_HEADERS = ("CacheControl", "ContentDisposition", "ContentEncoding", "ContentLanguage", "ContentType",
+                      "Expires", "WebsiteRedirectLocation")
+
+
+def part_size_for(size: int, part_size: int) -> int:
+    """
+    Returns the part size to copy an object with, within the multipart upload limits.
+
+    Args:
+        size (int): The size of the object in bytes.
+        part_size (int): The requested part size in bytes.
+
+    Returns:
+        int: The part size in bytes, at least 5 MB and large enough to need no more than 10,000 parts.
+    """
+    return max(part_size, MIN_PART_SIZE, math.ceil(size / MAX_PARTS))
+
+
+def copy_object(s3, source_bucket: str, source_key: str, bucket: str, key: str, multipart_threshold: int,
+                part_size: int, max_concurrency: int, head: dict = None) -> dict:
+    """
+    Copies an object, switching to a parallel multipart copy for large objects.
+
+    Objects below `multipart_threshold` bytes, capped at the 5 GB CopyObject
+    limit, are copied with a single CopyObject, which keeps their metadata
+    and tags. Larger objects go through the s3transfer managed copy, which
+    copies ranges with UploadPartCopy on `max_concurrency` threads; their
+    headers, metadata, tags and storage class are read from the source and
+    set explicitly.
+    Every request is conditioned on the source ETag, so a source that
+    changes mid-copy fails the copy instead of mixing versions.
+
+    Args:
+        s3: The S3 client.
+        source_bucket (str): The bucket to copy from.
+        source_key (str): The key to copy.
+        bucket (str): The bucket to copy to.
+        key (str): The destination key.
+        multipart_threshold (int): The size in bytes from which to copy in parts.
+        part_size (int): The requested part size in bytes.
+        max_concurrency (int): The maximum number of parts copied at once.
+        head (dict): The HeadObject response of the source, if already known.
+
+    Returns:
+        dict: The number of bytes and parts copied.
+    """
+    head = head or s3.head_object(Bucket=source_bucket, Key=source_key)
+    size = head["ContentLength"]
+    copy_source = {"Bucket": source_bucket, "Key": source_key}
+    extra_args = {"CopySourceIfMatch": head["ETag"]}
+    if head.get("StorageClass"):
+        extra_args["StorageClass"] = head["StorageClass"]
+
+    multipart_threshold = min(multipart_threshold, MAX_SINGLE_COPY_SIZE)
+    if size < multipart_threshold:
+        s3.copy_object(CopySource=copy_source, Bucket=bucket, Key=key, **extra_args)
+        return {"bytes": size, "parts": 1}
+
+    extra_args.update({name: head[name] for name in _PRESERVED_HEADERS if head.get(name)})
+    extra_args["Metadata"] = head.get("Metadata", {})
+    tags = s3.get_object_tagging(Bucket=source_bucket, Key=source_key)["TagSet"]
+    if tags:
+        extra_args["Tagging"] = urlencode([(tag["Key"], tag["Value"]) for tag in tags])
+
+    part_size = part_size_for(size, part_size)
+    config = TransferConfig(multipart_threshold=multipart_threshold, multipart_chunksize=part_size,
+                            max_concurrency=max_concurrency)
+    s3.copy(copy_source, bucket, key, ExtraArgs=extra_args, Config=config)
+    return {"bytes": size, "parts": math.ceil(size / part_size)}
+
+
+def diff_prefixes(s3, source_bucket: str, source_prefix: str, bucket: str, prefix: str):
+    """
+    Merge-joins the listings of two prefixes by key relative to the prefix.
+
+    Both listings are streamed page by page in key order, so memory stays flat
+    regardless of the number of keys.
+
+    Args:
+        s3: The S3 client.
+        source_bucket (str): The source bucket.
+        source_prefix (str): The source prefix.
+        bucket (str): The destination bucket.
+        prefix (str): The destination prefix.
+
+    Yields:
+        tuple: (relative key, source object, destination object), where the object missing on one side is None.
+    """
+    def listing(bucket_name: str, key_prefix: str):
+        for item in iter_items(s3, "list_objects_v2", "Contents", Bucket=bucket_name, Prefix=key_prefix,
+                               page_size=1000):
+            yield item["Key"][len(key_prefix):], item
+
+    # S3 lists keys in UTF-8 binary order, which is also Python's str order.
+    sources, destinations = listing(source_bucket, source_prefix), listing(bucket, prefix)
+    source, destination = next(sources, None), next(destinations, None)
+    while source is not None or destination is not None:
+        if destination is None or (source is not None and source[0] < destination[0]):
+            yield source[0], source[1], None
+            source = next(sources, None)
+        elif source is None or destination[0] < source[0]:
+            yield destination[0], None, destination[1]
+            destination = next(destinations, None)
+        else:
+            yield source[0], source[1], destination[1]
+            source, destination = next(sources, None), next(destinations, None)
+
+
+def is_unchanged(source: dict, destination: dict) -> bool:
+    """
+    Returns whether a destination object already holds the source object, judging from their listings.
+
+    The ETag of a multipart upload depends on its part size, so when either
+    side was uploaded in parts the sizes are compared and the destination must
+    not be older than the source.
+    """
+    if destination is None or source["Size"] != destination["Size"]:
+        return False
+    if "-" in source["ETag"] or "-" in destination["ETag"]:
+        return destination["LastModified"] >= source["LastModified"]
+    return source["ETag"] == destination["ETag"]